@@ -0,0 +1,185 @@
+"""Admission control: admit heavy work against CPU and memory budgets instead of queuing it.
+
+Every /analyze (JSON or NDJSON), background prepare and async job asks for a
+ticket before it starts. Its cost is estimated from the upload's size and
+format (COST_MODEL), and it is admitted only if everything in flight in this
+API process plus the new cost fits both budgets:
+
+- ADMISSION_CPU_S: estimated CPU-seconds of admitted, unfinished work. Over
+  it, /analyze answers 429 with Retry-After = the time the pool needs to
+  drain the excess.
+- ADMISSION_MEM_MB: estimated peak bytes of admitted work. Over it, 503:
+  the process is protecting itself from OOM.
+
+A request is always admitted when nothing else is in flight, so an upload
+larger than the budget still runs, alone. 0 disables a budget. Usage is
+exported on /metrics (greatjeans_admission_in_use{resource},
+greatjeans_admission_budget{resource}, greatjeans_admission_rejected_total)
+and shown by GET /debug/admission.
+"""
+from __future__ import annotations
+import itertools, logging, math, threading
+from typing import Any, Dict, NamedTuple, Optional
+
+from . import metrics, storage
+from .config import ADMISSION_CPU_S, ADMISSION_MEM_MB
+from .workers import pool
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+# (CPU seconds per MB of upload, peak bytes per upload byte), measured with
+# analyze_upload_bytes on synthetic 100k / 640k SNP uploads: a fresh 23andMe
+# analysis costs ~0.25 s/MB and ~50 B/B, a prepared one ~0.18 s/MB and ~46 B/B
+# (result building, not parsing, dominates); parse alone ~0.065 s/MB, ~9 B/B.
+# VCF carries ~1.7x more bytes per variant than 23andMe text; gzip ~4x fewer.
+COST_MODEL = {
+    ('analyze', '23andme'): (0.25, 50.0),
+    ('analyze', 'vcf'): (0.15, 30.0),
+    ('prepared', '23andme'): (0.18, 46.0),
+    ('prepared', 'vcf'): (0.11, 28.0),
+    ('parse', '23andme'): (0.07, 10.0),
+    ('parse', 'vcf'): (0.05, 6.0),
+}
+BASE_COST = (0.02, 16 * MB)  # per request, whatever the upload
+GZIP_FACTOR = 4.0
+RETRY_AFTER_MAX_S = 120
+
+
+class Cost(NamedTuple):
+    cpu_s: float
+    mem_bytes: int
+
+
+def estimate(size: int, fmt: Optional[str], kind: str = 'analyze', gz: bool = False) -> Cost:
+    """Cost of one unit of work over an upload of `size` bytes.
+
+    kind is 'analyze', 'prepared' (analysis of an already-parsed genome) or
+    'parse'; an unknown format is costed as 23andMe, the dearest per byte.
+    """
+    cpu_mb, mem_b = COST_MODEL.get((kind, fmt)) or COST_MODEL[(kind, '23andme')]
+    size = size * (GZIP_FACTOR if gz else 1.0)
+    return Cost(BASE_COST[0] + cpu_mb * size / MB, int(BASE_COST[1] + mem_b * size))
+
+
+def upload_cost(upload_id: str, kind: str = 'analyze') -> Cost:
+    """estimate() for a stored upload: its size, and format / readiness as recorded by prepare.
+
+    kind='analyze' is costed as 'prepared' when the parsed genome is ready.
+    Raises FileNotFoundError for unknown uploads.
+    """
+    from .prepare import STATUS_READY, status
+    size = storage.upload_size(upload_id)
+    state = status(upload_id)
+    if kind == 'analyze' and state.get('status') == STATUS_READY:
+        kind = 'prepared'
+    gz = kind != 'prepared' and storage.load_upload_head(upload_id, 2) == b'\x1f\x8b'
+    return estimate(size, state.get('format'), kind, gz)
+
+
+class AdmissionRejected(RuntimeError):
+    """Over budget; resource is 'cpu' or 'memory', retry_after_s when to try again."""
+
+    def __init__(self, resource: str, retry_after_s: int):
+        super().__init__(f'over_{resource}_budget')
+        self.resource = resource
+        self.retry_after_s = retry_after_s
+
+
+class Ticket:
+    """Admitted work; release() (or leaving the with-block) returns its cost to the budget. Idempotent."""
+
+    def __init__(self, controller: 'Admission', key: int, cost: Cost):
+        self._controller = controller
+        self.key = key
+        self.cost = cost
+
+    def release(self) -> None:
+        self._controller._release(self.key)
+
+    def __enter__(self) -> 'Ticket':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
+
+
+class Admission:
+    def __init__(self, cpu_budget_s: float, mem_budget_bytes: int, workers: int = 1):
+        self.cpu_budget_s = cpu_budget_s
+        self.mem_budget_bytes = mem_budget_bytes
+        self.workers = max(1, workers)
+        self._lock = threading.Lock()
+        self._inflight: Dict[int, Cost] = {}
+        self._ids = itertools.count(1)
+        self._cpu = 0.0
+        self._mem = 0
+        self._admitted = 0
+
+    def _retry_after(self, excess_cpu_s: float) -> int:
+        # the pool burns about one CPU-second per worker per second
+        return min(RETRY_AFTER_MAX_S, max(1, math.ceil(excess_cpu_s / self.workers)))
+
+    def admit(self, cost: Cost, endpoint: str = 'analyze') -> Ticket:
+        """A ticket for cost, or AdmissionRejected if it does not fit right now."""
+        with self._lock:
+            if self._inflight:
+                if self.mem_budget_bytes > 0 and self._mem + cost.mem_bytes > self.mem_budget_bytes:
+                    rejected = AdmissionRejected('memory', self._retry_after(self._cpu))
+                elif self.cpu_budget_s > 0 and self._cpu + cost.cpu_s > self.cpu_budget_s:
+                    rejected = AdmissionRejected('cpu', self._retry_after(self._cpu + cost.cpu_s - self.cpu_budget_s))
+                else:
+                    rejected = None
+                if rejected is not None:
+                    REJECTED.inc(resource=rejected.resource, endpoint=endpoint)
+                    logger.info(f"event=admission_rejected endpoint={endpoint} resource={rejected.resource} "
+                                f"cpu_s={cost.cpu_s:.2f} mem_mb={cost.mem_bytes / MB:.0f} retry_after_s={rejected.retry_after_s}")
+                    raise rejected
+            key = next(self._ids)
+            self._inflight[key] = cost
+            self._cpu += cost.cpu_s
+            self._mem += cost.mem_bytes
+            self._admitted += 1
+            return Ticket(self, key, cost)
+
+    def _release(self, key: int) -> None:
+        with self._lock:
+            cost = self._inflight.pop(key, None)
+            if cost is None:
+                return
+            self._cpu -= cost.cpu_s
+            self._mem -= cost.mem_bytes
+            if not self._inflight:  # no float drift across long uptimes
+                self._cpu, self._mem = 0.0, 0
+
+    def retry_after(self) -> int:
+        """Seconds until the work in flight now has drained."""
+        with self._lock:
+            return self._retry_after(self._cpu)
+
+    def usage(self) -> Dict[str, float]:
+        with self._lock:
+            return {'cpu': round(self._cpu, 4), 'memory': self._mem}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'in_flight': len(self._inflight), 'cpu_s': round(self._cpu, 3), 'cpu_budget_s': self.cpu_budget_s,
+                    'mem_bytes': self._mem, 'mem_budget_bytes': self.mem_budget_bytes, 'admitted': self._admitted,
+                    'rejected': {r: sum(n for k, n in REJECTED._values.items() if k[0] == r) for r in ('cpu', 'memory')}}
+
+
+REJECTED = metrics.registry.register(metrics.Counter(
+    'greatjeans_admission_rejected_total', 'Requests turned away by admission control, by exhausted resource.',
+    ('resource', 'endpoint')))
+
+
+admission = Admission(ADMISSION_CPU_S, ADMISSION_MEM_MB * MB, pool.workers)
+
+metrics.registry.register(metrics.Gauge(
+    'greatjeans_admission_in_use', 'Estimated cost of admitted, unfinished work (cpu: seconds, memory: bytes).',
+    ('resource',), fn=admission.usage))
+metrics.registry.register(metrics.Gauge(
+    'greatjeans_admission_budget', 'Admission budget per API process (cpu: seconds, memory: bytes; 0 = unlimited).',
+    ('resource',), fn=lambda: {'cpu': admission.cpu_budget_s, 'memory': admission.mem_budget_bytes}))
+
+__all__ = ['Admission', 'AdmissionRejected', 'Ticket', 'Cost', 'COST_MODEL', 'estimate', 'upload_cost', 'admission', 'REJECTED']
@@ -1,24 +1,35 @@
 # analysis package init
 # All functions in this package must be pure (no network, no global mutation).
+# Exports resolve on first access (PEP 562): importing one submodule, e.g.
+# analysis.windows from the API, does not pull in NumPy through ss_model.
+from importlib import import_module
 
-from .annotate import join_annotations
-from .protein import build_protein_targets
-from .pgs import compute_pgs_bmi
-from .ss_model import predict_secondary_structure
-from .pipeline import run_analysis
-from .types import Variant, AnalysisConfig, AnalysisResult
-from .utils import normalize_genotype, dosage_for_effect, percentile_from_z
+_EXPORTS = {
+    'join_annotations': 'annotate',
+    'build_protein_targets': 'protein',
+    'compute_pgs_bmi': 'pgs',
+    'predict_secondary_structure': 'ss_model',
+    'run_analysis': 'pipeline',
+    'normalize_genotype': 'utils',
+    'dosage_for_effect': 'utils',
+    'percentile_from_z': 'utils',
+    'Variant': 'types',
+    'AnalysisConfig': 'types',
+    'AnalysisResult': 'types',
+}
 
-__all__ = [
-    'join_annotations',
-    'build_protein_targets',
-    'compute_pgs_bmi',
-    'predict_secondary_structure',
-    'run_analysis',
-    'normalize_genotype',
-    'dosage_for_effect',
-    'percentile_from_z',
-    'Variant',
-    'AnalysisConfig',
-    'AnalysisResult'
-]
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(f'.{module}', __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
+
+
+__all__ = list(_EXPORTS)
@@ -11,8 +11,6 @@ def join_annotations(variants: List[Variant], paths: Dict) -> Tuple[List[Dict],
     Returns (annotated_variants, notes). Traits are included in notes as a summary.
     Time complexity: O(N+M) for N variants, M traits.
     """
-    import time
-    t0 = time.time()
     data_dir = paths["data_dir"]
     traits_path = os.path.join(data_dir, "traits_catalog.csv")
     clinvar_path = os.path.join(data_dir, "clinvar_light.csv")
@@ -52,5 +50,4 @@ def join_annotations(variants: List[Variant], paths: Dict) -> Tuple[List[Dict],
             traits.append(trait_row)
     notes.append(f"Traits coverage: {sum(t['status']=='covered' for t in traits)}/{len(traits)} covered.")
     notes.append(f"Traits details: {traits}")
-    notes.append(f"timing:join_annotations:{(time.time()-t0)*1000:.1f}ms")
     return annotated_variants, notes
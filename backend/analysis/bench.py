@@ -0,0 +1,575 @@
+"""Benchmark suite for the analysis hot paths, on deterministic synthetic genomes.
+
+Generators (same seed -> same bytes):
+- synth_23andme(n): 23andMe raw-data text
+- synth_vcf(n, samples=1, gz=False): VCF, optionally multi-sample and/or gzipped
+
+Catalog rsids are spread through the synthetic genomes so annotation,
+traits and PGS do real work. Benchmarks (BENCHMARKS) time the parsers,
+qc_metrics, annotate_variants, build_traits_section, compute_bmi_pgs,
+predict_secondary_structure, JSON serialization and end-to-end /analyze
+through a TestClient. Each result records min/median/mean over `repeat`
+runs plus the process peak RSS and its growth during the runs, keyed
+"<name>@<n>" (size-independent benchmarks have no "@n") so runs can be
+diffed (see backend.analysis.perf_gate).
+
+The memory mode (run_memory) instead runs the pipeline once, stage by
+stage (MEMORY_STAGES: parse, VCF DataFrame conversion, result sections,
+annotation dicts, pydantic models, JSON encoding), under tracemalloc and
+peak-RSS tracking. It reports peak and retained allocation per stage and
+the top allocation sites, in the same keyed JSON layout.
+
+The startup mode (run_startup) imports the API in fresh interpreters: import
+time, first response, what the import left for later (DEFERRED_MODULES must
+stay unloaded) and a `python -X importtime` breakdown per package.
+
+    python -m backend.analysis.bench run [--sizes 10000 640000 5000000] [--repeat 3] [--only parse_23andme ...] [--out bench.json]
+    python -m backend.analysis.bench memory [--sizes 640000] [--format 23andme|vcf] [--top 10] [--out mem.json]
+    python -m backend.analysis.bench startup [--module backend.api] [--repeat 3] [--top 15] [--out startup.json]
+    python -m backend.analysis.bench generate --format vcf --n 640000 [--samples 4] [--gz] --out genome.vcf.gz
+"""
+from __future__ import annotations
+import gc
+import gzip
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+SIZES = (10_000, 640_000, 5_000_000)
+CHROMS = tuple(str(c) for c in range(1, 23)) + ('X', 'Y', 'MT')
+_GENOTYPES = ('AA', 'AG', 'GG', 'CC', 'CT', 'TT', 'AC', 'GT', '--', 'A', 'T')
+_GENOTYPE_P = (0.16, 0.14, 0.16, 0.14, 0.12, 0.14, 0.04, 0.04, 0.03, 0.015, 0.015)
+_VCF_GT = ('0/0', '0/1', '1/1', '0|1', '1|0', './.')
+_VCF_GT_P = (0.45, 0.25, 0.2, 0.04, 0.04, 0.02)
+_BASES = np.array(list('ACGT'))
+
+
+def _columns(n: int, seed: int, known: Sequence[str]):
+    """rsid/chrom/pos arrays for n sorted loci; `known` rsids replace evenly spaced rows."""
+    rng = np.random.default_rng(seed)
+    chrom_idx = np.sort(rng.integers(0, len(CHROMS), n))
+    pos = rng.integers(10_000, 248_000_000, n)
+    order = np.lexsort((pos, chrom_idx))
+    rsids = [f"rs{1_000_000 + i}" for i in range(n)]
+    if known and n:
+        step = max(1, n // len(known))
+        for k, rsid in enumerate(known[:n]):
+            rsids[min(n - 1, k * step)] = rsid
+    return rng, rsids, [CHROMS[i] for i in chrom_idx[order]], pos[order].tolist()
+
+
+def synth_23andme(n: int, seed: int = 0, known: Sequence[str] = ()) -> bytes:
+    """23andMe-style raw data with n genotyped loci."""
+    rng, rsids, chroms, pos = _columns(n, seed, known)
+    genotypes = rng.choice(_GENOTYPES, n, p=_GENOTYPE_P).tolist()
+    head = '# This data file generated by backend.analysis.bench (synthetic)\n# rsid\tchromosome\tposition\tgenotype\n'
+    body = '\n'.join(f"{r}\t{c}\t{p}\t{g}" for r, c, p, g in zip(rsids, chroms, pos, genotypes))
+    return (head + body + '\n').encode()
+
+
+def synth_vcf(n: int, seed: int = 0, samples: int = 1, gz: bool = False, known: Sequence[str] = ()) -> bytes:
+    """VCFv4.2 with n biallelic SNVs and `samples` GT columns; gzip-compressed if gz."""
+    rng, rsids, chroms, pos = _columns(n, seed, known)
+    ref_idx = rng.integers(0, 4, n)
+    ref = _BASES[ref_idx].tolist()
+    alt = _BASES[(ref_idx + rng.integers(1, 4, n)) % 4].tolist()
+    gts = rng.choice(_VCF_GT, (n, samples), p=_VCF_GT_P)
+    sample_cols = ['\t'.join(row) for row in gts.tolist()]
+    head = ['##fileformat=VCFv4.2', '##source=backend.analysis.bench',
+            '##FORMAT=<ID=GT,Number=1,Type=String,Description="Genotype">',
+            '\t'.join(['#CHROM', 'POS', 'ID', 'REF', 'ALT', 'QUAL', 'FILTER', 'INFO', 'FORMAT']
+                      + [f"S{i + 1}" for i in range(samples)])]
+    body = '\n'.join(f"{c}\t{p}\t{r}\t{a}\t{b}\t.\tPASS\t.\tGT\t{s}"
+                     for c, p, r, a, b, s in zip(chroms, pos, rsids, ref, alt, sample_cols))
+    data = ('\n'.join(head) + '\n' + body + '\n').encode()
+    return gzip.compress(data, 6, mtime=0) if gz else data
+
+
+def catalog_rsids() -> List[str]:
+    """rsids of every loaded catalog, so synthetic genomes hit annotation, traits and PGS."""
+    from ..engine import catalogs
+    seen = {}
+    for frame in (catalogs.traits, catalogs.clinvar, catalogs.pgs, catalogs.protein_map):
+        for rsid in frame['rsid']:
+            seen.setdefault(str(rsid), None)
+    return list(seen)
+
+
+# -- inputs, memoized for one size at a time ----------------------------------------
+
+@lru_cache(maxsize=1)
+def _raw_23andme(n: int) -> bytes:
+    return synth_23andme(n, known=catalog_rsids())
+
+
+@lru_cache(maxsize=3)
+def _raw_vcf(n: int, samples: int, gz: bool) -> bytes:
+    return synth_vcf(n, samples=samples, gz=gz, known=catalog_rsids())
+
+
+@lru_cache(maxsize=1)
+def _genome(n: int):
+    from ..parser_23andme import parse_23andme
+    return parse_23andme(_raw_23andme(n))
+
+
+def _clear_inputs() -> None:
+    for fn in (_raw_23andme, _raw_vcf, _genome):
+        fn.cache_clear()
+
+
+# -- benchmarks ----------------------------------------------------------------------
+
+class Bench(NamedTuple):
+    name: str
+    setup: Callable[[Optional[int]], Any]  # n -> state, untimed
+    run: Callable[[Any], Any]  # state -> anything, timed
+    sized: bool = True
+    reset: Optional[Callable[[Any], None]] = None  # untimed, before every run
+    teardown: Optional[Callable[[Any], None]] = None
+
+
+def _catalogs():
+    from ..engine import catalogs
+    return catalogs
+
+
+def _ss_window():
+    from ..engine import WINDOW_PATHS
+    from .windows import fetch_window_for_rsid
+    win = fetch_window_for_rsid('rs1042522', WINDOW_PATHS)  # TP53 P72R, shipped in aa_windows.json
+    if not win:
+        raise RuntimeError('no amino-acid window for rs1042522')
+    return win[0], win[1]
+
+
+def _serialize_state(n: int):
+    from ..engine import qc_metrics, AI_SUMMARY_PLACEHOLDER, DISCLAIMER
+    from ..annotate_local import annotate_variants, genome_window
+    df = _genome(n)
+    return {'qc': qc_metrics(df, '23andme'), 'genome_window': genome_window(df), 'variants': annotate_variants(df, _catalogs()),
+            'ai_summary': dict(AI_SUMMARY_PLACEHOLDER), 'disclaimer': DISCLAIMER}
+
+
+def _analyze_setup(n: int):
+    from fastapi.testclient import TestClient
+    from .. import storage
+    from ..api import app
+    # straight to storage: the 640k+ genomes exceed MAX_UPLOAD_MB
+    upload_id = storage.save_upload(_raw_23andme(n), 'bench_23andme.txt')
+    return TestClient(app), upload_id, storage.upload_digest(upload_id)
+
+
+def _analyze_reset(state) -> None:
+    from ..result_cache import cache
+    cache.invalidate(state[2])
+
+
+def _analyze_run(state) -> None:
+    client, upload_id, _ = state
+    r = client.post('/analyze', json={'upload_id': upload_id, 'run_traits': True, 'run_protein': True, 'run_pgs': True})
+    if r.status_code != 200:
+        raise RuntimeError(f"/analyze -> {r.status_code}: {r.text[:200]}")
+
+
+def _analyze_teardown(state) -> None:
+    from .. import storage
+    _analyze_reset(state)
+    storage.delete_upload(state[1])
+
+
+def _benchmarks() -> List[Bench]:
+    from ..parser_23andme import parse_23andme
+    from ..parser_vcf import parse_vcf
+    from ..engine import qc_metrics
+    from ..annotate_local import annotate_variants, build_traits_section
+    from ..pgs_calc import compute_bmi_pgs
+    from ..serialize import result_bytes
+    from .ss_model import predict_secondary_structure
+    return [
+        Bench('parse_23andme', _raw_23andme, parse_23andme),
+        Bench('parse_vcf', lambda n: _raw_vcf(n, 1, False), parse_vcf),
+        Bench('parse_vcf_gz', lambda n: _raw_vcf(n, 1, True), parse_vcf),
+        Bench('parse_vcf_multisample', lambda n: _raw_vcf(n, 4, False), parse_vcf),
+        Bench('qc_metrics', _genome, lambda df: qc_metrics(df, '23andme')),
+        Bench('annotate_variants', _genome, lambda df: annotate_variants(df, _catalogs())),
+        Bench('build_traits_section', _genome, lambda df: build_traits_section(df, _catalogs())),
+        Bench('compute_bmi_pgs', _genome, lambda df: compute_bmi_pgs(df, _catalogs())),
+        Bench('serialize_json', _serialize_state, result_bytes),
+        Bench('predict_secondary_structure', lambda n: _ss_window(), lambda w: predict_secondary_structure(*w), sized=False),
+        Bench('analyze_endpoint', _analyze_setup, _analyze_run, reset=_analyze_reset, teardown=_analyze_teardown),
+    ]
+
+
+BENCHMARKS = ('parse_23andme', 'parse_vcf', 'parse_vcf_gz', 'parse_vcf_multisample', 'qc_metrics', 'annotate_variants',
+              'build_traits_section', 'compute_bmi_pgs', 'serialize_json', 'predict_secondary_structure', 'analyze_endpoint')
+
+
+def _measure(bench: Bench, n: Optional[int], repeat: int) -> Dict[str, Any]:
+    from ..metrics import reset_peak_rss, peak_rss_bytes, rss_bytes
+    out: Dict[str, Any] = {'name': bench.name, 'n': n, 'repeat': repeat}
+    state = None
+    try:
+        state = bench.setup(n)
+        rss_reset = reset_peak_rss()
+        rss_before = rss_bytes()
+        runs = []
+        for _ in range(repeat):
+            if bench.reset is not None:
+                bench.reset(state)
+            gc.collect()
+            t0 = time.perf_counter()
+            bench.run(state)
+            runs.append(time.perf_counter() - t0)
+        out.update({'min_s': min(runs), 'median_s': statistics.median(runs), 'mean_s': statistics.fmean(runs),
+                    'runs_s': runs, 'peak_rss_mb': None, 'peak_rss_delta_mb': None})
+        if rss_reset:
+            peak = peak_rss_bytes()
+            out['peak_rss_mb'] = round(peak / 2**20, 1)
+            # growth over the inputs already resident: what the benchmarked call itself needed
+            out['peak_rss_delta_mb'] = round((peak - rss_before) / 2**20, 1) if rss_before is not None else None
+    except Exception as e:  # one failing (or OOM-ing) benchmark must not lose the rest of the run
+        out['error'] = f"{type(e).__name__}: {e}"
+    finally:
+        if state is not None and bench.teardown is not None:
+            bench.teardown(state)
+    return out
+
+
+def _meta(sizes: Sequence[int], repeat: int) -> Dict[str, Any]:
+    try:
+        rev = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except Exception:
+        rev = None
+    from ..serialize import orjson
+    return {'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()), 'git_rev': rev,
+            'python': platform.python_version(), 'platform': platform.platform(), 'cpu_count': os.cpu_count(),
+            'orjson': orjson is not None, 'sizes': list(sizes), 'repeat': repeat}
+
+
+def result_key(name: str, n: Optional[int]) -> str:
+    return name if n is None else f"{name}@{n}"
+
+
+def run_suite(sizes: Iterable[int] = SIZES, repeat: int = 3, only: Optional[Iterable[str]] = None,
+              log: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+    """Run the selected benchmarks at every size; {'meta': ..., 'results': {key: result}}."""
+    sizes = list(sizes)
+    selected = [b for b in _benchmarks() if only is None or b.name in set(only)]
+    results: Dict[str, Dict[str, Any]] = {}
+    plan = [(b, None) for b in selected if not b.sized] + [(b, n) for n in sizes for b in selected if b.sized]
+    for i, (b, n) in enumerate(plan):
+        r = results[result_key(b.name, n)] = _measure(b, n, repeat)
+        if log is not None:
+            log(format_row(r))
+        if n is not None and (i + 1 == len(plan) or plan[i + 1][1] != n):
+            _clear_inputs()  # only one size's inputs alive at a time
+    return {'meta': _meta(sizes, repeat), 'results': results}
+
+
+def format_row(r: Dict[str, Any]) -> str:
+    key = result_key(r['name'], r['n'])
+    if 'error' in r:
+        return f"{key:<36} ERROR {r['error']}"
+    rss = f"{r['peak_rss_mb']:>9.1f}" if r.get('peak_rss_mb') is not None else f"{'-':>9}"
+    return f"{key:<36} {r['min_s']:>9.4f} {r['median_s']:>9.4f} {rss}"
+
+
+# -- memory mode -----------------------------------------------------------------------
+
+MEMORY_STAGES = ('parse', 'dataframe', 'sections', 'annotate', 'pydantic', 'json_encode')
+
+
+def _memory_pipeline(fmt: str) -> List[tuple]:
+    """(stage, fn(state) -> None) in pipeline order; every output stays alive in state."""
+    import pandas as pd
+    from ..parser_23andme import parse_23andme
+    from ..parser_vcf import parse_vcf
+    from ..engine import qc_metrics, AI_SUMMARY_PLACEHOLDER, DISCLAIMER
+    from ..annotate_local import annotate_variants, build_traits_section, build_protein_block, genome_window
+    from ..pgs_calc import compute_bmi_pgs
+    from ..models import ResultJSON
+    from ..serialize import result_bytes
+    cat = _catalogs()
+
+    def sections(s):
+        df = s['df']
+        s['sections'] = {'qc': qc_metrics(df, fmt), 'genome_window': genome_window(df), 'traits': build_traits_section(df, cat),
+                         'protein': build_protein_block(df, cat, None), 'pgs': compute_bmi_pgs(df, cat),
+                         'ai_summary': dict(AI_SUMMARY_PLACEHOLDER), 'disclaimer': DISCLAIMER}
+
+    stages = []
+    if fmt == 'vcf':
+        stages.append(('parse', lambda s: s.update(records=parse_vcf(s['raw']))))
+        stages.append(('dataframe', lambda s: s.update(df=pd.DataFrame(s['records']))))
+    else:  # parse_23andme builds its DataFrame directly
+        stages.append(('parse', lambda s: s.update(df=parse_23andme(s['raw']))))
+    stages += [
+        ('sections', sections),
+        ('annotate', lambda s: s.update(variants=annotate_variants(s['df'], cat))),
+        # the legacy response path: one Variant model per row
+        ('pydantic', lambda s: s.update(model=ResultJSON(**s['sections'], variants=s['variants']))),
+        ('json_encode', lambda s: s.update(body=result_bytes({**s['sections'], 'variants': s['variants']}))),
+    ]
+    return stages
+
+
+def _short_path(filename: str) -> str:
+    parts = Path(filename).parts
+    if 'site-packages' in parts:
+        return '/'.join(parts[parts.index('site-packages') + 1:])
+    root = Path(__file__).resolve().parents[2]
+    try:
+        return str(Path(filename).resolve().relative_to(root))
+    except ValueError:
+        return filename
+
+
+def _site_totals() -> Dict[str, tuple]:
+    """{'file:line': (bytes, blocks)} of live traced memory; the snapshot itself is dropped at once."""
+    import tracemalloc
+    # leave out tracemalloc's and this module's own bookkeeping (e.g. the previous site totals)
+    snapshot = tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)])
+    return {f"{_short_path(st.traceback[0].filename)}:{st.traceback[0].lineno}": (st.size, st.count)
+            for st in snapshot.statistics('lineno')}
+
+
+def _top_sites(after: Dict[str, tuple], before: Dict[str, tuple], top: int) -> List[Dict[str, Any]]:
+    growth = sorted(((size - before.get(site, (0, 0))[0], count - before.get(site, (0, 0))[1], site)
+                     for site, (size, count) in after.items()), reverse=True)
+    return [{'site': site, 'size_mb': round(size / 2**20, 2), 'count': count} for size, count, site in growth[:top] if size > 0]
+
+
+def run_memory(sizes: Iterable[int] = SIZES, fmt: str = '23andme', top: int = 10,
+               log: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+    """Run the pipeline stage by stage under tracemalloc and peak-RSS tracking.
+
+    Per stage: peak_alloc_mb (tracemalloc peak above the stage's start),
+    retained_mb (traced memory the stage leaves alive), rss_peak_mb /
+    rss_growth_mb (VmHWM, inflated by tracemalloc's own bookkeeping) and
+    the `top` allocation sites by retained size. Keys are "<stage>@<n>".
+    """
+    import tracemalloc
+    from ..metrics import reset_peak_rss, peak_rss_bytes, rss_bytes
+    sizes = list(sizes)
+    results: Dict[str, Dict[str, Any]] = {}
+    for n in sizes:
+        state = {'raw': synth_vcf(n, known=catalog_rsids()) if fmt == 'vcf' else synth_23andme(n, known=catalog_rsids())}
+        gc.collect()
+        tracemalloc.start()
+        try:
+            sites = _site_totals() if top else None
+            for stage, fn in _memory_pipeline(fmt):
+                out: Dict[str, Any] = {'name': stage, 'n': n, 'format': fmt}
+                gc.collect()
+                tracemalloc.reset_peak()
+                start = tracemalloc.get_traced_memory()[0]
+                rss_reset, rss_before = reset_peak_rss(), rss_bytes()
+                t0 = time.perf_counter()
+                try:
+                    fn(state)
+                except Exception as e:  # e.g. MemoryError at 5M: keep the stages measured so far
+                    out['error'] = f"{type(e).__name__}: {e}"
+                    results[result_key(stage, n)] = out
+                    break
+                out['seconds'] = round(time.perf_counter() - t0, 4)
+                current, peak = tracemalloc.get_traced_memory()
+                out.update(peak_alloc_mb=round((peak - start) / 2**20, 2), retained_mb=round((current - start) / 2**20, 2),
+                           rss_peak_mb=None, rss_growth_mb=None)
+                if rss_reset and rss_before is not None:
+                    out['rss_peak_mb'] = round(peak_rss_bytes() / 2**20, 1)
+                    out['rss_growth_mb'] = round((peak_rss_bytes() - rss_before) / 2**20, 1)
+                if top:
+                    after = _site_totals()
+                    out['top'] = _top_sites(after, sites, top)
+                    sites = after
+                results[result_key(stage, n)] = out
+                if log is not None:
+                    log(format_memory_row(out))
+        finally:
+            tracemalloc.stop()
+            state.clear()
+            gc.collect()
+    return {'meta': {**_meta(sizes, 1), 'mode': 'memory', 'format': fmt, 'top': top}, 'results': results}
+
+
+def format_memory_row(r: Dict[str, Any]) -> str:
+    key = result_key(r['name'], r['n'])
+    if 'error' in r:
+        return f"{key:<24} ERROR {r['error']}"
+    rss = f"{r['rss_growth_mb']:>10.1f}" if r.get('rss_growth_mb') is not None else f"{'-':>10}"
+    site = r['top'][0]['site'] if r.get('top') else ''
+    return f"{key:<24} {r['seconds']:>8.3f} {r['peak_alloc_mb']:>10.1f} {r['retained_mb']:>10.1f} {rss}  {site}"
+
+
+# -- startup mode ----------------------------------------------------------------------
+
+STARTUP_MODULE = 'backend.api'
+# heavy imports the API must defer to first use (scale-from-zero pays for them only when needed)
+DEFERRED_MODULES = ('pandas', 'numpy', 'httpx', 'cyvcf2', 'backend.analysis.ss_model')
+STARTUP_BUDGET_S = 1.0  # `import backend.api` in a fresh interpreter, min over runs (tests/test_bench.py)
+
+_STARTUP_CHILD = '''
+import json, sys, time
+t0 = time.perf_counter()
+__import__(sys.argv[1])  # an import statement: -X importtime reports importlib.import_module's target only as its children
+module = sys.modules[sys.argv[1]]
+t1 = time.perf_counter()
+sys.stderr.write("--imported--\\n")
+loaded = [m for m in json.loads(sys.argv[2]) if m in sys.modules]
+first_request_s = None
+if hasattr(module, "app"):
+    from fastapi.testclient import TestClient
+    client = TestClient(module.app)
+    t2 = time.perf_counter()
+    client.get("/health")
+    first_request_s = time.perf_counter() - t2
+from backend.workers import preload_modules
+t3 = time.perf_counter()
+preload_modules()
+print(json.dumps({"import_s": t1 - t0, "first_request_s": first_request_s, "deferred_import_s": time.perf_counter() - t3, "loaded": loaded}))
+'''
+
+
+def _import_times(stderr: str) -> Dict[str, tuple]:
+    """module -> (self_us, cumulative_us) from `python -X importtime` output, up to the child's marker."""
+    out = {}
+    for line in stderr.splitlines():
+        if line.startswith('--imported--'):
+            break
+        if line.startswith('import time:') and 'cumulative' not in line:
+            head, cumulative_us, name = line.split('|')
+            out[name.strip()] = (int(head.split(':')[1]), int(cumulative_us))
+    return out
+
+
+def _package(module: str) -> str:
+    # backend modules are reported one by one, third-party code per top-level package
+    return module if module.startswith('backend.') else module.split('.', 1)[0]
+
+
+def run_startup(module: str = STARTUP_MODULE, repeat: int = 3, top: int = 15,
+                log: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+    """Cold-start cost of importing `module` in fresh interpreters, `python -X importtime`-style.
+
+    'startup' holds the min over `repeat` runs of import_s (timed without
+    -X importtime, which adds its own overhead), first_request_s (GET /health
+    through a TestClient when the module has an `app`), deferred_import_s
+    (importing workers.FORK_PRELOAD afterwards: the cost moved to the first
+    analysis) and which DEFERRED_MODULES the import loaded anyway.
+    'import:<package>' rows hold the self time of every module of a
+    third-party package (backend modules one by one), the `top` largest.
+    """
+    import json
+    import tempfile
+    root = Path(__file__).resolve().parents[2]
+    with tempfile.TemporaryDirectory(prefix='greatjeans-startup-') as tmp:
+        env = {**os.environ, 'STORAGE_ROOT': tmp, 'PYTHONPATH': str(root), 'LOG_LEVEL': 'WARNING'}
+
+        def child(*flags: str):
+            proc = subprocess.run([sys.executable, *flags, '-c', _STARTUP_CHILD, module, json.dumps(DEFERRED_MODULES)],
+                                  cwd=root, env=env, capture_output=True, text=True, timeout=300)
+            if proc.returncode != 0:
+                raise RuntimeError(f'importing {module} failed: {proc.stderr.strip().splitlines()[-1:]}')
+            return json.loads(proc.stdout.strip().splitlines()[-1]), proc.stderr
+
+        timings = [child()[0] for _ in range(repeat)]
+        profiles = [_import_times(child('-X', 'importtime')[1]) for _ in range(repeat)]
+    best = lambda key: None if timings[0][key] is None else round(min(t[key] for t in timings), 4)
+    results: Dict[str, Dict[str, Any]] = {'startup': {
+        'name': 'startup', 'n': None, 'module': module, 'import_s': best('import_s'), 'first_request_s': best('first_request_s'),
+        'deferred_import_s': best('deferred_import_s'), 'loaded': timings[0]['loaded'], 'budget_s': STARTUP_BUDGET_S}}
+    packages: Dict[str, int] = {}
+    for name in profiles[0]:
+        if all(name in p for p in profiles):
+            self_us = min(p[name][0] for p in profiles)
+            packages[_package(name)] = packages.get(_package(name), 0) + self_us
+    total_us = min(p[module][1] for p in profiles)
+    for package, self_us in sorted(packages.items(), key=lambda kv: -kv[1])[:top]:
+        results[f'import:{package}'] = {'name': f'import:{package}', 'n': None, 'self_s': round(self_us / 1e6, 4),
+                                        'share': round(self_us / max(1, total_us), 3)}
+    if log is not None:
+        for r in results.values():
+            log(format_startup_row(r))
+    return {'meta': {**_meta([], repeat), 'mode': 'startup', 'module': module, 'importtime_total_s': round(total_us / 1e6, 4)},
+            'results': results}
+
+
+def format_startup_row(r: Dict[str, Any]) -> str:
+    if r['name'] == 'startup':
+        first = f"{r['first_request_s']:.4f}" if r['first_request_s'] is not None else '-'
+        loaded = f"  loaded: {', '.join(r['loaded'])}" if r['loaded'] else ''
+        return (f"{r['module']:<36} import {r['import_s']:.4f}s (budget {r['budget_s']}s)  first request {first}s  "
+                f"deferred imports {r['deferred_import_s']:.4f}s{loaded}")
+    return f"{r['name']:<36} {r['self_s']:>9.4f} {r['share'] * 100:>6.1f}%"
+
+
+def _main(argv=None) -> None:
+    import argparse
+    import json
+    parser = argparse.ArgumentParser(prog='python -m backend.analysis.bench')
+    sub = parser.add_subparsers(dest='command', required=True)
+    run = sub.add_parser('run', help='run the benchmark suite')
+    run.add_argument('--sizes', type=int, nargs='+', default=list(SIZES))
+    run.add_argument('--repeat', type=int, default=3)
+    run.add_argument('--only', nargs='+', choices=BENCHMARKS)
+    run.add_argument('--out', help='write JSON results here (default: stdout)')
+    mem = sub.add_parser('memory', help='per-stage allocation profile under tracemalloc')
+    mem.add_argument('--sizes', type=int, nargs='+', default=[640_000])
+    mem.add_argument('--format', choices=['23andme', 'vcf'], default='23andme')
+    mem.add_argument('--top', type=int, default=10, help='allocation sites per stage (0: skip snapshots, saves memory)')
+    mem.add_argument('--out', help='write JSON results here (default: stdout)')
+    start = sub.add_parser('startup', help='cold-start import profile of the API (python -X importtime, per package)')
+    start.add_argument('--module', default=STARTUP_MODULE)
+    start.add_argument('--repeat', type=int, default=3)
+    start.add_argument('--top', type=int, default=15, help='packages listed, by self import time')
+    start.add_argument('--out', help='write JSON results here (default: stdout)')
+    gen = sub.add_parser('generate', help='write a synthetic genome')
+    gen.add_argument('--format', choices=['23andme', 'vcf'], default='23andme')
+    gen.add_argument('--n', type=int, default=10_000)
+    gen.add_argument('--samples', type=int, default=1)
+    gen.add_argument('--gz', action='store_true')
+    gen.add_argument('--seed', type=int, default=0)
+    gen.add_argument('--out', required=True)
+    args = parser.parse_args(argv)
+
+    if args.command == 'generate':
+        if args.format == 'vcf':
+            data = synth_vcf(args.n, args.seed, args.samples, args.gz, known=catalog_rsids())
+        else:
+            data = synth_23andme(args.n, args.seed, known=catalog_rsids())
+            data = gzip.compress(data, 6, mtime=0) if args.gz else data
+        with open(args.out, 'wb') as f:
+            f.write(data)
+        return
+    log = lambda line: print(line, file=sys.stderr)
+    if args.command == 'startup':
+        report = run_startup(args.module, args.repeat, args.top, log=log)
+    elif args.command == 'memory':
+        print(f"{'stage':<24} {'seconds':>8} {'peak_MB':>10} {'kept_MB':>10} {'rss_MB':>10}  top site", file=sys.stderr)
+        report = run_memory(args.sizes, args.format, args.top, log=log)
+    else:
+        print(f"{'benchmark':<36} {'min_s':>9} {'median_s':>9} {'peak_MB':>9}", file=sys.stderr)
+        report = run_suite(args.sizes, args.repeat, args.only, log=log)
+    text = json.dumps(report, indent=1)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    _main()
+
+__all__ = ['SIZES', 'BENCHMARKS', 'MEMORY_STAGES', 'Bench', 'synth_23andme', 'synth_vcf', 'catalog_rsids', 'run_suite', 'run_memory',
+           'result_key', 'format_row', 'format_memory_row', 'STARTUP_MODULE', 'DEFERRED_MODULES', 'STARTUP_BUDGET_S',
+           'run_startup', 'format_startup_row']
@@ -0,0 +1,145 @@
+"""Random access to a protein FASTA through a .fai-style offset index.
+
+The index has one tab-separated line per record, as written by `samtools faidx`:
+NAME, LENGTH, OFFSET, LINEBASES, LINEWIDTH. For UniProt headers
+(">sp|P04637|P53_HUMAN ...") NAME is the accession, so lookups go by
+protein_map.csv's `uniprot` column. The FASTA is mmap'd and any subsequence is
+one contiguous slice, i.e. O(1) disk reads per fetch.
+
+The .fai is written to a temp file and renamed into place, so processes
+building it at the same time never read a partial index. Where the data
+directory is read-only, the index is built in memory (once per process).
+
+    python -m backend.analysis.fasta index path/to/uniprot.fasta
+"""
+from __future__ import annotations
+import logging
+import mmap
+import os
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class FaiEntry(NamedTuple):
+    length: int
+    offset: int
+    linebases: int
+    linewidth: int
+
+
+def record_name(header: str) -> str:
+    """'>sp|P04637|P53_HUMAN Cellular tumor antigen p53' -> 'P04637'."""
+    fields = header.lstrip('>').split(None, 1)
+    token = fields[0] if fields else ''
+    parts = token.split('|')
+    if len(parts) >= 3 and parts[0] in ('sp', 'tr'):
+        return parts[1]
+    return token
+
+
+def fai_path(fasta_path: str | Path) -> Path:
+    return Path(str(fasta_path) + '.fai')
+
+
+def scan_fai(fasta_path: str | Path) -> List[Tuple[str, int, int, int, int]]:
+    """Scan the FASTA once; one (name, length, offset, linebases, linewidth) row per record."""
+    out = []
+    name = None
+    length = offset = linebases = linewidth = 0
+    pos = 0
+    with open(fasta_path, 'rb') as f:
+        for line in f:
+            if line.startswith(b'>'):
+                if name is not None:
+                    out.append((name, length, offset, linebases, linewidth))
+                name = record_name(line.decode(errors='ignore').strip())
+                length = linebases = linewidth = 0
+                offset = pos + len(line)
+            elif name is not None:
+                bases = len(line.rstrip(b'\r\n'))
+                if linebases == 0:
+                    linebases, linewidth = bases, len(line)
+                length += bases
+            pos += len(line)
+    if name is not None:
+        out.append((name, length, offset, linebases, linewidth))
+    return out
+
+
+def build_fai(fasta_path: str | Path) -> Path:
+    """Write the FASTA's .fai next to it, atomically."""
+    path = fai_path(fasta_path)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=path.name + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.writelines('\t'.join(map(str, row)) + '\n' for row in scan_fai(fasta_path))
+        os.chmod(tmp, 0o644)  # mkstemp creates 0600
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return path
+
+
+def read_fai(path: str | Path) -> Dict[str, FaiEntry]:
+    index = {}
+    with open(path) as f:
+        for line in f:
+            parts = line.rstrip('\n').split('\t')
+            if len(parts) >= 5:
+                index[parts[0]] = FaiEntry(*map(int, parts[1:5]))
+    return index
+
+
+class IndexedFasta:
+    """mmap-backed FASTA with O(1) subsequence fetches. Builds the .fai if missing."""
+
+    def __init__(self, fasta_path: str | Path):
+        self.path = Path(fasta_path)
+        idx = fai_path(self.path)
+        self.index = None
+        if not idx.exists() or idx.stat().st_mtime < self.path.stat().st_mtime:
+            try:
+                build_fai(self.path)
+            except OSError as e:  # e.g. read-only data dir
+                logger.warning(f"event=fai_in_memory fasta={self.path} err={e}")
+                self.index = {row[0]: FaiEntry(*row[1:]) for row in scan_fai(self.path)}
+        if self.index is None:
+            self.index = read_fai(idx)
+        self._file = open(self.path, 'rb')
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.index
+
+    def length(self, name: str) -> int:
+        return self.index[name].length
+
+    def _byte_offset(self, e: FaiEntry, i: int) -> int:
+        return e.offset + (i // e.linebases) * e.linewidth + i % e.linebases
+
+    def fetch(self, name: str, start: int, end: int) -> str:
+        """Residues [start, end) (0-based, clipped to the record) of record `name`."""
+        e = self.index[name]
+        start, end = max(0, start), min(end, e.length)
+        if end <= start:
+            return ''
+        chunk = self._mm[self._byte_offset(e, start):self._byte_offset(e, end - 1) + 1]
+        return chunk.replace(b'\n', b'').replace(b'\r', b'').decode('ascii').upper()
+
+    def close(self) -> None:
+        self._mm.close()
+        self._file.close()
+
+
+__all__ = ['FaiEntry', 'IndexedFasta', 'scan_fai', 'build_fai', 'read_fai', 'fai_path', 'record_name']
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] != 'index':
+        print("usage: python -m backend.analysis.fasta index <fasta>")
+        raise SystemExit(2)
+    print(build_fai(sys.argv[2]))
@@ -0,0 +1,149 @@
+"""Performance regression gate: benchmark results vs a committed baseline.
+
+The baseline (tests/perf_baseline.json) stores, per benchmark key of
+backend.analysis.bench, the min time and peak-RSS growth of a reference
+run, each with a relative tolerance. A metric regresses when
+
+    current > baseline * (1 + tolerance) + floor
+
+where the absolute floors (FLOOR_S, FLOOR_MB) keep millisecond-scale
+benchmarks from failing on timer and allocator noise. `pytest -m perf`
+runs the gate (tests/test_perf.py); it is excluded from the default run.
+
+    python -m backend.analysis.perf_gate run [--baseline tests/perf_baseline.json]
+    python -m backend.analysis.perf_gate compare bench.json [--baseline ...]
+    python -m backend.analysis.perf_gate update [--baseline ...]   # re-record after an intended change
+
+Timings are machine-specific: re-record the baseline on the machine that
+runs the gate, and commit it with the change that moved the numbers.
+"""
+from __future__ import annotations
+import json
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from .bench import run_suite
+
+BASELINE_PATH = Path(__file__).resolve().parents[2] / 'tests' / 'perf_baseline.json'
+GATE_SIZE = 100_000
+GATE_REPEAT = 3
+# hot paths under the gate (benchmark name -> (time tolerance, memory tolerance))
+GATED = {
+    'parse_23andme': (0.5, 0.5),
+    'parse_vcf': (0.5, 0.5),
+    'parse_vcf_gz': (0.5, 0.5),
+    'qc_metrics': (0.5, 0.5),
+    'annotate_variants': (0.5, 0.5),
+    'build_traits_section': (0.5, 0.5),
+    'compute_bmi_pgs': (0.5, 0.5),
+    'serialize_json': (0.5, 0.5),
+    'predict_secondary_structure': (1.0, 0.5),
+}
+FLOOR_S = 0.005
+FLOOR_MB = 16.0
+METRICS = (('min_s', 'time_tolerance', FLOOR_S), ('peak_rss_delta_mb', 'memory_tolerance', FLOOR_MB))
+
+
+class Row(NamedTuple):
+    key: str
+    metric: str
+    baseline: Optional[float]
+    current: Optional[float]
+    limit: Optional[float]
+    status: str  # ok | improved | REGRESSED | missing | error
+
+    @property
+    def failed(self) -> bool:
+        return self.status in ('REGRESSED', 'missing', 'error')
+
+
+def load_baseline(path: Path = BASELINE_PATH) -> Dict[str, Any]:
+    with open(path) as f:
+        return json.load(f)
+
+
+def make_baseline(report: Dict[str, Any]) -> Dict[str, Any]:
+    """Baseline document from a bench.run_suite() report of the gated benchmarks."""
+    benchmarks = {}
+    for key, r in sorted(report['results'].items()):
+        if 'error' in r or r['name'] not in GATED:
+            continue
+        time_tol, mem_tol = GATED[r['name']]
+        benchmarks[key] = {'min_s': round(r['min_s'], 6), 'peak_rss_delta_mb': r.get('peak_rss_delta_mb'),
+                           'time_tolerance': time_tol, 'memory_tolerance': mem_tol}
+    return {'meta': report['meta'], 'benchmarks': benchmarks}
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any]) -> List[Row]:
+    """One Row per (baseline benchmark, metric)."""
+    rows = []
+    results = report['results']
+    for key, base in baseline['benchmarks'].items():
+        r = results.get(key)
+        for metric, tol_key, floor in METRICS:
+            expected = base.get(metric)
+            if expected is None:
+                continue
+            if r is None or 'error' in r:
+                rows.append(Row(key, metric, expected, None, None, 'missing' if r is None else 'error'))
+                continue
+            current = r.get(metric)
+            if current is None:  # e.g. no /proc: memory not measurable here
+                continue
+            limit = expected * (1 + base.get(tol_key, 0.5)) + floor
+            status = 'REGRESSED' if current > limit else 'improved' if current < expected * 0.8 - floor else 'ok'
+            rows.append(Row(key, metric, expected, current, limit, status))
+    return rows
+
+
+def format_table(rows: List[Row]) -> str:
+    lines = [f"{'benchmark':<36} {'metric':<18} {'baseline':>10} {'current':>10} {'change':>8} {'limit':>10}  status"]
+    for row in rows:
+        change = f"{(row.current / row.baseline - 1) * 100:>+7.0f}%" if row.current is not None and row.baseline else f"{'-':>8}"
+        cur = f"{row.current:>10.4f}" if row.current is not None else f"{'-':>10}"
+        lim = f"{row.limit:>10.4f}" if row.limit is not None else f"{'-':>10}"
+        lines.append(f"{row.key:<36} {row.metric:<18} {row.baseline:>10.4f} {cur} {change} {lim}  {row.status}")
+    return '\n'.join(lines)
+
+
+def run_gate(baseline: Dict[str, Any], log=None) -> Dict[str, Any]:
+    """Run just the benchmarks (and size) the baseline covers."""
+    names = sorted({key.split('@')[0] for key in baseline['benchmarks']})
+    meta = baseline.get('meta', {})
+    return run_suite(meta.get('sizes', [GATE_SIZE]), meta.get('repeat', GATE_REPEAT), only=names, log=log)
+
+
+def _main(argv=None) -> int:
+    import argparse
+    import sys
+    parser = argparse.ArgumentParser(prog='python -m backend.analysis.perf_gate')
+    parser.add_argument('command', choices=['run', 'compare', 'update'])
+    parser.add_argument('report', nargs='?', help='bench JSON to compare (compare only)')
+    parser.add_argument('--baseline', type=Path, default=BASELINE_PATH)
+    args = parser.parse_args(argv)
+    log = lambda line: print(line, file=sys.stderr)
+
+    if args.command == 'update':
+        report = run_suite([GATE_SIZE], GATE_REPEAT, only=list(GATED), log=log)
+        args.baseline.write_text(json.dumps(make_baseline(report), indent=1) + '\n')
+        print(f"wrote {args.baseline}")
+        return 0
+    baseline = load_baseline(args.baseline)
+    if args.command == 'compare':
+        if not args.report:
+            parser.error('compare needs a bench JSON report')
+        report = json.loads(Path(args.report).read_text())
+    else:
+        report = run_gate(baseline, log=log)
+    rows = compare(report, baseline)
+    print(format_table(rows))
+    failed = [r for r in rows if r.failed]
+    print(f"{len(failed)} regression(s)" if failed else 'no regressions')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(_main())
+
+__all__ = ['BASELINE_PATH', 'GATED', 'GATE_SIZE', 'FLOOR_S', 'FLOOR_MB', 'Row', 'load_baseline', 'make_baseline', 'compare',
+           'format_table', 'run_gate']
@@ -10,8 +10,6 @@ def compute_pgs_bmi(variants: List[Variant], paths: Dict) -> Tuple[Dict, List[st
     Handles missing variants gracefully.
     Time complexity: O(N+M) for N variants, M SNPs.
     """
-    import time
-    t0 = time.time()
     data_dir = paths["data_dir"]
     pgs_path = os.path.join(data_dir, "pgs_bmi_small.csv")
     notes = []
@@ -55,5 +53,4 @@ def compute_pgs_bmi(variants: List[Variant], paths: Dict) -> Tuple[Dict, List[st
         }
     }
     notes.append(f"missing_snps: {missing_snps}")
-    notes.append(f"timing:compute_pgs_bmi:{(time.time()-t0)*1000:.1f}ms")
     return result, notes
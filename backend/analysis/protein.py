@@ -12,8 +12,6 @@ def build_protein_targets(
     Returns (protein_object, notes).
     Time complexity: O(N+M) for N variants, M protein rows.
     """
-    import time
-    t0 = time.time()
     data_dir = paths["data_dir"]
     protein_map_path = os.path.join(data_dir, "protein_map.csv")
     notes = []
@@ -42,7 +40,6 @@ def build_protein_targets(
         chosen = candidates[0]
 
     if not chosen:
-        notes.append(f"timing:build_protein_targets:{(time.time()-t0)*1000:.1f}ms")
         return None, ["no_protein_mapped"]
 
     # Build protein object
@@ -59,5 +56,4 @@ def build_protein_targets(
                 "index": int(r["residue_index"]),
                 "protein_change": r["protein_change"]
             })
-    notes.append(f"timing:build_protein_targets:{(time.time()-t0)*1000:.1f}ms")
     return protein_obj, notes
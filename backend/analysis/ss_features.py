@@ -0,0 +1,127 @@
+"""Per-residue feature extraction for the ESM-lite secondary structure head.
+
+Each residue is described by a 7-residue context window. Every window slot
+contributes a one-hot amino acid (20), physicochemical properties (7) and a
+BLOSUM62 row (20); the window is then pooled with mean/std. Unknown residues
+and padding ('X') encode as zeros.
+
+The layout is versioned by FEATURE_SCHEMA_VERSION: any change to the tables,
+window size or ordering below must bump it so stale model artifacts fail fast
+instead of silently scoring garbage.
+Time complexity: O(L) for sequence length L.
+"""
+from __future__ import annotations
+import numpy as np
+
+FEATURE_SCHEMA_VERSION = 1
+
+AA_ORDER = 'ACDEFGHIKLMNPQRSTVWY'
+AA_TO_IDX = {aa: i for i, aa in enumerate(AA_ORDER)}
+WINDOW_SIZE = 7
+
+# hydropathy, charge, polarity, mass, aromatic, isPro, isGly
+PHYSICO_PROPS = {
+    'A': [1.8, 0, 0, 89, 0, 0, 0],
+    'C': [2.5, 0, 0, 121, 0, 0, 0],
+    'D': [-3.5, -1, 1, 133, 0, 0, 0],
+    'E': [-3.5, -1, 1, 147, 0, 0, 0],
+    'F': [2.8, 0, 0, 165, 1, 0, 0],
+    'G': [-0.4, 0, 0, 75, 0, 0, 1],
+    'H': [-3.2, 0.5, 1, 155, 1, 0, 0],
+    'I': [4.5, 0, 0, 131, 0, 0, 0],
+    'K': [-3.9, 1, 1, 146, 0, 0, 0],
+    'L': [3.8, 0, 0, 131, 0, 0, 0],
+    'M': [1.9, 0, 0, 149, 0, 0, 0],
+    'N': [-3.5, 0, 1, 132, 0, 0, 0],
+    'P': [-1.6, 0, 0, 115, 0, 1, 0],
+    'Q': [-3.5, 0, 1, 146, 0, 0, 0],
+    'R': [-4.5, 1, 1, 174, 0, 0, 0],
+    'S': [-0.8, 0, 1, 105, 0, 0, 0],
+    'T': [-0.7, 0, 1, 119, 0, 0, 0],
+    'V': [4.2, 0, 0, 117, 0, 0, 0],
+    'W': [-0.9, 0, 0, 204, 1, 0, 0],
+    'Y': [-1.3, 0, 1, 181, 1, 0, 0],
+}
+
+# Simplified BLOSUM62 rows
+BLOSUM62 = {
+    'A': [4, -1, -2, -2, 0, -1, -1, 0, -2, -1, -1, -1, -1, -2, -1, 1, 0, -3, -2, 0],
+    'C': [-1, 9, -3, -4, -2, -3, -3, -1, -3, -1, -1, -3, -3, -3, -3, -1, -1, -2, -2, -1],
+    'D': [-2, -3, 6, 2, -3, -1, -1, -3, -1, -4, -3, 1, -1, 0, -2, 0, -1, -4, -3, -3],
+    'E': [-2, -4, 2, 5, -3, -2, 0, -3, 1, -3, -2, 0, -1, 2, 0, 0, -1, -3, -2, -2],
+    'F': [0, -2, -3, -3, 6, -3, -1, 0, -3, 0, 0, -3, -4, -3, -3, -2, -2, 1, 3, -1],
+    'G': [-1, -3, -1, -2, -3, 6, -2, 0, -2, -4, -4, -2, -3, -2, -2, 0, -2, -2, -3, -3],
+    'H': [-1, -3, -1, 0, -1, -2, 8, -3, -1, -3, -2, 1, -2, 0, 0, -1, -2, -2, 2, -3],
+    'I': [0, -1, -3, -3, 0, 0, -3, 4, -3, 2, 1, -3, -3, -3, -3, -2, -1, -3, -1, 3],
+    'K': [-2, -3, -1, 1, -3, -2, -1, -3, 5, -2, -1, 0, -1, 1, 2, 0, -1, -3, -2, -2],
+    'L': [-1, -1, -4, -3, 0, -4, -3, 2, -2, 4, 2, -3, -3, -2, -2, -2, -1, -2, -1, 1],
+    'M': [-1, -1, -3, -2, 0, -4, -2, 1, -1, 2, 5, -2, -2, 0, -1, -1, -1, -1, -1, 1],
+    'N': [-1, -3, 1, 0, -3, -2, 1, -3, 0, -3, -2, 6, -2, 0, 0, 1, 0, -4, -2, -3],
+    'P': [-1, -3, -1, -1, -4, -3, -2, -3, -1, -3, -2, -2, 7, -1, -2, -1, -1, -4, -3, -2],
+    'Q': [-2, -3, 0, 2, -3, -2, 0, -3, 1, -2, 0, 0, -1, 5, 1, 0, -1, -2, -1, -2],
+    'R': [-1, -3, -2, 0, -3, -2, 0, -3, 2, -2, -1, 0, -2, 1, 5, -1, -1, -3, -2, -3],
+    'S': [1, -1, 0, 0, -2, 0, -1, -2, 0, -2, -1, 1, -1, 0, -1, 4, 1, -3, -2, -2],
+    'T': [0, -1, -1, -1, -2, -2, -2, -1, -1, -1, -1, 0, -1, -1, -1, 1, 5, -2, -2, 0],
+    'V': [-3, -2, -4, -3, 1, -2, -2, -3, -3, -2, -1, -4, -4, -2, -3, -3, -2, 11, 2, -3],
+    'W': [-2, -2, -3, -2, 3, -3, 2, -1, -2, -1, -1, -2, -3, -1, -2, -2, -2, 2, 7, -1],
+    'Y': [0, -1, -3, -2, -1, -3, -3, 3, -2, 1, 1, -3, -2, -2, -3, -2, 0, -3, -1, 4],
+}
+
+UNKNOWN_IDX = len(AA_ORDER)
+RESIDUE_DIM = len(AA_ORDER) + 7 + len(AA_ORDER)
+FEATURE_DIM = WINDOW_SIZE * RESIDUE_DIM + 2 * RESIDUE_DIM
+
+
+def _residue_table() -> np.ndarray:
+    table = np.zeros((UNKNOWN_IDX + 1, RESIDUE_DIM), dtype=np.float64)
+    for aa, i in AA_TO_IDX.items():
+        table[i, i] = 1.0
+        table[i, 20:27] = PHYSICO_PROPS[aa]
+        table[i, 27:] = BLOSUM62[aa]
+    return table
+
+# Row UNKNOWN_IDX stays zero: padding and non-standard residues
+RESIDUE_TABLE = _residue_table()
+
+
+def encode_sequence(seq: str) -> np.ndarray:
+    """Map a sequence to residue-table indices (unknown characters -> UNKNOWN_IDX)."""
+    return np.fromiter((AA_TO_IDX.get(c, UNKNOWN_IDX) for c in seq), dtype=np.intp, count=len(seq))
+
+
+def window_indices(encoded: np.ndarray) -> np.ndarray:
+    """Residue-table indices of every context window, shape (..., L, WINDOW_SIZE)."""
+    half = WINDOW_SIZE // 2
+    pad = [(0, 0)] * (encoded.ndim - 1) + [(half, half)]
+    padded = np.pad(encoded, pad, constant_values=UNKNOWN_IDX)
+    return np.lib.stride_tricks.sliding_window_view(padded, WINDOW_SIZE, axis=-1)
+
+
+def featurize_windows(windows: np.ndarray) -> np.ndarray:
+    """Features for a batch of context windows, shape (..., WINDOW_SIZE) -> (..., FEATURE_DIM)."""
+    slots = RESIDUE_TABLE[windows]  # (..., WINDOW_SIZE, RESIDUE_DIM)
+    flat = slots.reshape(slots.shape[:-2] + (WINDOW_SIZE * RESIDUE_DIM,))
+    return np.concatenate([flat, slots.mean(axis=-2), slots.std(axis=-2)], axis=-1)
+
+
+def featurize_encoded(encoded: np.ndarray) -> np.ndarray:
+    """Features for every position of one or more encoded sequences.
+
+    Accepts shape (L,) or (N, L) and returns (L, FEATURE_DIM) or (N, L, FEATURE_DIM).
+    """
+    return featurize_windows(window_indices(encoded))
+
+
+def featurize_sequence(seq: str) -> np.ndarray:
+    """Features for every position of seq, shape (len(seq), FEATURE_DIM)."""
+    return featurize_encoded(encode_sequence(seq))
+
+
+def extract_position_features(seq: str, position: int) -> np.ndarray:
+    """Features for a single position, shape (FEATURE_DIM,)."""
+    return featurize_sequence(seq)[position]
+
+__all__ = [
+    'FEATURE_SCHEMA_VERSION', 'FEATURE_DIM', 'AA_ORDER', 'AA_TO_IDX',
+    'encode_sequence', 'window_indices', 'featurize_windows', 'featurize_encoded', 'featurize_sequence', 'extract_position_features'
+]
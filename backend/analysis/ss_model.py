@@ -1,186 +1,142 @@
-"""Secondary structure prediction stub for demo purposes.
+"""ESM-lite secondary structure prediction for wt/mut amino-acid windows.
+
+Per-residue helix/sheet/coil probabilities come from a small MLP head over
+hand-crafted context features (see ss_features). The fitted head is served by
+ss_registry: loaded once per process, never trained in-request, and evaluated
+with a pure-NumPy forward pass (ss_numpy) so scikit-learn is never imported.
 Time complexity: O(L) for window length L.
 """
 from __future__ import annotations
-from typing import Dict
-import random
-try:
-    import numpy as np
-    np.random.seed(0)
-except ImportError:
-    pass
-random.seed(0)
-
-def predict_secondary_structure(wt_seq: str, mut_seq: str) -> Dict:
-    import os
-    import math
-    import time
-    t0 = time.time()
-    # Model cache
-    if not hasattr(predict_secondary_structure, "_model_loaded"):
-        predict_secondary_structure._model = None
-        predict_secondary_structure._model_loaded = False
-        predict_secondary_structure._model_path = None
-        # Try to find model file
-        for ext in (".joblib", ".pt"):
-            candidate = os.path.join(os.path.dirname(__file__), "../data/ss_head" + ext)
-            if os.path.exists(candidate):
-                predict_secondary_structure._model_path = candidate
-                break
-    def _load_model():
-        if predict_secondary_structure._model_loaded:
-            return predict_secondary_structure._model
-        path = predict_secondary_structure._model_path
-        if path:
-            try:
-                if path.endswith(".joblib"):
-                    import joblib
-                    predict_secondary_structure._model = joblib.load(path)
-                elif path.endswith(".pt"):
-                    import torch
-                    predict_secondary_structure._model = torch.load(path, map_location="cpu")
-                predict_secondary_structure._model_loaded = True
-            except Exception:
-                predict_secondary_structure._model = None
-                predict_secondary_structure._model_loaded = True
-        return predict_secondary_structure._model
-    def _featurize(seq: str) -> list:
-        aa = "ACDEFGHIKLMNPQRSTVWY"
-        vec = [0] * len(aa)
-        for c in seq:
-            if c in aa:
-                vec[aa.index(c)] += 1
-        return vec
-    def _softmax(x):
-        e_x = [math.exp(i) for i in x]
-        s = sum(e_x)
-        return [v/s for v in e_x]
-    def _entropy(probs):
-        return -sum(p * math.log(p+1e-9) for p in probs)
-    window = {"center": len(wt_seq)//2, "length": len(wt_seq)}
-    notes = []
-    model = _load_model()
-    classes = ["helix", "sheet", "coil"]
-    def predict(seq):
-        if model:
-            try:
-                if hasattr(model, "predict_proba"):
-                    feats = _featurize(seq)
-                    probs = model.predict_proba([feats])[0]
-                elif hasattr(model, "__call__"):
-                    import torch
-                    feats = torch.tensor(_featurize(seq), dtype=torch.float32).unsqueeze(0)
-                    logits = model(feats).detach().numpy()[0]
-                    probs = _softmax(logits)
-                else:
-                    raise Exception("Unknown model type")
-                conf = 1 - _entropy(probs)/math.log(len(classes))
-                return dict(zip(classes, probs)), conf
-            except Exception:
-                pass
-        # Fallback: uniform
-        probs = [1/3]*3
-        conf = 0.1
-        notes.append("ss_model_unavailable")
-        return dict(zip(classes, probs)), conf
-    wt_probs, wt_conf = predict(wt_seq)
-    mut_probs, mut_conf = predict(mut_seq)
-    delta = {k: mut_probs[k] - wt_probs[k] for k in classes}
-    result = {
-        "window": window,
-        "wt": {**wt_probs, "confidence": wt_conf},
-        "mut": {**mut_probs, "confidence": mut_conf},
-        "delta": delta
+from pathlib import Path
+from typing import Dict, Any
+
+import numpy as np
+
+from .ss_features import featurize_sequence, featurize_windows, encode_sequence, window_indices, AA_ORDER, UNKNOWN_IDX
+from .ss_numpy import mlp_predict_proba
+from .ss_registry import get_model, ModelNotFoundError, ModelSchemaError, CLASSES
+
+SS_KEYS = {'H': 'helix', 'E': 'sheet', 'C': 'coil'}
+
+
+class ESMLiteModel:
+    """Inference wrapper around a validated registry artifact."""
+
+    def __init__(self, params: Dict[str, Any]):
+        self.params = params
+        self.schema_version = int(params['schema_version'])
+        classes = [str(c) for c in params['classes']]
+        # column order of predict_proba -> fixed H/E/C order
+        self._order = [classes.index(c) for c in CLASSES]
+
+    def predict_features(self, features: "np.ndarray") -> "np.ndarray":
+        """Probabilities for a (n, FEATURE_DIM) batch, columns in H/E/C order."""
+        return mlp_predict_proba(self.params, features)[:, self._order]
+
+    def predict_sequence(self, sequence: str) -> "np.ndarray":
+        """Per-residue probabilities, shape (len(sequence), 3)."""
+        return self.predict_features(featurize_sequence(sequence))
+
+
+def _summary(probs: "np.ndarray", center: int) -> Dict[str, float]:
+    row = probs[min(center, len(probs) - 1)]
+    out = {SS_KEYS[c]: round(float(row[i]), 3) for i, c in enumerate(CLASSES)}
+    out['confidence'] = round(float(probs.max(axis=1).mean()), 3)
+    return out
+
+
+def _per_residue(probs: "np.ndarray", i: int) -> Dict[str, float]:
+    if i >= len(probs):
+        return {'H': 0.33, 'E': 0.33, 'C': 0.34}
+    return {c: round(float(probs[i][j]), 3) for j, c in enumerate(CLASSES)}
+
+
+def predict_secondary_structure_esm_lite(wt_seq: str, mut_seq: str, data_dir: str | Path | None = None) -> Dict[str, Any]:
+    """ESM-lite prediction with per-residue outputs.
+
+    Raises ModelNotFoundError / ModelSchemaError straight from the registry.
+    """
+    if not wt_seq or not mut_seq:
+        raise ValueError('empty_sequence')
+    model = get_model(data_dir)
+    wt_probs = model.predict_sequence(wt_seq)
+    mut_probs = model.predict_sequence(mut_seq)
+    # Center position is where the substitution sits in a window
+    center = len(wt_seq) // 2
+    wt = _summary(wt_probs, center)
+    mut = _summary(mut_probs, center)
+    return {
+        'window': {'center': center, 'length': len(wt_seq)},
+        'wt': wt,
+        'mut': mut,
+        'delta': {k: round(mut[k] - wt[k], 3) for k in SS_KEYS.values()},
+        'per_residue': [
+            {'i': i, 'wt': _per_residue(wt_probs, i), 'mut': _per_residue(mut_probs, i)}
+            for i in range(max(len(wt_seq), len(mut_seq)))
+        ]
     }
-    if notes:
-        result["notes"] = notes
-    return result
-
-__all__ = ['predict_secondary_structure']
-
-def predict_secondary_structure(wt_seq: str, mut_seq: str) -> Dict:
-    import os
-    import math
-    import time
-    t0 = time.time()
-    # Model cache
-    if not hasattr(predict_secondary_structure, "_model_loaded"):
-        predict_secondary_structure._model = None
-        predict_secondary_structure._model_loaded = False
-        predict_secondary_structure._model_path = None
-        # Try to find model file
-        for ext in (".joblib", ".pt"):
-            candidate = os.path.join(os.path.dirname(__file__), "../data/ss_head" + ext)
-            if os.path.exists(candidate):
-                predict_secondary_structure._model_path = candidate
-                break
-    def _load_model():
-        if predict_secondary_structure._model_loaded:
-            return predict_secondary_structure._model
-        path = predict_secondary_structure._model_path
-        if path:
-            try:
-                if path.endswith(".joblib"):
-                    import joblib
-                    predict_secondary_structure._model = joblib.load(path)
-                elif path.endswith(".pt"):
-                    import torch
-                    predict_secondary_structure._model = torch.load(path, map_location="cpu")
-                predict_secondary_structure._model_loaded = True
-            except Exception:
-                predict_secondary_structure._model = None
-                predict_secondary_structure._model_loaded = True
-        return predict_secondary_structure._model
-    def _featurize(seq: str) -> list:
-        aa = "ACDEFGHIKLMNPQRSTVWY"
-        vec = [0] * len(aa)
-        for c in seq:
-            if c in aa:
-                vec[aa.index(c)] += 1
-        return vec
-    def _softmax(x):
-        e_x = [math.exp(i) for i in x]
-        s = sum(e_x)
-        return [v/s for v in e_x]
-    def _entropy(probs):
-        return -sum(p * math.log(p+1e-9) for p in probs)
-    window = {"center": len(wt_seq)//2, "length": len(wt_seq)}
-    notes = []
-    model = _load_model()
-    classes = ["helix", "sheet", "coil"]
-    def predict(seq):
-        if model:
-            try:
-                if hasattr(model, "predict_proba"):
-                    feats = _featurize(seq)
-                    probs = model.predict_proba([feats])[0]
-                elif hasattr(model, "__call__"):
-                    import torch
-                    feats = torch.tensor(_featurize(seq), dtype=torch.float32).unsqueeze(0)
-                    logits = model(feats).detach().numpy()[0]
-                    probs = _softmax(logits)
-                else:
-                    raise Exception("Unknown model type")
-                conf = 1 - _entropy(probs)/math.log(len(classes))
-                return dict(zip(classes, probs)), conf
-            except Exception:
-                pass
-        # Fallback: uniform
-        probs = [1/3]*3
-        conf = 0.1
-        notes.append("ss_model_unavailable")
-        return dict(zip(classes, probs)), conf
-    wt_probs, wt_conf = predict(wt_seq)
-    mut_probs, mut_conf = predict(mut_seq)
-    delta = {k: mut_probs[k] - wt_probs[k] for k in classes}
-    result = {
-        "window": window,
-        "wt": {**wt_probs, "confidence": wt_conf},
-        "mut": {**mut_probs, "confidence": mut_conf},
-        "delta": delta
+
+
+MAX_SCAN_LENGTH = 101
+
+
+def scan_saturation_mutagenesis(wt_seq: str, data_dir: str | Path | None = None) -> Dict[str, Any]:
+    """In-silico saturation mutagenesis over a window.
+
+    Every position is substituted with each of the 20 amino acids (19 real
+    substitutions plus the wt identity, whose delta is 0). Because features are
+    local, a substitution at i only changes the context windows around i; the
+    heatmap reports the change in predicted helix/sheet/coil at the substituted
+    residue itself, as in predict_secondary_structure's center delta.
+    All L*20 windows are featurized and scored in a single batch.
+    Time complexity: O(20 * L) windows for window length L.
+    """
+    if not wt_seq:
+        raise ValueError('empty_sequence')
+    if len(wt_seq) > MAX_SCAN_LENGTH:
+        raise ValueError('window_too_long')
+    model = get_model(data_dir)
+    L, A = len(wt_seq), len(AA_ORDER)
+    wins = window_indices(encode_sequence(wt_seq))  # (L, W)
+    half = wins.shape[1] // 2
+    mut_wins = np.repeat(wins[:, None, :], A, axis=1)  # (L, A, W)
+    mut_wins[:, :, half] = np.arange(A)
+    probs = model.predict_features(featurize_windows(np.concatenate([wins, mut_wins.reshape(L * A, -1)])))
+    wt_probs, mut_probs = probs[:L], probs[L:].reshape(L, A, len(CLASSES))
+    delta = mut_probs - wt_probs[:, None, :]
+    # Identity "substitution" is exactly zero (also covers unknown wt residues)
+    wt_idx = wins[:, half]
+    known = wt_idx != UNKNOWN_IDX
+    delta[np.nonzero(known)[0], wt_idx[known]] = 0.0
+    return {
+        'window': {'center': L // 2, 'length': L},
+        'wt_seq': wt_seq,
+        'alphabet': AA_ORDER,
+        'n_variants': int(L * (A - 1) + (~known).sum()),
+        'wt': {SS_KEYS[c]: np.round(wt_probs[:, j], 3).tolist() for j, c in enumerate(CLASSES)},
+        'delta': {SS_KEYS[c]: np.round(delta[:, :, j], 3).tolist() for j, c in enumerate(CLASSES)},
+    }
+
+
+def _fallback_prediction(wt_seq: str, mut_seq: str) -> Dict[str, Any]:
+    probs = {k: 1/3 for k in SS_KEYS.values()}
+    return {
+        'window': {'center': len(wt_seq)//2, 'length': len(wt_seq)},
+        'wt': {**probs, 'confidence': 0.1},
+        'mut': {**probs, 'confidence': 0.1},
+        'delta': {k: 0.0 for k in SS_KEYS.values()},
+        'notes': ['ss_model_unavailable']
     }
-    if notes:
-        result["notes"] = notes
-    return result
 
-__all__ = ['predict_secondary_structure']
+
+def predict_secondary_structure(wt_seq: str, mut_seq: str, data_dir: str | Path | None = None) -> Dict:
+    """Predict wt/mut secondary structure, degrading to a uniform prior when no
+    artifact has been trained. A schema mismatch is not degraded: it raises
+    ModelSchemaError so a stale deployment is noticed immediately.
+    """
+    try:
+        return predict_secondary_structure_esm_lite(wt_seq, mut_seq, data_dir)
+    except ModelNotFoundError:
+        return _fallback_prediction(wt_seq, mut_seq)
+
+__all__ = ['predict_secondary_structure', 'predict_secondary_structure_esm_lite', 'scan_saturation_mutagenesis', 'ESMLiteModel', 'ModelSchemaError', 'ModelNotFoundError']
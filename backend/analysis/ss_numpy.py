@@ -0,0 +1,54 @@
+"""Pure-NumPy inference for the StandardScaler + MLPClassifier SS head.
+
+export_mlp() flattens a fitted scaler/MLP pair into plain arrays; mlp_predict_proba()
+replays the forward pass (affine -> ReLU ... -> affine -> softmax) without
+importing scikit-learn, so serving processes only need numpy.
+Time complexity: O(n * sum(layer_in * layer_out)) for a batch of n rows.
+"""
+from __future__ import annotations
+from typing import Any, Dict
+import numpy as np
+
+
+def export_mlp(scaler: Any, model: Any) -> Dict[str, np.ndarray]:
+    """Convert fitted sklearn StandardScaler + MLPClassifier into NumPy arrays.
+
+    Duck-typed on the fitted attributes, so scikit-learn is not imported here.
+    """
+    if getattr(model, 'activation', 'relu') != 'relu':
+        raise ValueError(f"unsupported_activation: {model.activation}")
+    if getattr(model, 'out_activation_', 'softmax') != 'softmax':
+        raise ValueError(f"unsupported_out_activation: {model.out_activation_}")
+    n_features = len(model.coefs_[0])
+    mean = getattr(scaler, 'mean_', None)
+    scale = getattr(scaler, 'scale_', None)
+    params = {
+        'classes': np.asarray([str(c) for c in model.classes_]),
+        'scaler_mean': np.zeros(n_features) if mean is None else np.asarray(mean, dtype=np.float64),
+        'scaler_scale': np.ones(n_features) if scale is None else np.asarray(scale, dtype=np.float64),
+        'n_layers': np.asarray(len(model.coefs_)),
+    }
+    for i, (w, b) in enumerate(zip(model.coefs_, model.intercepts_)):
+        params[f'W{i}'] = np.asarray(w, dtype=np.float64)
+        params[f'b{i}'] = np.asarray(b, dtype=np.float64)
+    return params
+
+
+def _softmax(z: np.ndarray) -> np.ndarray:
+    z = z - z.max(axis=1, keepdims=True)
+    np.exp(z, out=z)
+    z /= z.sum(axis=1, keepdims=True)
+    return z
+
+
+def mlp_predict_proba(params: Dict[str, np.ndarray], X: np.ndarray) -> np.ndarray:
+    """Class probabilities for a (n, n_features) batch, columns in params['classes'] order."""
+    h = (np.asarray(X, dtype=np.float64) - params['scaler_mean']) / params['scaler_scale']
+    n_layers = int(params['n_layers'])
+    for i in range(n_layers):
+        h = h @ params[f'W{i}'] + params[f'b{i}']
+        if i < n_layers - 1:
+            np.maximum(h, 0, out=h)
+    return _softmax(h)
+
+__all__ = ['export_mlp', 'mlp_predict_proba']
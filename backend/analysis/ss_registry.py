@@ -0,0 +1,217 @@
+"""Versioned artifact registry for the ESM-lite secondary structure head.
+
+Artifacts are trained offline and stored next to the catalogs as plain NumPy
+archives, keyed by the feature schema they were fitted on:
+
+    python -m backend.analysis.ss_registry train  [--data-dir backend/data]
+    python -m backend.analysis.ss_registry export --from model.joblib [--data-dir ...]
+    python -m backend.analysis.ss_registry info   [--data-dir backend/data]
+
+Training and export need scikit-learn; serving only needs numpy (see ss_numpy).
+At serve time an artifact is loaded at most once per process and shared by
+all requests. Nothing is ever trained inside a request: a missing artifact
+raises ModelNotFoundError and an artifact built for a different feature schema
+raises ModelSchemaError, both immediately.
+"""
+from __future__ import annotations
+import argparse
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional
+from .ss_features import FEATURE_SCHEMA_VERSION, FEATURE_DIM, featurize_sequence
+from .ss_numpy import export_mlp
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DATA_DIR = Path(__file__).resolve().parent.parent / 'data'
+ARTIFACT_STEM = 'ss_head'
+CLASSES = ('H', 'E', 'C')
+
+
+class ModelNotFoundError(FileNotFoundError):
+    """No artifact exists for the current feature schema."""
+
+
+class ModelSchemaError(RuntimeError):
+    """An artifact exists but was built for a different feature schema."""
+
+
+def artifact_path(data_dir: str | Path, schema_version: int = FEATURE_SCHEMA_VERSION) -> Path:
+    return Path(data_dir) / f"{ARTIFACT_STEM}.v{schema_version}.npz"
+
+
+def train_artifact(data_dir: str | Path) -> Dict[str, Any]:
+    """Fit scaler + MLP on ss_train.csv. Offline only; requires scikit-learn."""
+    import numpy as np
+    import pandas as pd
+    from sklearn.neural_network import MLPClassifier
+    from sklearn.preprocessing import StandardScaler
+
+    train_path = Path(data_dir) / 'ss_train.csv'
+    df = pd.read_csv(train_path)
+    X, y = [], []
+    for seq, labels in zip(df['sequence'], df['labels']):
+        n = min(len(seq), len(labels))
+        X.append(featurize_sequence(seq)[:n])
+        y.extend(labels[:n])
+    X = np.concatenate(X)
+    y = np.array(y)
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X)
+    model = MLPClassifier(
+        hidden_layer_sizes=(128,),
+        activation='relu',
+        solver='adam',
+        max_iter=500,
+        random_state=42
+    )
+    model.fit(X_scaled, y)
+    return {
+        'schema_version': FEATURE_SCHEMA_VERSION,
+        'feature_dim': FEATURE_DIM,
+        'classes': [str(c) for c in model.classes_],
+        'n_train': int(len(y)),
+        'model': model,
+        'scaler': scaler,
+    }
+
+
+def export_artifact(artifact: Dict[str, Any]) -> Dict[str, Any]:
+    """Flatten a fitted {'model','scaler'} artifact into NumPy arrays plus schema metadata.
+
+    Artifacts without metadata (e.g. a bare legacy joblib dict) are assumed to
+    target the current schema; the feature width is still checked.
+    """
+    import numpy as np
+    params = export_mlp(artifact['scaler'], artifact['model'])
+    params['schema_version'] = np.asarray(artifact.get('schema_version', FEATURE_SCHEMA_VERSION))
+    params['feature_dim'] = np.asarray(len(params['scaler_mean']))
+    params['n_train'] = np.asarray(artifact.get('n_train', -1))
+    return validate_artifact(params)
+
+
+def save_artifact(params: Dict[str, Any], data_dir: str | Path) -> Path:
+    import numpy as np
+    path = artifact_path(data_dir, int(params['schema_version']))
+    tmp = path.with_suffix('.tmp.npz')
+    np.savez(tmp, **params)
+    tmp.replace(path)
+    return path
+
+
+def validate_artifact(params: Any, source: str = '<memory>') -> Dict[str, Any]:
+    if 'schema_version' not in params or 'feature_dim' not in params:
+        raise ModelSchemaError(f"ss_model_schema_mismatch: {source} has no schema metadata")
+    version, dim = int(params['schema_version']), int(params['feature_dim'])
+    if version != FEATURE_SCHEMA_VERSION or dim != FEATURE_DIM:
+        raise ModelSchemaError(
+            f"ss_model_schema_mismatch: {source} schema=v{version} dim={dim}, "
+            f"expected v{FEATURE_SCHEMA_VERSION} dim={FEATURE_DIM}"
+        )
+    missing = [c for c in CLASSES if c not in [str(x) for x in params.get('classes', [])]]
+    if missing:
+        raise ModelSchemaError(f"ss_model_schema_mismatch: {source} missing classes {missing}")
+    return params
+
+
+def load_artifact(data_dir: str | Path) -> Dict[str, Any]:
+    path = artifact_path(data_dir)
+    if not path.exists():
+        raise ModelNotFoundError(f"ss_model_not_found: {path}")
+    import numpy as np
+    with np.load(path, allow_pickle=False) as npz:
+        params = {k: npz[k] for k in npz.files}
+    return validate_artifact(params, str(path))
+
+
+def artifact_version(data_dir: str | Path | None = None) -> str:
+    """Short content id of the artifact that would be served, e.g. 'v1:3f2a9c1d0b7e' ('v1:none' if absent)."""
+    import hashlib
+    path = artifact_path(data_dir or DEFAULT_DATA_DIR)
+    if not path.exists():
+        return f"v{FEATURE_SCHEMA_VERSION}:none"
+    return f"v{FEATURE_SCHEMA_VERSION}:{hashlib.sha256(path.read_bytes()).hexdigest()[:12]}"
+
+
+# Process-wide registry: data_dir -> loaded model or the load error
+_models: Dict[Path, Any] = {}
+_lock = threading.Lock()
+_lookups = {'hits': 0, 'misses': 0}
+
+
+def get_model(data_dir: str | Path | None = None):
+    """Return the shared ESMLiteModel for data_dir, loading it on first use.
+
+    Load failures are cached too, so a broken deployment fails every request
+    fast rather than re-reading the artifact each time.
+    """
+    key = Path(data_dir or DEFAULT_DATA_DIR).resolve()
+    entry = _models.get(key)
+    if entry is not None:
+        _lookups['hits'] += 1
+    else:
+        with _lock:
+            entry = _models.get(key)
+            _lookups['misses' if entry is None else 'hits'] += 1
+            if entry is None:
+                from .ss_model import ESMLiteModel
+                try:
+                    entry = ESMLiteModel(load_artifact(key))
+                    logger.info(f"event=ss_model_loaded path={artifact_path(key)} schema=v{FEATURE_SCHEMA_VERSION}")
+                except (ModelNotFoundError, ModelSchemaError) as e:
+                    logger.warning(f"event=ss_model_unavailable err={e}")
+                    entry = e
+                _models[key] = entry
+    if isinstance(entry, Exception):
+        raise entry
+    return entry
+
+
+def registry_stats() -> tuple[int, int]:
+    """(hits, misses) of get_model lookups in this process; a miss means an artifact load."""
+    return _lookups['hits'], _lookups['misses']
+
+
+def clear_registry() -> None:
+    with _lock:
+        _models.clear()
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m backend.analysis.ss_registry', description=__doc__.splitlines()[0])
+    parser.add_argument('command', choices=['train', 'export', 'info'])
+    parser.add_argument('--data-dir', default=str(DEFAULT_DATA_DIR))
+    parser.add_argument('--from', dest='source', help="joblib file holding {'model','scaler'} (export only)")
+    args = parser.parse_args(argv)
+    if args.command in ('train', 'export'):
+        if args.command == 'train':
+            artifact = train_artifact(args.data_dir)
+        else:
+            if not args.source:
+                parser.error('export requires --from')
+            import joblib
+            artifact = joblib.load(args.source)
+        try:
+            params = export_artifact(artifact)
+        except ModelSchemaError as e:
+            print(str(e))
+            return 1
+        path = save_artifact(params, args.data_dir)
+        print(f"wrote {path} schema=v{int(params['schema_version'])} n_train={int(params['n_train'])}")
+        return 0
+    try:
+        artifact = load_artifact(args.data_dir)
+    except (ModelNotFoundError, ModelSchemaError) as e:
+        print(str(e))
+        return 1
+    print(f"{artifact_path(args.data_dir)} schema=v{int(artifact['schema_version'])} dim={int(artifact['feature_dim'])} classes={[str(c) for c in artifact['classes']]} n_train={int(artifact['n_train'])}")
+    return 0
+
+__all__ = [
+    'ModelNotFoundError', 'ModelSchemaError', 'artifact_path', 'train_artifact', 'export_artifact', 'save_artifact',
+    'validate_artifact', 'load_artifact', 'artifact_version', 'get_model', 'registry_stats', 'clear_registry'
+]
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,20 +1,125 @@
 import os
+import re
+import csv
 import json
-from typing import Tuple, Optional
+from functools import lru_cache
+from typing import Tuple, Optional, Dict
+from .fasta import IndexedFasta
+
+WINDOW_LENGTH = 31
+FASTA_FILENAME = "uniprot.fasta"
+
+AA3 = {
+    "Ala": "A", "Arg": "R", "Asn": "N", "Asp": "D", "Cys": "C", "Gln": "Q", "Glu": "E",
+    "Gly": "G", "His": "H", "Ile": "I", "Leu": "L", "Lys": "K", "Met": "M", "Phe": "F",
+    "Pro": "P", "Ser": "S", "Thr": "T", "Trp": "W", "Tyr": "Y", "Val": "V",
+}
+_MISSENSE = re.compile(r"^p\.\(?([A-Z][a-z]{2}|[A-Z])(\d+)([A-Z][a-z]{2}|[A-Z])\)?$")
+
+
+def parse_missense(protein_change: str) -> Optional[Tuple[str, int, str]]:
+    """'p.Pro72Arg' / 'p.P72R' -> ('P', 72, 'R'); None for anything but a missense change."""
+    m = _MISSENSE.match((protein_change or "").strip())
+    if not m:
+        return None
+    ref, pos, alt = m.groups()
+    ref, alt = AA3.get(ref, ref), AA3.get(alt, alt)
+    if len(ref) != 1 or len(alt) != 1 or ref == alt or ref not in AA3.values() or alt not in AA3.values():
+        return None
+    return ref, int(pos), alt
+
+
+def _fasta_path(paths: dict) -> str:
+    return paths.get("fasta_path") or os.path.join(paths["data_dir"], FASTA_FILENAME)
+
+
+@lru_cache(maxsize=8)
+def _open_fasta(fasta_path: str) -> Optional[IndexedFasta]:
+    return IndexedFasta(fasta_path) if os.path.exists(fasta_path) else None
+
+
+@lru_cache(maxsize=8)
+def _protein_rows(data_dir: str) -> Dict[str, Dict]:
+    path = os.path.join(data_dir, "protein_map.csv")
+    if not os.path.exists(path):
+        return {}
+    with open(path, newline="") as f:
+        return {row["rsid"]: row for row in csv.DictReader(f)}
+
+
+@lru_cache(maxsize=8)
+def _json_windows(data_dir: str) -> Dict:
+    try:
+        with open(os.path.join(data_dir, "aa_windows.json"), "r") as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+
+def window_from_fasta(fasta: IndexedFasta, uniprot: str, residue_index: int, ref: str, alt: str,
+                      length: int = WINDOW_LENGTH) -> Optional[Tuple[str, str, int]]:
+    """Cut a wt/mut window of `length` residues around 1-based residue_index.
+    Windows are shifted (not truncated) at protein ends. Returns None if the
+    reference residue disagrees with the sequence (isoform/build mismatch).
+    """
+    if uniprot not in fasta:
+        return None
+    n = fasta.length(uniprot)
+    i = residue_index - 1
+    if not 0 <= i < n:
+        return None
+    start = max(0, min(i - length // 2, n - length))
+    wt_seq = fasta.fetch(uniprot, start, start + length)
+    center = i - start
+    if wt_seq[center] != ref:
+        return None
+    return wt_seq, wt_seq[:center] + alt + wt_seq[center + 1:], center
+
+
+@lru_cache(maxsize=4096)
+def _cached_window(rsid: str, data_dir: str, fasta_path: str) -> Optional[Tuple[str, str, int]]:
+    row = _protein_rows(data_dir).get(rsid)
+    fasta = _open_fasta(fasta_path)
+    if row and fasta is not None:
+        change = parse_missense(row.get("protein_change", ""))
+        if change:
+            ref, pos, alt = change
+            try:
+                residue_index = int(row.get("residue_index") or pos)
+            except ValueError:
+                residue_index = pos
+            win = window_from_fasta(fasta, row["uniprot"], residue_index, ref, alt)
+            if win:
+                return win
+    # Legacy hand-built windows: tolerate stray whitespace, reject wt/mut length mismatches
+    entry = _json_windows(data_dir).get(rsid)
+    if entry:
+        wt_seq, mut_seq = entry["wt_seq"].strip(), entry["mut_seq"].strip()
+        if wt_seq and len(wt_seq) == len(mut_seq):
+            return wt_seq, mut_seq, int(entry.get("center_index", entry.get("center", len(wt_seq) // 2)))
+    return None
+
 
 def fetch_window_for_rsid(rsid: str, paths: dict) -> Optional[Tuple[str, str, int]]:
     """
-    Fetch amino-acid window for a known rsID from aa_windows.json.
+    Fetch the amino-acid window for a mapped missense rsID.
+    Derived from the indexed proteome FASTA (paths["fasta_path"], default
+    <data_dir>/uniprot.fasta) plus protein_map.csv; falls back to aa_windows.json.
     Returns (wt_seq, mut_seq, center_index) or None if not found.
+    Recently used windows are served from an in-process LRU cache.
     """
-    data_dir = paths["data_dir"]
-    windows_path = os.path.join(data_dir, "aa_windows.json")
-    try:
-        with open(windows_path, "r") as f:
-            windows = json.load(f)
-        entry = windows.get(rsid)
-        if entry:
-            return entry["wt_seq"], entry["mut_seq"], entry["center_index"]
-    except Exception:
-        pass
-    return None
+    data_dir = os.path.abspath(paths["data_dir"])
+    return _cached_window(rsid, data_dir, os.path.abspath(_fasta_path(paths)))
+
+
+def window_cache_info() -> Tuple[int, int]:
+    """(hits, misses) of the window LRU cache in this process."""
+    info = _cached_window.cache_info()
+    return info.hits, info.misses
+
+
+def clear_window_caches() -> None:
+    _cached_window.cache_clear()
+    _protein_rows.cache_clear()
+    _json_windows.cache_clear()
+    _open_fasta.cache_clear()
@@ -1,15 +1,16 @@
 """Local annotation joins for traits, ClinVar light, and protein mapping."""
 from __future__ import annotations
-import pandas as pd
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import TYPE_CHECKING, List, Dict, Any
 from .utils import dbsnp_link, ensembl_link, normalize_chrom
 
+if TYPE_CHECKING:
+    import pandas as pd
+
 
 def annotate_variants(df_variants: pd.DataFrame, catalogs=None) -> List[Dict[str, Any]]:
     out = []
-    clinvar_map = catalogs.clinvar.set_index('rsid').to_dict(orient='index') if catalogs and not catalogs.clinvar.empty else {}
-    protein_map = catalogs.protein_map.set_index('rsid').to_dict(orient='index') if catalogs and not catalogs.protein_map.empty else {}
+    protein_map = catalogs.rsid_index('protein_map') if catalogs else {}
     for row in df_variants.itertuples():
         rsid = row.rsid
         gene = None
@@ -34,10 +35,49 @@ def annotate_variants(df_variants: pd.DataFrame, catalogs=None) -> List[Dict[str
     return out
 
 
+# Per-variant links as templates over the row's own fields (see columnar_variants)
+LINK_TEMPLATES = {
+    'dbsnp': dbsnp_link('{rsid}'),
+    'ensembl': ensembl_link('{chrom}', '{pos}', '{rsid}'),
+}
+
+
+def columnar_variants(df_variants: pd.DataFrame, catalogs=None) -> Dict[str, Any]:
+    """annotate_variants as parallel arrays: {'n', 'columns': {field: [...]}, 'links': LINK_TEMPLATES}.
+
+    Row i of annotate_variants is {field: columns[field][i]} plus
+    links = {k: t.format(**row) for k, t in LINK_TEMPLATES.items()}.
+    """
+    protein_map = catalogs.rsid_index('protein_map') if catalogs else {}
+    rsids = df_variants['rsid'].tolist()
+    chrom = df_variants['chrom'].astype(str)
+    chrom = chrom.where(chrom == '', 'chr' + chrom.str.lower().str.replace('chr', '', regex=False))
+    gene = [protein_map[r].get('gene') if r in protein_map else None for r in rsids]
+    consequence = ['missense_variant' if r in protein_map and protein_map[r].get('protein_change') else None for r in rsids]
+    return {
+        'n': len(rsids),
+        'columns': {
+            'rsid': rsids,
+            'chrom': chrom.tolist(),
+            'pos': df_variants['pos'].astype('int64').tolist(),
+            'genotype': df_variants['genotype'].tolist(),
+            'gene': gene,
+            'consequence': consequence,
+        },
+        'links': dict(LINK_TEMPLATES),
+    }
+
+
+def genotype_lookup(df_variants: pd.DataFrame, rsids) -> Dict[str, Any]:
+    """rsid -> genotype for just the given rsids (last row wins, like set_index().to_dict())."""
+    hits = df_variants[df_variants['rsid'].isin(set(rsids))]
+    return dict(zip(hits['rsid'], hits['genotype']))
+
+
 def build_traits_section(df_variants: pd.DataFrame, catalogs=None) -> List[Dict[str, Any]]:
     if not catalogs or catalogs.traits.empty:
         return []
-    var_geno = df_variants.set_index('rsid')['genotype'].to_dict()
+    var_geno = genotype_lookup(df_variants, catalogs.traits['rsid'])
     rows = []
     for r in catalogs.traits.itertuples():
         your_geno = var_geno.get(r.rsid)
@@ -56,17 +96,13 @@ def build_traits_section(df_variants: pd.DataFrame, catalogs=None) -> List[Dict[
 def build_protein_block(df_variants: pd.DataFrame, catalogs=None, target_rsid: str = None):
     if not catalogs or catalogs.protein_map.empty:
         return None
-    var_set = set(df_variants['rsid'])
+    var_set = set(df_variants['rsid'][df_variants['rsid'].isin(set(catalogs.protein_map['rsid']))])
     residues = []
     uni = None
     cif = None
     
-    # Prefer target_rsid if specified and present
-    rsid_order = [target_rsid] if target_rsid and target_rsid in var_set else []
-    rsid_order.extend([rsid for rsid in var_set if rsid != target_rsid])
-    
     for r in catalogs.protein_map.itertuples():
-        if r.rsid in rsid_order:
+        if r.rsid in var_set:
             uni = r.uniprot
             cif = r.alphafold_cif_url
             residues.append({'rsid': r.rsid, 'index': int(r.residue_index), 'protein_change': r.protein_change})
@@ -80,8 +116,9 @@ def build_protein_block(df_variants: pd.DataFrame, catalogs=None, target_rsid: s
 def genome_window(df_variants: pd.DataFrame):
     # prefer TP53 rs1042522
     target = 'rs1042522'
-    if target in set(df_variants['rsid']):
-        row = df_variants[df_variants['rsid']==target].iloc[0]
+    hits = df_variants[df_variants['rsid'] == target]
+    if not hits.empty:
+        row = hits.iloc[0]
         chrom = str(row['chrom'])
         pos = int(row['pos'])
         return {'chrom': chrom, 'start': max(0, pos-25), 'end': pos+25, 'rsid': target}
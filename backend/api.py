@@ -1,39 +1,60 @@
 """FastAPI application for GreatJeans demo genomics service."""
 from __future__ import annotations
-import time, logging, uuid
+import asyncio, gzip, hmac, tempfile, time, logging, uuid
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, UploadFile, File, HTTPException, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-import pandas as pd
 
 from .models import UploadResponse, AnalyzeRequest, ResultJSON
 from . import storage
-from .parser_23andme import parse_23andme, is_23andme_text
-from .parser_vcf import parse_vcf, is_vcf
-from .annotate_local import annotate_variants, build_traits_section, build_protein_block, genome_window
-from .pgs_calc import compute_bmi_pgs
+from .parser_23andme import is_23andme_text
+from .parser_vcf import is_vcf
+from . import config
 from .config import FRONTEND_ORIGIN, LOG_LEVEL
-from .analysis.ss_model import predict_secondary_structure
-from .catalogs import Catalogs
-from .utils import dbsnp_link, ensembl_link
+from .analysis.windows import fetch_window_for_rsid
+from .engine import catalogs, WINDOW_PATHS, DISCLAIMER, analysis_version, sniff_format, make_result_json, analyze_upload_measured, spool_ndjson
+from .workers import pool, PoolSaturated, TaskTimeout, TaskCancelled
+from . import jobs
+from .result_cache import cache as result_cache, options_key
+from .genome_cache import cache as genome_cache
+from .janitor import janitor
+from .serialize import dumps
+from .result_formats import MEDIA_TYPES, EncodingUnavailable, negotiate
+from . import metrics, prepare, tracing
+from .admission import AdmissionRejected, Ticket, admission, upload_cost
+from .profiling import run_profiled, find_report
 import os, json
 
 logging.basicConfig(level=LOG_LEVEL, format='%(asctime)s %(levelname)s %(message)s')
 logger = logging.getLogger(__name__)
 
-FRONTEND_ORIGINS = [os.getenv('FRONTEND_ORIGIN', "http://localhost:3000"), "http://localhost:5173"]
-
-# Load catalogs once
-DATA_DIR = os.getenv('DATA_DIR', str((os.path.dirname(__file__)) + '/data'))
-catalogs = Catalogs.load(DATA_DIR)
-logger.info("Catalogs loaded: traits=%d clinvar=%d protein=%d pgs=%d aa_windows=%d", len(catalogs.traits), len(catalogs.clinvar), len(catalogs.protein_map), len(catalogs.pgs), len(catalogs.aa_windows))
-
-app = FastAPI(title="GreatJeans API", version="0.1.0")
+FRONTEND_ORIGINS = [FRONTEND_ORIGIN, "http://localhost:5173"]
+
+def janitor_purge():
+    # a remote bucket is shared by every node: there the janitor only clears this node's scratch files
+    return purge_upload if storage.blobs.local else storage.delete_scratch
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # job recovery and the janitor run in one process per node: the pre-fork
+    # master clears app.state.housekeeping and runs them itself (see prefork)
+    housekeeping = getattr(app.state, 'housekeeping', True)
+    if housekeeping:
+        jobs.recover_orphans(jobs.store)
+        janitor.start(purge=janitor_purge())
+    jobs.runner.periodic_recovery = housekeeping
+    jobs.runner.start()
+    yield
+    await janitor.stop()
+    await jobs.runner.stop()
+    pool.shutdown()
+
+app = FastAPI(title="GreatJeans API", version="0.1.0", lifespan=lifespan)
 app.add_middleware(CORSMiddleware, allow_origins=FRONTEND_ORIGINS, allow_credentials=True, allow_methods=["*"], allow_headers=["*"]) 
 
-DISCLAIMER = "Educational use only; not medical or diagnostic."
-
 class AnalyzeBody(AnalyzeRequest):
     pass
 
@@ -42,12 +63,18 @@ class SSPredictBody(BaseModel):
     mut_seq: str
     center: int | None = None
 
+class SSScanBody(BaseModel):
+    wt_seq: str | None = None
+    rsid: str | None = None
+
 
 @app.post('/upload', response_model=UploadResponse)
 async def upload(file: UploadFile = File(...), request: Request = None):
+    t0 = time.perf_counter()
     try:
-        content = await file.read()
-        uid = storage.save_upload(content, file.filename)
+        # streamed to the storage backend from the spooled request body
+        uid = await asyncio.to_thread(storage.save_upload, file.file, file.filename)
+        head = await asyncio.to_thread(storage.load_upload_head, uid)
     except MemoryError:
         raise HTTPException(status_code=413, detail={'error': 'file_too_large', 'limit_mb': storage.MAX_UPLOAD_MB})
     except ValueError as e:
@@ -55,7 +82,6 @@ async def upload(file: UploadFile = File(...), request: Request = None):
 
     # detect format (best-effort)
     fmt = None
-    head = content[:4000]
     try:
         if is_23andme_text(head.decode(errors='ignore')):
             fmt = '23andme'
@@ -63,107 +89,206 @@ async def upload(file: UploadFile = File(...), request: Request = None):
             fmt = 'vcf'
     except Exception:
         fmt = None
-    logger.info(f"event=upload_saved upload_id={uid} filename={file.filename} size={len(content)} format={fmt}")
-    return UploadResponse(upload_id=uid, format=fmt)
-
-
-def detect_and_parse(raw: bytes):
-    head = raw[:4000]
-    if is_23andme_text(head.decode(errors='ignore')):
-        df = parse_23andme(raw)
-        fmt = '23andme'
-        return df, fmt
-    if is_vcf(head):
-        variants = parse_vcf(raw)
-        # convert to DF to reuse downstream
-        df = pd.DataFrame(variants)
-        if df.empty:
-            raise ValueError('no_variants_parsed')
-        fmt = 'vcf'
-        return df, fmt
-    raise ValueError('unsupported_format')
-
-
-def qc_metrics(df: pd.DataFrame, fmt: str):
-    n = len(df)
-    missing = df['genotype'].isna().sum()
-    allele_ok = df['genotype'].fillna('').apply(lambda g: all(a in 'ACGT.' for a in g)).mean()
-    return {
-        'format': fmt,
-        'n_snps': n,
-        'missing_pct': round(missing / max(1,n), 4),
-        'allele_sanity': round(float(allele_ok),4)
-    }
+    # parse in the background while the user gets to Analyze (see backend/prepare.py)
+    prepared = prepare.schedule(uid) if fmt and config.PREPARE_ON_UPLOAD else prepare.STATUS_NONE
+    metrics.observe_stage('upload', time.perf_counter() - t0, fmt or 'unknown')
+    logger.info(f"event=upload_saved upload_id={uid} filename={file.filename} size={file.size} format={fmt} prepared={prepared}")
+    return UploadResponse(upload_id=uid, format=fmt, prepared=prepared)
 
 
-def make_result_json(df: pd.DataFrame, fmt: str, run_traits: bool, run_protein: bool, run_pgs: bool, target_rsid: str = None):
-    ann_vars = annotate_variants(df, catalogs)
-    gw = genome_window(df)
-    traits = build_traits_section(df, catalogs) if run_traits else []
-    protein = build_protein_block(df, catalogs, target_rsid) if run_protein else None
-    pgs = compute_bmi_pgs(df, catalogs) if run_pgs else None
-    result = {
-        'qc': qc_metrics(df, fmt),
-        'genome_window': gw,
-        'variants': ann_vars,
-        'traits': traits,
-        'protein': protein,
-        'pgs': pgs,
-        'ai_summary': {'paragraph': '<placeholder>', 'caveats': ['coverage','population limits','not medical advice']},
-        'disclaimer': DISCLAIMER
-    }
-    # enforce contract keys order by constructing into ResultJSON
-    return ResultJSON(**result)
+@app.get('/uploads/{upload_id}', response_model=UploadResponse)
+async def upload_status(upload_id: str):
+    """Format and preparation status of an upload; analysis is instant once `prepared` is ready."""
+    try:
+        head = await asyncio.to_thread(storage.load_upload_head, upload_id)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail={'error': 'upload_not_found'})
+    state = await asyncio.to_thread(prepare.status, upload_id)
+    return UploadResponse(upload_id=upload_id, format=state.get('format') or sniff_format(head), prepared=state['status'])
 
 
 FORCE_DEMO = os.getenv('FORCE_DEMO','0') == '1'
 
-def ensure_contract(res: ResultJSON) -> ResultJSON:
-    # Basic presence checks, mutate model_dump then rebuild
-    d = res.model_dump()
-    notes = []
-    if 'qc' not in d:
-        d['qc'] = {'format':'unknown','n_snps':0,'missing_pct':0.0}; notes.append('qc_injected')
-    if 'genome_window' not in d:
-        d['genome_window'] = {'chrom':'chr17','start':7676125,'end':7676175,'rsid':'rs1042522'}; notes.append('window_injected')
-    if 'variants' not in d or not isinstance(d['variants'], list):
-        d['variants'] = []; notes.append('variants_injected')
-    if 'ai_summary' not in d:
-        d['ai_summary'] = {'paragraph':'<placeholder>','caveats':['coverage','population limits','not medical advice']}; notes.append('ai_summary_injected')
-    if notes:
-        d.setdefault('notes', notes)
-    return ResultJSON(**d)
+def _result_response(blob: bytes, request: Request | None, cache_status: str, raw: bytes | None = None,
+                     media_type: str = 'application/json') -> Response:
+    """Serve cached gzip bytes as-is to clients that accept gzip, inflated otherwise."""
+    headers = {'X-Cache': cache_status, 'Vary': 'Accept, Accept-Encoding'}
+    if request is not None and 'gzip' in request.headers.get('accept-encoding', ''):
+        return Response(content=blob, media_type=media_type, headers={**headers, 'Content-Encoding': 'gzip'})
+    return Response(content=raw if raw is not None else gzip.decompress(blob), media_type=media_type, headers=headers)
+
+NDJSON = 'application/x-ndjson'
+MODEL_PROFILE_OWNER = '_model'
+
+def _require_admin(request: Request) -> None:
+    token = request.headers.get('x-admin-token', '')
+    if not config.ADMIN_TOKEN or not hmac.compare_digest(token.encode(), config.ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail={'error': 'admin_only'})
+
+def _profile_requested(request: Request | None) -> bool:
+    """True for admin requests carrying ?profile=1 or X-Profile: 1 (403 for non-admins asking)."""
+    if request is None or not (request.query_params.get('profile') == '1' or request.headers.get('x-profile') == '1'):
+        return False
+    _require_admin(request)
+    return True
+
+def _overloaded(error: str, retry_after_s: int, status_code: int = 503) -> HTTPException:
+    return HTTPException(status_code=status_code, detail={'error': error, 'retry_after_s': retry_after_s},
+                         headers={'Retry-After': str(retry_after_s)})
+
+async def _admit(upload_id: str, endpoint: str) -> Ticket:
+    """Admission ticket for analysing an upload: 404 if unknown, 429 (CPU) / 503 (memory) if over budget."""
+    try:
+        return admission.admit(await asyncio.to_thread(upload_cost, upload_id), endpoint)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail={'error':'upload_not_found'})
+    except AdmissionRejected as e:
+        raise _overloaded(str(e), e.retry_after_s, 429 if e.resource == 'cpu' else 503)
+
+SPOOL_POLL_S = 0.02
+
+async def _tail_lines(path: str, task: asyncio.Future):
+    """Complete lines appended to path until task is done, then whatever it left."""
+    with open(path, 'rb') as f:
+        pending = b''
+        while True:
+            done = task.done()  # checked before reading: once done, nothing more is written
+            data = f.read(1 << 20)
+            if data:
+                *lines, pending = (pending + data).split(b'\n')
+                for line in lines:
+                    yield line + b'\n'
+            elif done:
+                return
+            else:
+                await asyncio.wait({task}, timeout=SPOOL_POLL_S)
+
+def _stream_error(e: Exception) -> str:
+    if isinstance(e, FileNotFoundError):
+        return 'upload_not_found'
+    if isinstance(e, ValueError):
+        return str(e)
+    if isinstance(e, PoolSaturated):
+        return 'analysis_queue_full'
+    if isinstance(e, TaskTimeout):
+        return 'analysis_timeout'
+    logger.exception(f"event=analyze_stream_failed err={type(e).__name__}")
+    return 'analysis_failed'
+
+async def _analyze_ndjson(body: AnalyzeBody) -> StreamingResponse:
+    """Opt-in streaming mode (Accept: application/x-ndjson); see engine.iter_ndjson.
+
+    The lines are produced in the analysis pool (its limits, timeout and
+    cancellation apply) by engine.spool_ndjson, which appends them to a spool
+    file that this handler tails: the first sections go out while variants
+    are still being annotated, and neither process holds them all. Failures
+    after the headers are sent end the stream with an `error` section and an
+    `end` line carrying the same error.
+    """
+    try:
+        head = await asyncio.to_thread(storage.load_upload_head, body.upload_id)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail={'error':'upload_not_found'})
+    fmt = sniff_format(head)
+    if fmt is None:
+        raise HTTPException(status_code=400, detail={'error': 'unsupported_format'})
+    ticket = await _admit(body.upload_id, 'analyze_ndjson')
+
+    async def stream():
+        t0 = time.time()
+        fd, spool = tempfile.mkstemp(prefix='greatjeans-', suffix='.ndjson')
+        os.close(fd)
+        task = None
+        try:
+            yield dumps({'section': 'meta', 'data': {'upload_id': body.upload_id, 'format': fmt}}) + b'\n'
+            try:
+                await prepare.wait(body.upload_id, config.PREPARE_WAIT_S)
+                with tracing.span('analysis_pool', queue_depth=pool.stats()['queue_depth']):
+                    args = (body.upload_id, body.run_traits, body.run_protein, body.run_pgs, body.target_rsid, spool, tracing.context())
+                    task = asyncio.ensure_future(pool.run(spool_ndjson, *args))
+                    async for line in _tail_lines(spool, task):
+                        yield line
+                    stats = task.result()
+                    tracing.ingest(stats.pop('spans', ()))
+            except Exception as e:  # headers are gone; report in-band
+                error = _stream_error(e)
+                yield dumps({'section': 'error', 'data': {'error': error}}) + b'\n'
+                yield dumps({'section': 'end', 'error': error}) + b'\n'
+                return
+            metrics.record_analysis(stats)
+        finally:
+            if task is not None and not task.done():  # client left: the pool drops the task (or its result)
+                task.cancel()
+            ticket.release()
+            os.unlink(spool)  # a worker still writing keeps its handle; the data goes with it
+        logger.info(f"event=analyze_stream_done upload_id={body.upload_id} time_ms={(time.time()-t0)*1000:.1f}")
+
+    # the background task also releases if the client leaves before the stream starts
+    return StreamingResponse(stream(), media_type=NDJSON, headers={'Cache-Control': 'no-cache'},
+                             background=BackgroundTask(ticket.release))
 
 @app.post('/analyze', response_model=ResultJSON)
 async def analyze(body: AnalyzeBody, request: Request = None, demo: bool = False):
     t0 = time.time()
     if FORCE_DEMO or request.query_params.get('demo') == '1':
         return await demo_result()
+    if request is not None and NDJSON in request.headers.get('accept', ''):
+        return await _analyze_ndjson(body)
+    try:
+        encoding = negotiate(request.headers.get('accept') if request is not None else None)
+    except EncodingUnavailable as e:
+        raise HTTPException(status_code=406, detail={'error': str(e)})
+    media_type = MEDIA_TYPES[encoding]
     try:
-        raw = storage.load_upload_bytes(body.upload_id)
+        digest = await asyncio.to_thread(storage.upload_digest, body.upload_id)
     except FileNotFoundError:
         raise HTTPException(status_code=404, detail={'error':'upload_not_found'})
+    opts = options_key(body.run_traits, body.run_protein, body.run_pgs, body.target_rsid, analysis_version(), encoding)
+    profile = _profile_requested(request)
+    with tracing.span('result_cache.get', encoding=encoding) as span:
+        blob = None if profile else await asyncio.to_thread(result_cache.get, digest, opts)
+        span.set(hit=blob is not None, skipped=profile)
+    metrics.count_cache('result', hits=blob is not None, misses=blob is None)
+    if blob is not None:
+        logger.info(f"event=analyze_cache_hit upload_id={body.upload_id} encoding={encoding} time_ms={(time.time()-t0)*1000:.1f}")
+        return _result_response(blob, request, 'hit', media_type=media_type)
+    # Reuse the upload-time parse instead of racing it
+    with tracing.span('prepare.wait') as span:
+        span.set(status=await prepare.wait(body.upload_id, config.PREPARE_WAIT_S))
+    ticket = await _admit(body.upload_id, 'analyze')
+    # Parsing/annotation/inference run in the analysis pool, off the event loop
     try:
-        df, fmt = detect_and_parse(raw)
+        with tracing.span('analysis_pool', queue_depth=pool.stats()['queue_depth']):
+            args = (body.upload_id, body.run_traits, body.run_protein, body.run_pgs, body.target_rsid, encoding, tracing.context())
+            if profile:
+                meta = {'path': '/analyze', 'request': body.model_dump(), 'encoding': encoding}
+                (raw, stats), _ = await pool.run(run_profiled, body.upload_id, request.state.req_id, meta, analyze_upload_measured, *args,
+                                                 is_cancelled=request.is_disconnected)
+                request.state.profile_id = request.state.req_id
+            else:
+                raw, stats = await pool.run(analyze_upload_measured, *args,
+                                            is_cancelled=request.is_disconnected if request is not None else None)
+            tracing.ingest(stats.pop('spans', ()))
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail={'error':'upload_not_found'})
     except ValueError as e:
         raise HTTPException(status_code=400, detail={'error': str(e)})
-    result = make_result_json(df, fmt, body.run_traits, body.run_protein, body.run_pgs, body.target_rsid)
-    # mini_model injection
-    try:
-        if result.protein and result.protein.residues:
-            rsid0 = result.protein.residues[0].rsid
-            win = catalogs.aa_windows.get(rsid0)
-            if win:
-                ss = predict_secondary_structure(win['wt_seq'], win['mut_seq'])
-                result.mini_model = {
-                    'window': {'center': win.get('center',15), 'length': win.get('length', len(win['wt_seq']))},
-                    **ss
-                }
-    except Exception as e:  # non-fatal
-        logger.warning(f"mini_model_inject_failed err={e}")
-    result = ensure_contract(result)
-    logger.info(f"event=analyze_done upload_id={body.upload_id} fmt={result.qc['format']} n={result.qc['n_snps']} time_ms={(time.time()-t0)*1000:.1f}")
-    return result
+    except PoolSaturated:
+        raise _overloaded('analysis_queue_full', admission.retry_after())
+    except TaskTimeout:
+        raise HTTPException(status_code=504, detail={'error': 'analysis_timeout'})
+    except TaskCancelled:
+        logger.info(f"event=analyze_cancelled upload_id={body.upload_id}")
+        raise HTTPException(status_code=499, detail={'error': 'client_disconnected'})
+    finally:
+        ticket.release()
+    metrics.record_analysis(stats)
+    blob = await asyncio.to_thread(result_cache.put, digest, opts, raw)
+    logger.info(f"event=analyze_done upload_id={body.upload_id} encoding={encoding} bytes={len(raw)} time_ms={(time.time()-t0)*1000:.1f}")
+    response = _result_response(blob, request, 'miss', raw, media_type=media_type)
+    if profile:
+        response.headers['X-Profile-Id'] = request.state.req_id
+    return response
 
 
 @app.get('/demo/na12878', response_model=ResultJSON)
@@ -193,9 +318,23 @@ async def demo_result():
     return make_result_json(df, '23andme', True, True, True, None)
 
 
+def purge_upload(upload_id: str) -> bool:
+    """Delete an upload with everything derived from it (used by DELETE and the storage janitor)."""
+    try:
+        result_cache.invalidate(storage.upload_digest(upload_id))
+    except FileNotFoundError:
+        pass
+    deleted = storage.delete_upload(upload_id)
+    genome_cache.evict(upload_id)  # pool workers drop theirs on next access (see genome_cache)
+    jobs.store.delete_for_upload(upload_id)
+    return deleted
+
+
 @app.delete('/uploads/{upload_id}')
 async def delete_upload(upload_id: str):
-    storage.delete_upload(upload_id)
+    if not storage.is_upload_id(upload_id):
+        raise HTTPException(status_code=404, detail={'error': 'upload_not_found'})
+    await asyncio.to_thread(purge_upload, upload_id)
     logger.info(f"event=delete upload_id={upload_id}")
     return {'status':'deleted','upload_id': upload_id}
 
@@ -209,6 +348,112 @@ async def root():
 async def health():
     return {"ok": True}
 
+# Async analysis jobs
+JOB_EVENTS_POLL_S = 0.25
+JOB_EVENTS_HEARTBEAT_S = 15.0
+
+def _job_view(job: dict) -> dict:
+    view = {k: job[k] for k in ('id', 'upload_id', 'status', 'stage', 'progress', 'partial', 'error', 'attempts', 'created', 'updated')}
+    if job['status'] == jobs.STATUS_DONE:
+        view['result_url'] = f"/jobs/{job['id']}/result"
+    return view
+
+async def _get_job_or_404(job_id: str, with_result: bool = False) -> dict:
+    job = await asyncio.to_thread(jobs.store.get, job_id, with_result=with_result)
+    if job is None:
+        raise HTTPException(status_code=404, detail={'error': 'job_not_found', 'job_id': job_id})
+    return job
+
+@app.post('/jobs', status_code=202)
+async def create_job(body: AnalyzeBody):
+    if not await asyncio.to_thread(storage.upload_exists, body.upload_id):
+        raise HTTPException(status_code=404, detail={'error':'upload_not_found'})
+    job_id = await asyncio.to_thread(jobs.store.create, body.upload_id, body.model_dump())
+    jobs.runner.start()
+    jobs.runner.notify()
+    logger.info(f"event=job_created job_id={job_id} upload_id={body.upload_id}")
+    return {'job_id': job_id, 'status': jobs.STATUS_QUEUED, 'status_url': f"/jobs/{job_id}", 'events_url': f"/jobs/{job_id}/events"}
+
+@app.get('/jobs/{job_id}')
+async def get_job(job_id: str):
+    return _job_view(await _get_job_or_404(job_id))
+
+@app.get('/jobs/{job_id}/result')
+async def get_job_result(job_id: str):
+    job = await _get_job_or_404(job_id, with_result=True)
+    if job['status'] != jobs.STATUS_DONE:
+        raise HTTPException(status_code=409, detail={'error': 'job_not_done', 'status': job['status']})
+    return Response(content=job['result'], media_type='application/json')
+
+@app.get('/jobs/{job_id}/events')
+async def job_events(job_id: str, request: Request):
+    """Server-sent events: one `progress` event per stage change, then `done` or `failed`."""
+    await _get_job_or_404(job_id)
+
+    async def stream():
+        last, last_sent = None, time.monotonic()
+        while True:
+            job = await asyncio.to_thread(jobs.store.get, job_id)
+            if job is None:
+                yield 'event: failed\ndata: {"error": "job_not_found"}\n\n'
+                return
+            view = _job_view(job)
+            key = (view['status'], view['stage'], json.dumps(view['progress'], sort_keys=True))
+            if key != last:
+                last, last_sent = key, time.monotonic()
+                event = view['status'] if view['status'] in jobs.TERMINAL else 'progress'
+                yield f"event: {event}\ndata: {json.dumps(view)}\n\n"
+                if event != 'progress':
+                    return
+            elif time.monotonic() - last_sent > JOB_EVENTS_HEARTBEAT_S:
+                last_sent = time.monotonic()
+                yield ': keep-alive\n\n'
+            if await request.is_disconnected():
+                return
+            await asyncio.sleep(JOB_EVENTS_POLL_S)
+
+    return StreamingResponse(stream(), media_type='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+@app.get('/debug/pool')
+async def pool_stats():
+    return pool.stats()
+
+@app.get('/debug/admission')
+async def admission_stats():
+    return admission.stats()
+
+@app.get('/debug/cache')
+async def cache_stats():
+    return {**result_cache.stats(), 'genome': genome_cache.stats()}
+
+@app.get('/debug/storage')
+async def storage_stats():
+    return janitor.stats()
+
+@app.get('/debug/profiles/{profile_id}')
+async def get_profile(profile_id: str, request: Request, format: str = 'json'):
+    """Admin-only: a stored profile report (format=json) or its collapsed stacks (format=collapsed)."""
+    _require_admin(request)
+    path = find_report(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail={'error': 'profile_not_found', 'profile_id': profile_id})
+    if format == 'collapsed':
+        return Response(content=path.with_suffix('.collapsed').read_text(), media_type='text/plain')
+    return Response(content=path.read_bytes(), media_type='application/json')
+
+@app.get('/debug/traces')
+async def get_traces(request: Request, limit: int = 20, trace_id: str | None = None, min_ms: float = 0.0):
+    """Admin-only (spans carry upload ids): recent traces from the in-process span buffer, newest first (trace_id == request id)."""
+    _require_admin(request)
+    return {'traces': tracing.recent_traces(limit=max(1, min(limit, 200)), min_ms=min_ms, trace_id=trace_id)}
+
+metrics.registry.register(metrics.Gauge('greatjeans_pool_queue_depth', 'Analyses waiting for a pool worker.', fn=lambda: pool.stats()['queue_depth']))
+metrics.registry.register(metrics.Gauge('greatjeans_pool_busy_workers', 'Pool workers running an analysis.', fn=lambda: pool.stats()['busy']))
+
+@app.get('/metrics')
+async def prometheus_metrics():
+    return Response(content=metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
 @app.get('/version')
 async def version():
     return {
@@ -254,29 +499,68 @@ class ProteinWindowBody(BaseModel):
 
 @app.post('/protein/window')
 async def protein_window(body: ProteinWindowBody):
-    win = catalogs.aa_windows.get(body.rsid)
+    win = fetch_window_for_rsid(body.rsid, WINDOW_PATHS)
     if not win:
         raise HTTPException(status_code=404, detail={'error':'rsid_not_found','rsid': body.rsid})
+    wt_seq, mut_seq, center = win
     return {
-        'wt_seq': win['wt_seq'],
-        'mut_seq': win['mut_seq'],
-        'center': win.get('center',15),
-        'length': win.get('length', len(win['wt_seq']))
+        'wt_seq': wt_seq,
+        'mut_seq': mut_seq,
+        'center': center,
+        'length': len(wt_seq)
     }
 
 @app.post('/model/ss_predict')
-async def ss_predict(body: SSPredictBody):
-    res = predict_secondary_structure(body.wt_seq, body.mut_seq)
+async def ss_predict(body: SSPredictBody, request: Request):
+    from .analysis.ss_model import predict_secondary_structure, ModelSchemaError  # NumPy and the model load on first use
+    t0 = time.perf_counter()
+    profile = _profile_requested(request)
+    try:
+        with tracing.span('ss_inference', length=len(body.wt_seq), profiled=profile):
+            if profile:
+                request.state.profile_id = request.state.req_id
+                res, _ = run_profiled(MODEL_PROFILE_OWNER, request.state.req_id, {'path': '/model/ss_predict', 'length': len(body.wt_seq)},
+                                      predict_secondary_structure, body.wt_seq, body.mut_seq)
+            else:
+                res = predict_secondary_structure(body.wt_seq, body.mut_seq)
+        metrics.observe_stage('ss_inference', time.perf_counter() - t0, 'ss_predict')
+    except ModelSchemaError as e:
+        raise HTTPException(status_code=503, detail={'error': 'ss_model_schema_mismatch', 'message': str(e)})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail={'error': str(e)})
     window = {"center": body.center if body.center is not None else len(body.wt_seq)//2, "length": len(body.wt_seq)}
+    if profile:
+        return JSONResponse({**res, 'window': window}, headers={'X-Profile-Id': request.state.req_id})
     return {**res, 'window': window}
 
+@app.post('/model/ss_scan')
+async def ss_scan(body: SSScanBody):
+    from .analysis.ss_model import scan_saturation_mutagenesis, ModelNotFoundError, ModelSchemaError
+    wt_seq = body.wt_seq
+    if wt_seq is None:
+        win = fetch_window_for_rsid(body.rsid, WINDOW_PATHS) if body.rsid else None
+        if not win:
+            raise HTTPException(status_code=404, detail={'error':'rsid_not_found','rsid': body.rsid})
+        wt_seq = win[0]
+    t0 = time.time()
+    try:
+        res = scan_saturation_mutagenesis(wt_seq)
+    except ModelNotFoundError:
+        raise HTTPException(status_code=503, detail={'error': 'ss_model_unavailable'})
+    except ModelSchemaError as e:
+        raise HTTPException(status_code=503, detail={'error': 'ss_model_schema_mismatch', 'message': str(e)})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail={'error': str(e)})
+    logger.info(f"event=ss_scan length={len(wt_seq)} n={res['n_variants']} time_ms={(time.time()-t0)*1000:.1f}")
+    return res
+
 # Structured error handlers
 @app.exception_handler(HTTPException)
 async def http_exc_handler(request: Request, exc: HTTPException):
     detail = exc.detail if isinstance(exc.detail, dict) else {'message': str(exc.detail)}
-    code_map = {400:'bad_request',404:'not_found',413:'too_large'}
+    code_map = {400:'bad_request',403:'forbidden',404:'not_found',406:'not_acceptable',409:'conflict',413:'too_large',429:'too_many_requests',499:'client_closed',503:'unavailable',504:'timeout'}
     body = {"error": {"code": code_map.get(exc.status_code,'error'), "message": detail.get('error') or detail.get('message'), "detail": detail, 'request_id': getattr(request.state,'req_id',None)}}
-    return JSONResponse(status_code=exc.status_code, content=body)
+    return JSONResponse(status_code=exc.status_code, content=body, headers=exc.headers)
 
 @app.middleware('http')
 async def add_request_id_logging(request: Request, call_next):
@@ -284,9 +568,16 @@ async def add_request_id_logging(request: Request, call_next):
     start = time.time()
     request.state.req_id = req_id
     logger.info(f"event=request_start req_id={req_id} path={request.url.path}")
-    try:
-        response = await call_next(request)
-        return response
-    finally:
-        dur = (time.time()-start)*1000
-        logger.info(f"event=request_end req_id={req_id} path={request.url.path} ms={dur:.1f}")
+    status = 500
+    with tracing.span('http', trace_id=req_id, method=request.method, path=request.url.path) as root:
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            dur = (time.time()-start)*1000
+            route = getattr(request.scope.get('route'), 'path', 'unmatched')
+            root.set(route=route, status=status)
+            metrics.HTTP_SECONDS.observe(dur / 1000, method=request.method, route=route, status=status)
+            profile = getattr(request.state, 'profile_id', None)
+            logger.info(f"event=request_end req_id={req_id} path={request.url.path} ms={dur:.1f}" + (f" profile={profile}" if profile else ''))
@@ -0,0 +1,353 @@
+"""Object storage backends for uploads: local disk or an S3-compatible bucket.
+
+storage.py keeps uploads as objects under keys like `<id[:2]>/<id>/input`
+and talks to them only through a BlobStore:
+
+    put(key, stream) -> bytes written      # streamed; never the whole object in memory
+    open(key, start=0, end=None) -> stream # ranged read; FileNotFoundError if missing
+    stat(key) -> ObjectStat(size, mtime)
+    delete(key), delete_prefix(prefix)
+
+- LocalBlobStore: files below a root directory (the default; the layout is
+  unchanged from the plain-disk storage it replaces).
+- S3BlobStore: any S3-compatible endpoint (AWS, MinIO, Ceph, the in-process
+  stand-in in backend/s3_standin.py) over plain HTTP with SigV4 signing,
+  path-style addressing. Objects larger than one part go up as multipart
+  uploads of S3_PART_MB parts; reads are ranged GETs streamed from the
+  response body.
+
+Select with STORAGE_BACKEND=local|s3 (see config.py).
+"""
+from __future__ import annotations
+import datetime as dt
+import hashlib, hmac, io, os, shutil, threading
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import TYPE_CHECKING, BinaryIO, Dict, Iterator, List, NamedTuple, Optional
+from urllib.parse import quote
+
+if TYPE_CHECKING:
+    import httpx
+
+EMPTY_SHA256 = hashlib.sha256(b'').hexdigest()
+COPY_CHUNK = 1 << 20
+
+
+class ObjectStat(NamedTuple):
+    size: int
+    mtime: float
+
+
+class BlobStore:
+    """Interface; see the module docstring. Keys are '/'-separated relative paths."""
+    local = False
+
+    def put(self, key: str, stream: BinaryIO) -> int:
+        raise NotImplementedError
+
+    def open(self, key: str, start: int = 0, end: Optional[int] = None) -> BinaryIO:
+        """Read bytes [start, end) of an object (end=None: to the end)."""
+        raise NotImplementedError
+
+    def stat(self, key: str) -> ObjectStat:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def delete_prefix(self, prefix: str) -> int:
+        """Delete every object whose key starts with prefix; returns how many."""
+        raise NotImplementedError
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.stat(key)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def read(self, key: str, start: int = 0, end: Optional[int] = None) -> bytes:
+        with self.open(key, start, end) as f:
+            return f.read()
+
+
+class LocalBlobStore(BlobStore):
+    local = True
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+
+    def path(self, key: str) -> Path:
+        return self.root / key
+
+    def put(self, key: str, stream: BinaryIO) -> int:
+        p = self.path(key)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        tmp = p.with_name(p.name + f'.tmp{os.getpid()}.{threading.get_ident()}')
+        try:
+            with open(tmp, 'wb') as f:
+                shutil.copyfileobj(stream, f, COPY_CHUNK)
+                size = f.tell()
+            os.replace(tmp, p)
+        finally:
+            tmp.unlink(missing_ok=True)
+        return size
+
+    def open(self, key: str, start: int = 0, end: Optional[int] = None) -> BinaryIO:
+        f = open(self.path(key), 'rb')
+        if start:
+            f.seek(start)
+        if end is None:
+            return f
+        with f:
+            return io.BytesIO(f.read(max(0, end - start)))
+
+    def stat(self, key: str) -> ObjectStat:
+        st = os.stat(self.path(key))
+        return ObjectStat(st.st_size, st.st_mtime)
+
+    def delete(self, key: str) -> bool:
+        try:
+            self.path(key).unlink()
+            return True
+        except FileNotFoundError:
+            return False
+
+    def delete_prefix(self, prefix: str) -> int:
+        base = self.path(prefix)
+        if base.is_dir():
+            n = sum(len(files) for _, _, files in os.walk(base))
+            shutil.rmtree(base, ignore_errors=True)
+            return n
+        return int(self.delete(prefix))
+
+
+# --- S3 ---------------------------------------------------------------------------------------
+
+def _uri(s: str, safe: str = '/') -> str:
+    return quote(s, safe=safe + '-_.~')
+
+
+def canonical_query(params: Dict[str, str]) -> str:
+    return '&'.join(f"{_uri(k, '')}={_uri(v, '')}" for k, v in sorted(params.items()))
+
+
+def _hmac(key: bytes, msg: str) -> bytes:
+    return hmac.new(key, msg.encode(), hashlib.sha256).digest()
+
+
+def sigv4(method: str, path: str, query: str, headers: Dict[str, str], payload_hash: str,
+          access_key: str, secret_key: str, region: str, amz_date: str) -> str:
+    """Authorization header value for an S3 request (AWS Signature Version 4).
+
+    path and query are already canonical (URI-encoded path, sorted encoded
+    query); headers are the signed headers, lower-cased.
+    """
+    names = sorted(headers)
+    canonical = '\n'.join([method, path, query, ''.join(f'{h}:{headers[h].strip()}\n' for h in names),
+                           ';'.join(names), payload_hash])
+    scope = f'{amz_date[:8]}/{region}/s3/aws4_request'
+    to_sign = '\n'.join(['AWS4-HMAC-SHA256', amz_date, scope, hashlib.sha256(canonical.encode()).hexdigest()])
+    key = _hmac(_hmac(_hmac(_hmac(('AWS4' + secret_key).encode(), amz_date[:8]), region), 's3'), 'aws4_request')
+    signature = hmac.new(key, to_sign.encode(), hashlib.sha256).hexdigest()
+    return f'AWS4-HMAC-SHA256 Credential={access_key}/{scope}, SignedHeaders={";".join(names)}, Signature={signature}'
+
+
+def _xml_text(body: bytes, tag: str) -> List[str]:
+    """Text of every element named tag (namespace-agnostic)."""
+    return [el.text or '' for el in ET.fromstring(body).iter() if el.tag.rsplit('}', 1)[-1] == tag]
+
+
+class _ResponseReader(io.RawIOBase):
+    """Raw stream over a streaming httpx response body; closing it releases the connection."""
+
+    def __init__(self, response):
+        self._response = response
+        self._chunks = response.iter_raw(COPY_CHUNK)
+        self._buf = b''
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        while not self._buf:
+            self._buf = next(self._chunks, b'')
+            if not self._buf:
+                return 0
+        n = min(len(b), len(self._buf))
+        b[:n] = self._buf[:n]
+        self._buf = self._buf[n:]
+        return n
+
+    def close(self) -> None:
+        if not self.closed:
+            self._response.close()
+        super().close()
+
+
+class S3Error(RuntimeError):
+    pass
+
+
+def _httpx():
+    # imported when an S3 store is created: the local backend never pays for httpx
+    try:
+        import httpx
+    except Exception as e:  # pragma: no cover - optional dep
+        raise RuntimeError('httpx is required for STORAGE_BACKEND=s3') from e
+    return httpx
+
+
+class S3BlobStore(BlobStore):
+    def __init__(self, endpoint: str, bucket: str, access_key: str, secret_key: str, region: str = 'us-east-1',
+                 prefix: str = '', part_size: int = 8 * 1024 * 1024, timeout_s: float = 30.0):
+        self._httpx = _httpx()
+        self.endpoint = endpoint.rstrip('/')
+        self._host = self._httpx.URL(self.endpoint).netloc.decode()
+        self.bucket = bucket
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self.prefix = prefix.strip('/') + '/' if prefix.strip('/') else ''
+        self.part_size = part_size
+        self.timeout_s = timeout_s
+        self._clients: Dict[int, 'httpx.Client'] = {}
+
+    def _client(self) -> 'httpx.Client':
+        # one connection pool per process: pool workers must not share sockets with their parent
+        pid = os.getpid()
+        if pid not in self._clients:
+            self._clients = {pid: self._httpx.Client(timeout=self.timeout_s)}
+        return self._clients[pid]
+
+    def _path(self, key: str = '') -> str:
+        return _uri(f'/{self.bucket}/{self.prefix}{key}' if key or self.prefix else f'/{self.bucket}')
+
+    def _request(self, method: str, key: str = '', params: Optional[Dict[str, str]] = None, body: bytes = b'',
+                 headers: Optional[Dict[str, str]] = None, stream: bool = False, path: Optional[str] = None):
+        path = self._path(key) if path is None else path
+        query = canonical_query(params or {})
+        amz_date = dt.datetime.now(dt.timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+        payload_hash = hashlib.sha256(body).hexdigest() if body else EMPTY_SHA256
+        signed = {'host': self._host, 'x-amz-content-sha256': payload_hash, 'x-amz-date': amz_date}
+        auth = sigv4(method, path, query, signed, payload_hash, self.access_key, self.secret_key, self.region, amz_date)
+        request = self._client().build_request(
+            method, f'{self.endpoint}{path}' + (f'?{query}' if query else ''), content=body or None,
+            headers={**(headers or {}), 'x-amz-content-sha256': payload_hash, 'x-amz-date': amz_date, 'Authorization': auth})
+        response = self._client().send(request, stream=stream)
+        if response.status_code == 404:
+            response.close()
+            raise FileNotFoundError(key)
+        if response.status_code >= 300:
+            detail = response.read()[:300] if stream else response.content[:300]
+            response.close()
+            raise S3Error(f'{method} {key or path}: HTTP {response.status_code} {detail!r}')
+        return response
+
+    def _parts(self, stream: BinaryIO) -> Iterator[bytes]:
+        while True:
+            chunk = stream.read(self.part_size)
+            # raw streams may return short reads: fill the part before sending it
+            while chunk and len(chunk) < self.part_size:
+                more = stream.read(self.part_size - len(chunk))
+                if not more:
+                    break
+                chunk += more
+            if not chunk:
+                return
+            yield chunk
+
+    def put(self, key: str, stream: BinaryIO) -> int:
+        parts = self._parts(stream)
+        first = next(parts, b'')
+        second = next(parts, None) if len(first) == self.part_size else None
+        if second is None:
+            self._request('PUT', key, body=first)
+            return len(first)
+        upload_id = _xml_text(self._request('POST', key, {'uploads': ''}).content, 'UploadId')[0]
+        etags, size = [], 0
+        try:
+            for number, chunk in enumerate(_chain(first, second, parts), start=1):
+                r = self._request('PUT', key, {'partNumber': str(number), 'uploadId': upload_id}, body=chunk)
+                etags.append(r.headers['etag'])
+                size += len(chunk)
+            body = ''.join(f'<Part><PartNumber>{i}</PartNumber><ETag>{e}</ETag></Part>' for i, e in enumerate(etags, start=1))
+            self._request('POST', key, {'uploadId': upload_id},
+                          body=f'<CompleteMultipartUpload>{body}</CompleteMultipartUpload>'.encode())
+        except BaseException:
+            try:
+                self._request('DELETE', key, {'uploadId': upload_id})
+            except Exception:
+                pass
+            raise
+        return size
+
+    def open(self, key: str, start: int = 0, end: Optional[int] = None) -> BinaryIO:
+        if end is not None and end <= start:
+            return io.BytesIO(b'')
+        headers = {'Range': f'bytes={start}-{"" if end is None else end - 1}'} if start or end is not None else {}
+        try:
+            response = self._request('GET', key, headers=headers, stream=True)
+        except S3Error as e:
+            if 'HTTP 416' in str(e):  # range starts past the end
+                return io.BytesIO(b'')
+            raise
+        return io.BufferedReader(_ResponseReader(response), COPY_CHUNK)
+
+    def stat(self, key: str) -> ObjectStat:
+        r = self._request('HEAD', key)
+        modified = r.headers.get('last-modified')
+        mtime = dt.datetime.strptime(modified, '%a, %d %b %Y %H:%M:%S GMT').replace(tzinfo=dt.timezone.utc).timestamp() if modified else 0.0
+        return ObjectStat(int(r.headers.get('content-length', 0)), mtime)
+
+    def delete(self, key: str) -> bool:
+        try:
+            self.stat(key)
+        except FileNotFoundError:
+            return False
+        self._request('DELETE', key)
+        return True
+
+    def list(self, prefix: str) -> Iterator[str]:
+        """Keys (relative to the store prefix) starting with prefix (ListObjectsV2, paginated)."""
+        params = {'list-type': '2', 'prefix': self.prefix + prefix}
+        while True:
+            body = self._request('GET', params=params, path=_uri(f'/{self.bucket}')).content
+            for k in _xml_text(body, 'Key'):
+                yield k[len(self.prefix):]
+            token = _xml_text(body, 'NextContinuationToken')
+            if not token or _xml_text(body, 'IsTruncated') != ['true']:
+                return
+            params = {**params, 'continuation-token': token[0]}
+
+    def delete_prefix(self, prefix: str) -> int:
+        n = 0
+        for key in list(self.list(prefix)):
+            try:
+                self._request('DELETE', key)
+                n += 1
+            except FileNotFoundError:
+                pass
+        return n
+
+
+def _chain(first: bytes, second: bytes, rest: Iterator[bytes]) -> Iterator[bytes]:
+    yield first
+    yield second
+    yield from rest
+
+
+def from_config(root: Path) -> BlobStore:
+    """The backend selected by STORAGE_BACKEND; local files live below root."""
+    from . import config
+    if config.STORAGE_BACKEND == 'local':
+        return LocalBlobStore(root)
+    if config.STORAGE_BACKEND == 's3':
+        if not config.S3_ENDPOINT or not config.S3_BUCKET:
+            raise RuntimeError('STORAGE_BACKEND=s3 needs S3_ENDPOINT and S3_BUCKET')
+        return S3BlobStore(config.S3_ENDPOINT, config.S3_BUCKET, config.S3_ACCESS_KEY or '', config.S3_SECRET_KEY or '',
+                           region=config.S3_REGION, prefix=config.S3_PREFIX, part_size=config.S3_PART_MB * 1024 * 1024)
+    raise RuntimeError(f'unknown STORAGE_BACKEND={config.STORAGE_BACKEND!r} (local or s3)')
+
+
+__all__ = ['BlobStore', 'LocalBlobStore', 'S3BlobStore', 'S3Error', 'ObjectStat', 'sigv4', 'canonical_query', 'from_config']
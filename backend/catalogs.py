@@ -1,15 +1,19 @@
-"""Data catalog loaders with LRU caching."""
+"""Data catalog loaders with LRU caching.
+
+Tables load on first access, not at import: a process that never annotates
+(or has not yet) does not pay for pandas or the CSV reads.
+"""
 from __future__ import annotations
 import json
 import logging
 from pathlib import Path
-import pandas as pd
-from functools import lru_cache
-from typing import Dict, Any
+from functools import cached_property, lru_cache
+from typing import TYPE_CHECKING, Dict, Any
 from .config import STORAGE_ROOT
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+if TYPE_CHECKING:
+    import pandas as pd
+
 logger = logging.getLogger(__name__)
 
 # Global data directory
@@ -31,6 +35,7 @@ def _get_data_path(filename: str) -> Path:
 
 def _safe_csv(path: Path) -> pd.DataFrame:
     """Safely load CSV file with logging."""
+    import pandas as pd
     if path.exists():
         try:
             logger.info(f"Loading CSV from {path}")
@@ -92,21 +97,61 @@ class Catalogs:
     def __init__(self, data_dir: Path):
         self.data_dir = data_dir
         set_data_dir(data_dir)
-        
-        # Load all catalogs
-        self.traits = get_traits_df()
-        self.clinvar = get_clinvar_df()
-        self.protein_map = get_protein_map_df()
-        self.pgs = get_pgs_df()
-        self.aa_windows = get_aa_windows()
-        
+
         # Store paths for info
         self.traits_path = self.data_dir / "traits_catalog.csv"
         self.clinvar_path = self.data_dir / "clinvar_light.csv" 
         self.protein_map_path = self.data_dir / "protein_map.csv"
         self.pgs_path = self.data_dir / "pgs_bmi_small.csv"
         self.aa_windows_path = self.data_dir / "aa_windows.json"
-    
+        self._indexes: Dict[str, Dict[str, Dict[str, Any]]] = {}
+
+    # Catalogs load on first access (once per instance)
+    @cached_property
+    def traits(self) -> pd.DataFrame:
+        return _safe_csv(self.traits_path)
+
+    @cached_property
+    def clinvar(self) -> pd.DataFrame:
+        return _safe_csv(self.clinvar_path)
+
+    @cached_property
+    def protein_map(self) -> pd.DataFrame:
+        return _safe_csv(self.protein_map_path)
+
+    @cached_property
+    def pgs(self) -> pd.DataFrame:
+        return _safe_csv(self.pgs_path)
+
+    @cached_property
+    def aa_windows(self) -> Dict[str, Any]:
+        return _safe_json(self.aa_windows_path)
+
+    def rsid_index(self, name: str) -> Dict[str, Dict[str, Any]]:
+        """rsid -> row dict for a catalog table ('clinvar', 'protein_map'), built once per process."""
+        index = self._indexes.get(name)
+        if index is None:
+            table = getattr(self, name)
+            index = self._indexes[name] = {} if table.empty else table.set_index('rsid').to_dict(orient='index')
+        return index
+
+    def warm(self) -> None:
+        """Load every table and build every derived index now (the pre-fork master does this once for all workers)."""
+        for name in ('clinvar', 'protein_map'):
+            self.rsid_index(name)
+        logger.info("Catalogs loaded: traits=%d clinvar=%d protein=%d pgs=%d aa_windows=%d", len(self.traits),
+                    len(self.clinvar), len(self.protein_map), len(self.pgs), len(self.aa_windows))
+
+    @property
+    def snapshot_id(self) -> str:
+        """Content hash of the catalog files; changes whenever any catalog is edited."""
+        import hashlib
+        h = hashlib.sha256()
+        for path in (self.traits_path, self.clinvar_path, self.protein_map_path, self.pgs_path, self.aa_windows_path):
+            h.update(path.name.encode())
+            h.update(path.read_bytes() if path.exists() else b'<missing>')
+        return h.hexdigest()[:12]
+
     @classmethod
     def load(cls, data_dir: str | Path) -> 'Catalogs':
         """Load catalogs from data directory."""
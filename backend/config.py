@@ -9,11 +9,73 @@ def _int(name: str, default: int) -> int:
     except ValueError:
         return default
 
+def _float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
 FRONTEND_ORIGIN = os.getenv("FRONTEND_ORIGIN", "http://localhost:3000")
 MAX_UPLOAD_MB = _int("MAX_UPLOAD_MB", 20)
 STORAGE_ROOT = Path(os.getenv("STORAGE_ROOT", "./storage/tmp")).resolve()
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
 
+# Optional proteome FASTA for amino-acid windows (default: <DATA_DIR>/uniprot.fasta)
+UNIPROT_FASTA = os.getenv("UNIPROT_FASTA") or None
+# Analysis process pool: worker processes (0 runs tasks in a thread, for dev), queued tasks beyond
+# the busy workers before PoolSaturated, and the per-task timeout
+ANALYSIS_WORKERS = _int("ANALYSIS_WORKERS", min(2, os.cpu_count() or 1))
+ANALYSIS_MAX_QUEUE = _int("ANALYSIS_MAX_QUEUE", 8)
+ANALYSIS_TIMEOUT_S = _float("ANALYSIS_TIMEOUT_S", 120.0)
+# Async analysis jobs (SQLite queue)
+JOBS_DB = Path(os.getenv("JOBS_DB", str(STORAGE_ROOT.parent / "jobs.sqlite3"))).resolve()
+JOBS_CONCURRENCY = _int("JOBS_CONCURRENCY", 1)
+JOBS_MAX_ATTEMPTS = _int("JOBS_MAX_ATTEMPTS", 2)
+JOBS_TIMEOUT_S = _float("JOBS_TIMEOUT_S", 1800.0)
+# a running job's owner renews its lease every JOBS_LEASE_S / 3; only expired leases are recovered
+JOBS_LEASE_S = _float("JOBS_LEASE_S", 60.0)
+# /analyze result cache (compressed Result JSON; 0 MB disables a tier)
+RESULT_CACHE_DIR = Path(os.getenv("RESULT_CACHE_DIR", str(STORAGE_ROOT.parent / "result_cache"))).resolve()
+RESULT_CACHE_MEM_MB = _int("RESULT_CACHE_MEM_MB", 64)
+RESULT_CACHE_DISK_MB = _int("RESULT_CACHE_DISK_MB", 512)
+# Admin-only request profiling (?profile=1 with X-Admin-Token); unset disables it
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN") or None
+PROFILE_INTERVAL_S = _float("PROFILE_INTERVAL_S", 0.005)
+# Profile reports, keyed by request id, outside the upload namespace; oldest pruned beyond PROFILE_MAX_REPORTS
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", str(STORAGE_ROOT.parent / "profiles"))).resolve()
+PROFILE_MAX_REPORTS = _int("PROFILE_MAX_REPORTS", 200)
+# Tracing: finished spans kept in memory for /debug/traces, optionally appended to a JSONL file
+TRACE_BUFFER = _int("TRACE_BUFFER", 5000)
+TRACE_FILE = os.getenv("TRACE_FILE") or None
+# Parse uploads in the background right after /upload; /analyze waits up to PREPARE_WAIT_S for a pending one
+PREPARE_ON_UPLOAD = os.getenv("PREPARE_ON_UPLOAD", "1") == "1"
+PREPARE_WAIT_S = _float("PREPARE_WAIT_S", 30.0)
+# Parsed genomes kept per process (API + each pool worker) for re-analysis with other options; 0 disables
+GENOME_CACHE_MB = _int("GENOME_CACHE_MB", 256)
+# Storage janitor: uploads unused for STORAGE_TTL_S are deleted, then least-recently-used ones beyond
+# STORAGE_QUOTA_MB; sweeps every JANITOR_INTERVAL_S (0 disables TTL / quota / the janitor)
+STORAGE_TTL_S = _float("STORAGE_TTL_S", 24 * 3600.0)
+STORAGE_QUOTA_MB = _int("STORAGE_QUOTA_MB", 2048)
+JANITOR_INTERVAL_S = _float("JANITOR_INTERVAL_S", 300.0)
+# Where upload objects live: local (below STORAGE_ROOT) or s3 (any S3-compatible endpoint, path-style)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local")
+S3_ENDPOINT = os.getenv("S3_ENDPOINT") or None
+S3_BUCKET = os.getenv("S3_BUCKET") or None
+S3_REGION = os.getenv("S3_REGION", "us-east-1")
+S3_ACCESS_KEY = os.getenv("S3_ACCESS_KEY") or None
+S3_SECRET_KEY = os.getenv("S3_SECRET_KEY") or None
+S3_PREFIX = os.getenv("S3_PREFIX", "")
+S3_PART_MB = _int("S3_PART_MB", 8)
+# Admission control per API process: estimated CPU-seconds / peak MB of in-flight analyses (0 disables a budget)
+ADMISSION_CPU_S = _float("ADMISSION_CPU_S", 30.0)
+ADMISSION_MEM_MB = _int("ADMISSION_MEM_MB", 1024)
+
 __all__ = [
-    'FRONTEND_ORIGIN','MAX_UPLOAD_MB','STORAGE_ROOT','LOG_LEVEL'
+    'FRONTEND_ORIGIN','MAX_UPLOAD_MB','STORAGE_ROOT','LOG_LEVEL','UNIPROT_FASTA',
+    'ANALYSIS_WORKERS','ANALYSIS_MAX_QUEUE','ANALYSIS_TIMEOUT_S',
+    'JOBS_DB','JOBS_CONCURRENCY','JOBS_MAX_ATTEMPTS','JOBS_TIMEOUT_S','JOBS_LEASE_S',
+    'RESULT_CACHE_DIR','RESULT_CACHE_MEM_MB','RESULT_CACHE_DISK_MB','ADMIN_TOKEN','PROFILE_INTERVAL_S','PROFILE_DIR','PROFILE_MAX_REPORTS',
+    'TRACE_BUFFER','TRACE_FILE','PREPARE_ON_UPLOAD','PREPARE_WAIT_S','GENOME_CACHE_MB',
+    'STORAGE_TTL_S','STORAGE_QUOTA_MB','JANITOR_INTERVAL_S','STORAGE_BACKEND','S3_ENDPOINT','S3_BUCKET',
+    'S3_REGION','S3_ACCESS_KEY','S3_SECRET_KEY','S3_PREFIX','S3_PART_MB','ADMISSION_CPU_S','ADMISSION_MEM_MB'
 ]
@@ -0,0 +1,324 @@
+"""Analysis engine: parsing, annotation and Result JSON assembly.
+
+Free of FastAPI so it can be imported by the API process and by analysis
+worker processes alike. Catalogs load once per process, on first use; pandas,
+NumPy and the SS model stack are likewise imported by the first analysis, not
+by importing this module.
+"""
+from __future__ import annotations
+import logging, os, time
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
+from .models import ResultJSON
+from . import storage, tracing
+from .serialize import result_bytes, contract_dict, dumps
+from .result_formats import encode
+from .metrics import AnalysisProbe
+from .parser_23andme import parse_23andme, is_23andme_text
+from .parser_vcf import parse_vcf, is_vcf
+from .annotate_local import annotate_variants, columnar_variants, build_traits_section, build_protein_block, genome_window
+from .pgs_calc import compute_bmi_pgs
+from .qc import QC_VERSION, qc_metrics
+from .prepare import compact_genome, load_prepared
+from .genome_cache import cache as genome_cache
+from .config import UNIPROT_FASTA
+from .analysis.windows import fetch_window_for_rsid, window_cache_info
+from .catalogs import Catalogs
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# One catalog set per process; tables load on first access
+DATA_DIR = os.getenv('DATA_DIR', str((os.path.dirname(__file__)) + '/data'))
+catalogs = Catalogs.load(DATA_DIR)
+WINDOW_PATHS = {'data_dir': DATA_DIR, 'fasta_path': UNIPROT_FASTA}
+
+DISCLAIMER = "Educational use only; not medical or diagnostic."
+
+
+@lru_cache(maxsize=1)
+def analysis_version() -> str:
+    """Identity of everything besides the upload that shapes a result: catalogs, SS model, proteome FASTA, QC definitions."""
+    from .analysis.ss_registry import artifact_version
+    fasta = WINDOW_PATHS['fasta_path'] or os.path.join(DATA_DIR, 'uniprot.fasta')
+    fasta_id = f"{os.path.getsize(fasta)}-{int(os.path.getmtime(fasta))}" if os.path.exists(fasta) else 'none'
+    return f"catalogs={catalogs.snapshot_id}|ss={artifact_version()}|fasta={fasta_id}|qc={QC_VERSION}"
+
+
+def sniff_format(raw: bytes) -> str | None:
+    """'23andme' / 'vcf' from the first few KB of an upload, or None."""
+    head = raw[:4000]
+    if is_23andme_text(head.decode(errors='ignore')):
+        return '23andme'
+    if is_vcf(head):
+        return 'vcf'
+    return None
+
+
+def _parse(source, fmt: str | None):
+    if fmt == '23andme':
+        return parse_23andme(source), fmt
+    if fmt == 'vcf':
+        import pandas as pd
+        variants = parse_vcf(source)
+        # convert to DF to reuse downstream
+        df = pd.DataFrame(variants)
+        if df.empty:
+            raise ValueError('no_variants_parsed')
+        return df, fmt
+    raise ValueError('unsupported_format')
+
+
+def detect_and_parse(raw: bytes):
+    fmt = sniff_format(raw)
+    tracing.set_attrs(format=fmt or 'unknown', bytes=len(raw))
+    return _parse(raw, fmt)
+
+
+def parse_upload(upload_id: str):
+    """(df, fmt) for a stored upload, parsed from a stream over the storage backend.
+
+    The format is sniffed from a ranged read of the first few KB; the parsers
+    then consume the object in chunks, so the raw file is never held in memory.
+    """
+    fmt = sniff_format(storage.load_upload_head(upload_id))
+    tracing.set_attrs(format=fmt or 'unknown', bytes=storage.upload_size(upload_id))
+    if fmt is None:
+        raise ValueError('unsupported_format')
+    with storage.open_upload(upload_id) as stream:
+        return _parse(stream, fmt)
+
+
+def load_genome(upload_id: str):
+    """(df, fmt, parsed) for a stored upload, parsed being its qc/genome_window sections.
+
+    Served from this process's genome cache when warm, else from the prepared
+    artifact if ready, else by parsing the raw upload; the result is cached.
+    Raises FileNotFoundError for unknown uploads and ValueError for unparseable ones.
+    """
+    digest = storage.upload_digest(upload_id)
+    genome = genome_cache.get(upload_id, digest)
+    tracing.set_attrs(genome_cache_hit=genome is not None)
+    if genome is None:
+        genome = load_prepared(upload_id)
+        tracing.set_attrs(prepared=genome is not None)
+        if genome is None:
+            df, fmt = parse_upload(upload_id)
+            df = compact_genome(df)
+            genome = df, fmt, {'qc': qc_metrics(df, fmt), 'genome_window': genome_window(df)}
+        genome_cache.put(upload_id, digest, genome)
+    tracing.set_attrs(format=genome[1])
+    return genome
+
+
+STAGES = ('parse', 'annotate', 'traits', 'protein', 'pgs', 'mini_model')
+AI_SUMMARY_PLACEHOLDER = {'paragraph': '<placeholder>', 'caveats': ['coverage','population limits','not medical advice']}
+
+
+def iter_result_sections(df: pd.DataFrame, fmt: str, run_traits: bool, run_protein: bool, run_pgs: bool, target_rsid: str = None,
+                         variants: bool = True, parsed: dict | None = None):
+    """Yield (stage, sections) in pipeline order; merged, they form the Result JSON body.
+
+    variants=False skips the annotate stage (streaming annotates in chunks instead).
+    parsed: precomputed qc/genome_window sections (see load_genome).
+    """
+    yield 'parse', dict(parsed) if parsed is not None else {'qc': qc_metrics(df, fmt), 'genome_window': genome_window(df)}
+    if variants:
+        yield 'annotate', {'variants': annotate_variants(df, catalogs)}
+    yield 'traits', {'traits': build_traits_section(df, catalogs) if run_traits else []}
+    yield 'protein', {'protein': build_protein_block(df, catalogs, target_rsid) if run_protein else None}
+    yield 'pgs', {'pgs': compute_bmi_pgs(df, catalogs) if run_pgs else None}
+
+
+# The sections' 'parse' stage (QC + genome window) follows the actual parse span
+_SPAN_NAMES = {'parse': 'qc'}
+
+
+def _stage_attrs(stage: str, df: pd.DataFrame, sections: dict) -> dict:
+    """Span attributes for a result stage: input size and the catalog it reads."""
+    if stage == 'parse':
+        return {'n_variants': len(df)}
+    if stage == 'annotate':
+        return {'n_variants': len(df), 'clinvar_rows': len(catalogs.clinvar)}
+    if stage == 'traits':
+        return {'catalog_rows': len(catalogs.traits), 'n_traits': len(sections['traits'])}
+    if stage == 'protein':
+        return {'catalog_rows': len(catalogs.protein_map), 'enabled': sections['protein'] is not None}
+    if stage == 'pgs':
+        return {'catalog_rows': len(catalogs.pgs), 'enabled': sections['pgs'] is not None}
+    return {}
+
+
+@contextmanager
+def _stage(probe: AnalysisProbe | None, name: str, **attrs):
+    """Tracing span for one analysis stage, also timed into probe if given."""
+    with tracing.span(name, **attrs) as span:
+        t0 = time.perf_counter()
+        try:
+            yield span
+        finally:
+            if probe is not None:
+                probe.add(name, time.perf_counter() - t0)
+
+
+def result_sections(df: pd.DataFrame, fmt: str, run_traits: bool, run_protein: bool, run_pgs: bool, target_rsid: str = None,
+                    variants: bool = True, probe: AnalysisProbe | None = None, parsed: dict | None = None) -> dict:
+    """All Result JSON sections as plain dicts (no mini_model).
+
+    Each stage is recorded as a tracing span and, if probe is given, timed into it.
+    """
+    result = {}
+    t = time.perf_counter()
+    for stage, sections in iter_result_sections(df, fmt, run_traits, run_protein, run_pgs, target_rsid, variants=variants, parsed=parsed):
+        dt = time.perf_counter() - t
+        tracing.record(_SPAN_NAMES.get(stage, stage), dt, **_stage_attrs(stage, df, sections))
+        if probe is not None:
+            probe.add(stage, dt)
+        result.update(sections)
+        t = time.perf_counter()
+    result['ai_summary'] = dict(AI_SUMMARY_PLACEHOLDER)
+    result['disclaimer'] = DISCLAIMER
+    return result
+
+
+def make_result_json(df: pd.DataFrame, fmt: str, run_traits: bool, run_protein: bool, run_pgs: bool, target_rsid: str = None,
+                     parsed: dict | None = None):
+    # enforce contract keys order by constructing into ResultJSON
+    return ResultJSON(**result_sections(df, fmt, run_traits, run_protein, run_pgs, target_rsid, parsed=parsed))
+
+
+def mini_model_for(protein: dict | None) -> dict | None:
+    """SS mini-model block for the first residue of a protein section, if a window exists."""
+    if not protein or not protein.get('residues'):
+        return None
+    rsid = protein['residues'][0]['rsid']
+    hits = window_cache_info()[0]
+    win = fetch_window_for_rsid(rsid, WINDOW_PATHS)
+    tracing.set_attrs(rsid=rsid, window_cache_hit=window_cache_info()[0] > hits, window_found=bool(win))
+    if not win:
+        return None
+    wt_seq, mut_seq, center = win
+    from .analysis.ss_model import predict_secondary_structure
+    ss = predict_secondary_structure(wt_seq, mut_seq)
+    return {**ss, 'window': {'center': center, 'length': len(wt_seq)}}
+
+
+def add_mini_model(result: dict, log_ctx: str = '') -> dict:
+    """Set result['mini_model'] from its protein section (non-fatal)."""
+    try:
+        result['mini_model'] = mini_model_for(result.get('protein'))
+    except Exception as e:  # non-fatal
+        logger.warning(f"mini_model_inject_failed {log_ctx}err={e}")
+    return result
+
+
+def analyze_upload_bytes(upload_id: str, run_traits: bool, run_protein: bool, run_pgs: bool, target_rsid: str = None,
+                         encoding: str = 'json', probe: AnalysisProbe | None = None) -> bytes:
+    """Full CPU-bound analysis of a stored upload, serialized without intermediate pydantic models.
+
+    The unit of work run in the analysis pool (via analyze_upload_measured).
+    Raises FileNotFoundError for unknown uploads and ValueError for unparseable ones.
+
+    encoding is a result_formats name: 'json' (the contract), or 'columnar' /
+    'msgpack', where variants are built directly as parallel arrays.
+    Returning bytes also keeps the worker -> API transfer to a single buffer.
+    """
+    with _stage(probe, 'parse') as span:
+        df, fmt, parsed = load_genome(upload_id)
+        span.set(n_variants=len(df))
+    if probe is not None:
+        probe.format = fmt
+    columnar = encoding != 'json'
+    result = result_sections(df, fmt, run_traits, run_protein, run_pgs, target_rsid, variants=not columnar, probe=probe, parsed=parsed)
+    with _stage(probe, 'ss_inference'):
+        add_mini_model(result, f"upload_id={upload_id} ")
+    if not columnar:
+        with _stage(probe, 'serialize', encoding=encoding) as span:
+            body = result_bytes(result)
+            span.set(bytes=len(body))
+            return body
+    with _stage(probe, 'annotate', n_variants=len(df), clinvar_rows=len(catalogs.clinvar), layout='columnar'):
+        variants = columnar_variants(df, catalogs)
+    with _stage(probe, 'serialize', encoding=encoding) as span:
+        doc = contract_dict({**result, 'variants': []})
+        doc['variants'] = variants
+        body = encode(doc, encoding)
+        span.set(bytes=len(body))
+        return body
+
+
+def analyze_upload_measured(upload_id: str, run_traits: bool, run_protein: bool, run_pgs: bool, target_rsid: str = None,
+                            encoding: str = 'json', trace_ctx: dict | None = None):
+    """analyze_upload_bytes plus an AnalysisProbe report (stage times, cache deltas, peak RSS) for /metrics.
+
+    Spans are collected under trace_ctx (tracing.context() of the caller) and
+    returned in the report's 'spans' for tracing.ingest() in the API process.
+    """
+    probe = AnalysisProbe()
+    with tracing.collect(trace_ctx) as spans:
+        with tracing.span('analysis', upload_id=upload_id, encoding=encoding, pid=os.getpid()):
+            body = analyze_upload_bytes(upload_id, run_traits, run_protein, run_pgs, target_rsid, encoding, probe=probe)
+    return body, {**probe.finish(), 'spans': spans}
+
+
+NDJSON_CHUNK = 5000
+
+
+def iter_ndjson(raw: bytes | None, run_traits: bool, run_protein: bool, run_pgs: bool, target_rsid: str = None,
+                chunk_size: int = NDJSON_CHUNK, genome: tuple | None = None):
+    """Yield the Result JSON as NDJSON lines of {"section": name, "data": ...}.
+
+    Every section except variants comes first, in contract order. Variants
+    follow as {"section": "variants", "offset": i, "data": [...]} lines,
+    annotated chunk by chunk, so only one chunk of Variant dicts is alive at
+    a time. A final {"section": "end", "n_variants": n} line marks completion.
+    genome: a load_prepared() tuple to use instead of parsing raw.
+    Raises ValueError (before any line) for unparseable uploads.
+    """
+    df, fmt, parsed = genome if genome is not None else (*detect_and_parse(raw), None)
+    result = {}
+    for _, sections in iter_result_sections(df, fmt, run_traits, run_protein, run_pgs, target_rsid, variants=False, parsed=parsed):
+        result.update(sections)
+    result['ai_summary'] = dict(AI_SUMMARY_PLACEHOLDER)
+    result['disclaimer'] = DISCLAIMER
+    head = contract_dict(add_mini_model(result))
+    for key, value in head.items():
+        if key != 'variants':
+            yield dumps({'section': key, 'data': value}) + b'\n'
+    for start in range(0, len(df), chunk_size):
+        chunk = annotate_variants(df.iloc[start:start + chunk_size], catalogs)
+        yield dumps({'section': 'variants', 'offset': start, 'data': chunk}) + b'\n'
+    yield dumps({'section': 'end', 'n_variants': len(df)}) + b'\n'
+
+
+def spool_ndjson(upload_id: str, run_traits: bool, run_protein: bool, run_pgs: bool, target_rsid: str | None,
+                 path: str, trace_ctx: dict | None = None) -> dict:
+    """Append iter_ndjson's lines for a stored upload to path as they are produced.
+
+    Runs in the analysis pool while the API process tails path (see
+    api._analyze_ndjson). Returns an AnalysisProbe report with the spans,
+    like analyze_upload_measured. Raises like load_genome.
+    """
+    probe = AnalysisProbe()
+    with tracing.collect(trace_ctx) as spans:
+        with tracing.span('analysis', encoding='ndjson', pid=os.getpid()):
+            with _stage(probe, 'parse') as span:
+                genome = load_genome(upload_id)
+                span.set(n_variants=len(genome[0]))
+            probe.format = genome[1]
+            # unbuffered: every line reaches the file (and the reader) with a single write
+            with _stage(probe, 'stream'), open(path, 'ab', buffering=0) as out:
+                for line in iter_ndjson(None, run_traits, run_protein, run_pgs, target_rsid, genome=genome):
+                    out.write(line)
+    return {**probe.finish(), 'spans': spans}
+
+
+__all__ = [
+    'catalogs', 'DATA_DIR', 'WINDOW_PATHS', 'DISCLAIMER', 'STAGES', 'AI_SUMMARY_PLACEHOLDER', 'NDJSON_CHUNK', 'analysis_version', 'sniff_format', 'detect_and_parse', 'parse_upload', 'load_genome', 'qc_metrics',
+    'iter_result_sections', 'result_sections', 'make_result_json', 'mini_model_for', 'add_mini_model',
+    'analyze_upload_bytes', 'analyze_upload_measured', 'iter_ndjson', 'spool_ndjson'
+]
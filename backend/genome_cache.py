@@ -0,0 +1,146 @@
+"""Per-process LRU cache of parsed genomes, bounded by bytes.
+
+Users re-run /analyze on the same upload with different options (PGS on,
+another target_rsid); each of those used to re-read and re-parse the file.
+engine.load_genome() now keeps the compact genome it loads, with its
+precomputed qc/genome_window sections, keyed by
+
+    (upload id, upload content sha256)
+
+in every process that analyses (API process and each pool worker).
+
+- Size: entries are weighed with DataFrame.memory_usage(deep=True) once, on
+  insert; least-recently-used entries are evicted beyond GENOME_CACHE_MB
+  (0 disables the cache). A genome larger than the bound is not cached.
+- Deletion: DELETE /uploads/{id} evicts in the API process directly. Pool
+  workers cannot be reached individually, so each cache checks that a hit's
+  upload still exists before returning it, and every SWEEP_INTERVAL_S drops
+  the other entries whose upload is gone (one stat per cached upload; a HEAD
+  request with the S3 backend). Both checks run outside the lock.
+- Metrics: lookups are counted as cache="genome" in
+  greatjeans_cache_lookups_total; bytes held per process are exported as
+  greatjeans_genome_cache_bytes.
+"""
+from __future__ import annotations
+import collections
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional, Tuple
+
+from . import storage
+from .config import GENOME_CACHE_MB
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+Genome = Tuple['pd.DataFrame', str, Dict[str, Any]]
+SWEEP_INTERVAL_S = 60.0
+
+
+def genome_nbytes(genome: Genome) -> int:
+    return int(genome[0].memory_usage(deep=True, index=True).sum())
+
+
+class GenomeCache:
+    """LRU of (df, fmt, parsed sections) keyed by (upload_id, digest). Thread-safe."""
+
+    def __init__(self, max_bytes: int, alive: Callable[[str], bool] = storage.upload_exists,
+                 sweep_s: float = SWEEP_INTERVAL_S):
+        self.max_bytes = max_bytes
+        self.alive = alive
+        self.sweep_s = sweep_s
+        self._next_sweep = time.monotonic() + sweep_s
+        self._entries: 'collections.OrderedDict[Tuple[str, str], Tuple[Genome, int]]' = collections.OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._counters = collections.Counter()
+
+    def _drop(self, key: Tuple[str, str]) -> None:
+        _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def _forget(self, uploads) -> None:
+        with self._lock:
+            for key in [k for k in self._entries if k[0] in uploads]:
+                self._drop(key)
+                self._counters['deleted'] += 1
+
+    def _sweep_if_due(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            if now < self._next_sweep:
+                return
+            self._next_sweep = now + self.sweep_s
+            uploads = {k[0] for k in self._entries}
+        gone = {uid for uid in uploads if not self.alive(uid)}
+        if gone:
+            self._forget(gone)
+
+    def get(self, upload_id: str, digest: str) -> Optional[Genome]:
+        self._sweep_if_due()
+        key = (upload_id, digest)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and not self.alive(upload_id):
+            self._forget({upload_id})
+            entry = None
+        with self._lock:
+            if entry is None or key not in self._entries:
+                self._counters['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters['hits'] += 1
+            return entry[0]
+
+    def put(self, upload_id: str, digest: str, genome: Genome) -> bool:
+        """Cache a genome; False if it does not fit (or the cache is disabled)."""
+        size = genome_nbytes(genome) if self.max_bytes > 0 else 0
+        if not 0 < size <= self.max_bytes:
+            return False
+        self._sweep_if_due()
+        key = (upload_id, digest)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (genome, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self._counters['evictions'] += 1
+        return True
+
+    def evict(self, upload_id: str) -> int:
+        """Drop every entry for an upload; returns how many were removed."""
+        with self._lock:
+            keys = [k for k in self._entries if k[0] == upload_id]
+            for key in keys:
+                self._drop(key)
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._counters.clear()
+
+    def lookups(self) -> Tuple[int, int]:
+        """(hits, misses) since process start."""
+        with self._lock:
+            return self._counters['hits'], self._counters['misses']
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            c = self._counters
+            lookups = c['hits'] + c['misses']
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                **{k: c[k] for k in ('hits', 'misses', 'evictions', 'deleted')},
+                'hit_ratio': round(c['hits'] / lookups, 4) if lookups else 0.0,
+            }
+
+
+cache = GenomeCache(GENOME_CACHE_MB * 1024 * 1024)
+
+__all__ = ['GenomeCache', 'genome_nbytes', 'cache', 'SWEEP_INTERVAL_S']
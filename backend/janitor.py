@@ -0,0 +1,159 @@
+"""Storage janitor: expires uploads by TTL and evicts least-recently-used ones beyond a disk quota.
+
+A background task in the API process (started from the app lifespan, like
+jobs.runner; under the pre-fork server the master runs it instead, see
+prefork) moves any unsharded upload directories into shards once (marking
+them used now, so their TTL starts at the move), then calls sweep() every
+JANITOR_INTERVAL_S:
+
+1. uploads unused for longer than STORAGE_TTL_S are deleted;
+2. if the rest still exceed STORAGE_QUOTA_MB, least-recently-used uploads
+   are deleted until they fit. Uploads used in the last MIN_AGE_S are never
+   evicted for quota: they are most likely being analysed right now.
+
+Last use is the upload directory's mtime, bumped by storage.touch_upload()
+on every access. Directory sizes are cached by mtime, so a sweep only walks
+uploads that changed since the previous one. Deletion goes through the same
+purge as DELETE /uploads/{id} (cached results, genome cache, jobs).
+
+With STORAGE_BACKEND=s3 the upload directories only hold this node's
+scratch files (prepared artifacts, profiles) and the janitor purges just
+those; expiring the objects themselves is left to the bucket's lifecycle
+rules, since other nodes may still be using them.
+
+Each sweep is a `janitor.sweep` trace span and an `event=janitor_sweep` log
+line; /metrics exports greatjeans_storage_bytes, greatjeans_storage_uploads,
+greatjeans_storage_evictions_total{reason} and
+greatjeans_storage_sweep_seconds, and GET /debug/storage the last sweep.
+"""
+from __future__ import annotations
+import asyncio, logging, threading, time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from . import metrics, storage, tracing
+from .config import STORAGE_TTL_S, STORAGE_QUOTA_MB, JANITOR_INTERVAL_S
+
+logger = logging.getLogger(__name__)
+
+MIN_AGE_S = 60.0
+
+EVICTIONS = metrics.registry.register(metrics.Counter(
+    'greatjeans_storage_evictions_total', 'Uploads deleted by the storage janitor, by reason (ttl/quota).', ('reason',)))
+SWEEP_SECONDS = metrics.registry.register(metrics.Histogram(
+    'greatjeans_storage_sweep_seconds', 'Duration of one storage janitor sweep.'))
+
+
+class Janitor:
+    def __init__(self, ttl_s: float, quota_bytes: int, interval_s: float,
+                 purge: Callable[[str], Any] = storage.delete_upload):
+        self.ttl_s = ttl_s
+        self.quota_bytes = quota_bytes
+        self.interval_s = interval_s
+        self.purge = purge
+        self._sizes: Dict[str, Tuple[float, int]] = {}  # upload_id -> (dir mtime, bytes)
+        self._last: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def _scan(self):
+        """[(last used, bytes, upload_id)] of every upload, oldest first."""
+        entries, sizes = [], {}
+        for uid, path in storage.iter_upload_dirs():
+            try:
+                mtime = path.stat().st_mtime
+            except FileNotFoundError:
+                continue
+            cached = self._sizes.get(uid)
+            size = cached[1] if cached and cached[0] == mtime else storage.upload_usage(path)
+            sizes[uid] = (mtime, size)
+            entries.append((mtime, size, uid))
+        self._sizes = sizes
+        return sorted(entries)
+
+    def _delete(self, uid: str, size: int, reason: str) -> bool:
+        try:
+            self.purge(uid)
+        except Exception as e:
+            logger.warning(f"event=janitor_delete_failed upload_id={uid} err={type(e).__name__}:{e}")
+            return False
+        self._sizes.pop(uid, None)
+        EVICTIONS.inc(reason=reason)
+        logger.info(f"event=janitor_deleted upload_id={uid} reason={reason} bytes={size}")
+        return True
+
+    def sweep(self, now: Optional[float] = None) -> Dict[str, Any]:
+        """One pass: TTL expiry, then quota eviction. Returns the sweep's stats."""
+        now = time.time() if now is None else now
+        t0 = time.perf_counter()
+        with self._lock, tracing.span('janitor.sweep', ttl_s=self.ttl_s, quota_bytes=self.quota_bytes) as span:
+            entries = self._scan()
+            kept, expired, evicted, freed = [], 0, 0, 0
+            for mtime, size, uid in entries:
+                if self.ttl_s > 0 and now - mtime > self.ttl_s and self._delete(uid, size, 'ttl'):
+                    expired += 1
+                    freed += size
+                else:
+                    kept.append((mtime, size, uid))
+            total = sum(size for _, size, _ in kept)
+            if self.quota_bytes > 0:
+                for mtime, size, uid in list(kept):
+                    if total <= self.quota_bytes or now - mtime < MIN_AGE_S:
+                        break
+                    if self._delete(uid, size, 'quota'):
+                        kept.remove((mtime, size, uid))
+                        total -= size
+                        evicted += 1
+                        freed += size
+            stats = {'uploads': len(kept), 'bytes': total, 'expired': expired, 'evicted': evicted, 'freed_bytes': freed,
+                     'over_quota': self.quota_bytes > 0 and total > self.quota_bytes,
+                     'duration_s': round(time.perf_counter() - t0, 4), 'time': now}
+            span.set(**{k: v for k, v in stats.items() if k != 'time'})
+        SWEEP_SECONDS.observe(stats['duration_s'])
+        self._last = stats
+        logger.info(f"event=janitor_sweep uploads={len(kept)} bytes={total} expired={expired} evicted={evicted} "
+                    f"freed_bytes={freed} time_ms={stats['duration_s']*1000:.1f}")
+        return stats
+
+    def stats(self) -> Dict[str, Any]:
+        return {'ttl_s': self.ttl_s, 'quota_bytes': self.quota_bytes, 'interval_s': self.interval_s,
+                'min_age_s': MIN_AGE_S, 'last_sweep': dict(self._last)}
+
+    def start(self, purge: Optional[Callable[[str], Any]] = None) -> None:
+        """Start the sweep loop on the running event loop (no-op if interval_s <= 0)."""
+        if purge is not None:
+            self.purge = purge
+        if self.interval_s <= 0 or (self._task is not None and not self._task.done()):
+            return
+        self._task = asyncio.get_running_loop().create_task(self._loop_forever())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def migrate(self) -> int:
+        """Move unsharded upload directories into shards (once, before the first sweep)."""
+        moved = storage.migrate_flat_layout()
+        if moved:
+            logger.info(f"event=storage_migrated uploads={moved}")
+        return moved
+
+    async def _loop_forever(self) -> None:
+        await asyncio.to_thread(self.migrate)
+        while True:
+            try:
+                await asyncio.to_thread(self.sweep)
+            except Exception as e:  # a failed sweep must not kill the loop
+                logger.warning(f"event=janitor_sweep_failed err={type(e).__name__}:{e}")
+            await asyncio.sleep(self.interval_s)
+
+
+janitor = Janitor(STORAGE_TTL_S, STORAGE_QUOTA_MB * 1024 * 1024, JANITOR_INTERVAL_S)
+
+metrics.registry.register(metrics.Gauge('greatjeans_storage_bytes', 'Bytes of stored uploads as of the last janitor sweep.',
+                                        fn=lambda: janitor._last.get('bytes', 0)))
+metrics.registry.register(metrics.Gauge('greatjeans_storage_uploads', 'Stored uploads as of the last janitor sweep.',
+                                        fn=lambda: janitor._last.get('uploads', 0)))
+
+__all__ = ['Janitor', 'janitor', 'MIN_AGE_S', 'EVICTIONS', 'SWEEP_SECONDS']
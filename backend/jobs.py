@@ -0,0 +1,342 @@
+"""Durable asynchronous analysis jobs backed by a local SQLite queue.
+
+POST /jobs inserts a `queued` row and returns immediately. A JobRunner in the
+API process claims queued rows and executes them in the analysis pool
+(backend.workers); the worker writes per-stage progress and partial sections
+straight to SQLite, so status polling and the SSE stream only ever read the
+database and survive API restarts.
+
+A claimed job carries its owner (host:pid) and a lease that the owning runner
+renews every JOBS_LEASE_S / 3 while the job runs. Jobs whose lease expired
+(their process died) are re-queued (the pipeline is deterministic, so a re-run
+is a clean resume) until JOBS_MAX_ATTEMPTS is reached, after which they are
+marked `failed` with error `worker_restarted`. recover_orphans() runs at
+startup and then every JOBS_LEASE_S from the runner (under the pre-fork
+server, from the master instead: see prefork); a job that a live process
+(another worker, another host sharing JOBS_DB) is running keeps a fresh lease
+and is never touched.
+"""
+from __future__ import annotations
+import asyncio
+import json
+import logging
+import os
+import socket
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from .config import JOBS_DB, JOBS_CONCURRENCY, JOBS_MAX_ATTEMPTS, JOBS_TIMEOUT_S, JOBS_LEASE_S
+from .workers import pool, PoolSaturated
+from .admission import AdmissionRejected, admission, estimate, upload_cost
+
+logger = logging.getLogger(__name__)
+
+STATUS_QUEUED, STATUS_RUNNING, STATUS_DONE, STATUS_FAILED = 'queued', 'running', 'done', 'failed'
+TERMINAL = (STATUS_DONE, STATUS_FAILED)
+GONE = 'deleted'  # run outcome (not a stored status): the row was deleted with its upload meanwhile
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    upload_id TEXT NOT NULL,
+    request TEXT NOT NULL,
+    status TEXT NOT NULL,
+    stage TEXT,
+    progress TEXT NOT NULL DEFAULT '{}',
+    partial TEXT NOT NULL DEFAULT '{}',
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    owner TEXT,
+    lease_until REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status, created);
+CREATE INDEX IF NOT EXISTS jobs_upload ON jobs(upload_id);
+"""
+# columns added after the first release; ALTERed into older databases
+_LEASE_COLUMNS = (('owner', 'TEXT'), ('lease_until', 'REAL'))
+
+
+def process_owner() -> str:
+    """Identity of the calling process for job leases (computed per call: forked workers differ)."""
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+class JobStore:
+    """Thin SQLite wrapper; safe to use from the API and from worker processes."""
+
+    def __init__(self, path: str | Path, lease_s: float = JOBS_LEASE_S):
+        self.path = Path(path)
+        self.lease_s = lease_s
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._conn() as c:
+            c.execute('PRAGMA journal_mode=WAL')
+            c.executescript(_SCHEMA)
+            have = {row['name'] for row in c.execute('PRAGMA table_info(jobs)')}
+            for name, kind in _LEASE_COLUMNS:
+                if name not in have:
+                    c.execute(f'ALTER TABLE jobs ADD COLUMN {name} {kind}')
+
+    @contextmanager
+    def _conn(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def create(self, upload_id: str, request: Dict[str, Any]) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._conn() as c:
+            c.execute('INSERT INTO jobs (id, upload_id, request, status, created, updated) VALUES (?,?,?,?,?,?)',
+                      (job_id, upload_id, json.dumps(request), STATUS_QUEUED, now, now))
+        return job_id
+
+    def get(self, job_id: str, with_result: bool = False) -> Optional[Dict[str, Any]]:
+        cols = 'id, upload_id, request, status, stage, progress, partial, error, attempts, created, updated'
+        if with_result:
+            cols += ', result'
+        with self._conn() as c:
+            row = c.execute(f'SELECT {cols} FROM jobs WHERE id=?', (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        for k in ('request', 'progress', 'partial'):
+            job[k] = json.loads(job[k])
+        return job
+
+    def claim_next(self, owner: Optional[str] = None) -> Optional[str]:
+        """Atomically move the oldest queued job to running, leased to owner (default: this process)."""
+        now = time.time()
+        with self._conn() as c:
+            c.execute('BEGIN IMMEDIATE')
+            row = c.execute('SELECT id FROM jobs WHERE status=? ORDER BY created LIMIT 1', (STATUS_QUEUED,)).fetchone()
+            if row is None:
+                c.execute('COMMIT')
+                return None
+            c.execute('UPDATE jobs SET status=?, attempts=attempts+1, progress=?, partial=?, stage=NULL, updated=?, '
+                      'owner=?, lease_until=? WHERE id=?',
+                      (STATUS_RUNNING, '{}', '{}', now, owner or process_owner(), now + self.lease_s, row['id']))
+            c.execute('COMMIT')
+            return row['id']
+
+    def heartbeat(self, job_id: str, owner: str) -> bool:
+        """Renew owner's lease on a running job; False if the job is no longer running under owner."""
+        with self._conn() as c:
+            return c.execute('UPDATE jobs SET lease_until=? WHERE id=? AND owner=? AND status=?',
+                             (time.time() + self.lease_s, job_id, owner, STATUS_RUNNING)).rowcount == 1
+
+    def release(self, job_id: str, owner: str) -> None:
+        """Expire owner's lease now (owner is going away): the next recover() takes the job back."""
+        with self._conn() as c:
+            c.execute('UPDATE jobs SET lease_until=0 WHERE id=? AND owner=? AND status=?', (job_id, owner, STATUS_RUNNING))
+
+    def update_stage(self, job_id: str, stage: str, state: str, sections: Optional[Dict[str, Any]] = None,
+                     next_stage: Optional[str] = None) -> None:
+        """Record a stage transition (and optionally start the next) for a running job."""
+        with self._conn() as c:
+            c.execute('BEGIN IMMEDIATE')
+            row = c.execute('SELECT progress, partial FROM jobs WHERE id=? AND status=?', (job_id, STATUS_RUNNING)).fetchone()
+            if row is None:
+                c.execute('COMMIT')
+                return
+            progress = json.loads(row['progress'])
+            progress[stage] = state
+            if next_stage:
+                progress[next_stage] = 'running'
+            partial = json.loads(row['partial'])
+            if sections:
+                partial.update(sections)
+            c.execute('UPDATE jobs SET stage=?, progress=?, partial=?, updated=? WHERE id=?',
+                      (next_stage or stage, json.dumps(progress), json.dumps(partial), time.time(), job_id))
+            c.execute('COMMIT')
+
+    def finish(self, job_id: str, result_json: str) -> None:
+        with self._conn() as c:
+            c.execute('UPDATE jobs SET status=?, result=?, updated=? WHERE id=? AND status=?',
+                      (STATUS_DONE, result_json, time.time(), job_id, STATUS_RUNNING))
+
+    def requeue(self, job_id: str) -> None:
+        """Give a claimed job back without counting the attempt."""
+        with self._conn() as c:
+            c.execute('UPDATE jobs SET status=?, attempts=attempts-1, updated=? WHERE id=? AND status=?',
+                      (STATUS_QUEUED, time.time(), job_id, STATUS_RUNNING))
+
+    def fail(self, job_id: str, error: str) -> None:
+        with self._conn() as c:
+            c.execute('UPDATE jobs SET status=?, error=?, updated=? WHERE id=? AND status NOT IN (?,?)',
+                      (STATUS_FAILED, error, time.time(), job_id, *TERMINAL))
+
+    def recover(self, max_attempts: int, now: Optional[float] = None) -> Dict[str, int]:
+        """Handle jobs orphaned as `running`: those whose lease expired (or that never had one)."""
+        now = time.time() if now is None else now
+        orphaned = 'status=? AND (lease_until IS NULL OR lease_until<?)'
+        with self._conn() as c:
+            c.execute('BEGIN IMMEDIATE')
+            failed = c.execute(f'UPDATE jobs SET status=?, error=?, updated=?, owner=NULL WHERE {orphaned} AND attempts>=?',
+                               (STATUS_FAILED, 'worker_restarted', now, STATUS_RUNNING, now, max_attempts)).rowcount
+            requeued = c.execute(f'UPDATE jobs SET status=?, updated=?, owner=NULL, lease_until=NULL WHERE {orphaned}',
+                                 (STATUS_QUEUED, now, STATUS_RUNNING, now)).rowcount
+            c.execute('COMMIT')
+        return {'requeued': requeued, 'failed': failed}
+
+    def delete_for_upload(self, upload_id: str) -> int:
+        with self._conn() as c:
+            return c.execute('DELETE FROM jobs WHERE upload_id=?', (upload_id,)).rowcount
+
+
+def run_job(job_id: str, db_path: str) -> str:
+    """Execute one job inside an analysis worker, recording each stage in the store."""
+    from .engine import load_genome, iter_result_sections, add_mini_model, AI_SUMMARY_PLACEHOLDER, DISCLAIMER, STAGES
+    from .serialize import result_bytes
+
+    store = JobStore(db_path)
+    job = store.get(job_id)
+    if job is None:
+        return GONE
+    req = job['request']
+    result: Dict[str, Any] = {}
+    try:
+        store.update_stage(job_id, 'parse', 'running')
+        df, fmt, parsed = load_genome(job['upload_id'])
+        sections = iter_result_sections(df, fmt, req.get('run_traits', True), req.get('run_protein', True),
+                                        req.get('run_pgs', False), req.get('target_rsid'), parsed=parsed)
+        for stage, values in sections:
+            result.update(values)
+            # variants are only served with the final result; everything else is a cheap partial
+            store.update_stage(job_id, stage, 'done', {k: v for k, v in values.items() if k != 'variants'},
+                               next_stage=STAGES[STAGES.index(stage) + 1])
+        add_mini_model(result, f"job_id={job_id} ")
+        store.update_stage(job_id, 'mini_model', 'done', {'mini_model': result.get('mini_model')})
+        result['ai_summary'] = dict(AI_SUMMARY_PLACEHOLDER)
+        result['disclaimer'] = DISCLAIMER
+        final = result_bytes(result).decode()
+    except FileNotFoundError:
+        store.fail(job_id, 'upload_not_found')
+        return STATUS_FAILED
+    except ValueError as e:
+        store.fail(job_id, str(e))
+        return STATUS_FAILED
+    store.finish(job_id, final)
+    return STATUS_DONE
+
+
+def recover_orphans(store: JobStore, max_attempts: int = JOBS_MAX_ATTEMPTS) -> Dict[str, int]:
+    """store.recover() with its log line."""
+    recovered = store.recover(max_attempts)
+    if any(recovered.values()):
+        logger.info(f"event=jobs_recovered requeued={recovered['requeued']} failed={recovered['failed']}")
+    return recovered
+
+
+class JobRunner:
+    """Claims queued jobs and runs up to `concurrency` of them through the analysis pool."""
+
+    def __init__(self, store: JobStore, concurrency: int = 1, timeout_s: Optional[float] = None, poll_s: float = 0.5,
+                 max_attempts: int = JOBS_MAX_ATTEMPTS, periodic_recovery: bool = True):
+        self.store = store
+        self.concurrency = concurrency
+        self.timeout_s = timeout_s
+        self.poll_s = poll_s
+        self.max_attempts = max_attempts
+        self.periodic_recovery = periodic_recovery  # off in pre-fork workers: the master recovers
+        self._tasks: list[asyncio.Task] = []
+        self._wake: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def start(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._tasks:
+            return
+        self._loop = loop
+        self._wake = asyncio.Event()
+        self._tasks = [loop.create_task(self._loop_forever()) for _ in range(self.concurrency)]
+        if self.periodic_recovery:
+            self._tasks.append(loop.create_task(self._recover_forever()))
+
+    def notify(self) -> None:
+        if self._wake is not None and self._loop is asyncio.get_running_loop():
+            self._wake.set()
+
+    async def stop(self) -> None:
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _loop_forever(self) -> None:
+        while True:
+            job_id = await asyncio.to_thread(self.store.claim_next)
+            if job_id is None:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.poll_s)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run_one(job_id)
+
+    async def _recover_forever(self) -> None:
+        # takes back jobs of processes that died after this one started (e.g. a crashed sibling worker)
+        while True:
+            await asyncio.sleep(self.store.lease_s)
+            try:
+                recovered = await asyncio.to_thread(recover_orphans, self.store, self.max_attempts)
+            except Exception as e:  # a locked / unavailable DB must not kill the loop
+                logger.warning(f"event=jobs_recover_failed err={type(e).__name__}:{e}")
+                continue
+            if any(recovered.values()):
+                self.notify()
+
+    async def _heartbeat(self, job_id: str, owner: str) -> None:
+        while True:
+            await asyncio.sleep(self.store.lease_s / 3)
+            if not await asyncio.to_thread(self.store.heartbeat, job_id, owner):
+                return  # finished, failed or taken over meanwhile
+
+    async def _run_one(self, job_id: str) -> None:
+        t0 = time.time()
+        owner = process_owner()
+        heartbeat = asyncio.get_running_loop().create_task(self._heartbeat(job_id, owner))
+        try:
+            job = await asyncio.to_thread(self.store.get, job_id)
+            if job is None:  # its upload was deleted since the claim
+                logger.info(f"event=job_{GONE} job_id={job_id}")
+                return
+            try:
+                cost = await asyncio.to_thread(upload_cost, job['upload_id'])
+            except FileNotFoundError:
+                cost = estimate(0, None)  # run_job records upload_not_found
+            with admission.admit(cost, 'job'):
+                status = await pool.run(run_job, job_id, str(self.store.path), timeout=self.timeout_s)
+        except asyncio.CancelledError:
+            # shutdown: leave the row `running`, with an expired lease, for recover() on next start
+            self.store.release(job_id, owner)
+            raise
+        except (PoolSaturated, AdmissionRejected):
+            # /analyze traffic owns the pool / budget right now; try again shortly
+            await asyncio.to_thread(self.store.requeue, job_id)
+            await asyncio.sleep(self.poll_s)
+            return
+        except Exception as e:
+            logger.warning(f"event=job_failed job_id={job_id} err={type(e).__name__}:{e}")
+            await asyncio.to_thread(self.store.fail, job_id, f"{type(e).__name__}: {e}" if str(e) else type(e).__name__)
+            return
+        finally:
+            heartbeat.cancel()
+        logger.info(f"event=job_{status} job_id={job_id} time_ms={(time.time()-t0)*1000:.1f}")
+
+
+store = JobStore(JOBS_DB)
+runner = JobRunner(store, concurrency=JOBS_CONCURRENCY, timeout_s=JOBS_TIMEOUT_S)
+
+__all__ = ['JobStore', 'JobRunner', 'run_job', 'recover_orphans', 'process_owner', 'store', 'runner', 'TERMINAL', 'GONE', 'JOBS_MAX_ATTEMPTS',
+           'STATUS_QUEUED', 'STATUS_RUNNING', 'STATUS_DONE', 'STATUS_FAILED']
@@ -0,0 +1,286 @@
+"""HTTP load test against a local uvicorn instance (fully offline).
+
+Starts `uvicorn backend.api:app --workers N` on a free local port, with its
+storage, result cache and jobs DB in a temporary directory. Then it replays
+a weighted mix of /upload, /analyze (several genome sizes, random options),
+/model/ss_predict and /demo/na12878 at a target rate, using Poisson
+arrivals and synthetic genomes from backend.analysis.bench. Latency is
+measured from each request's scheduled send time, so client-side queueing
+under overload is counted. The server's process tree (uvicorn workers plus
+analysis pool processes) is sampled for RSS throughout.
+
+    python -m backend.loadtest [--workers 2] [--rate 5] [--duration 30] [--sizes 10000 100000]
+                               [--mix analyze=4,ss_predict=2,upload=1,demo=1] [--cold] [--prefork] [--env ANALYSIS_WORKERS=4]
+                               [--out load.json] [--url http://127.0.0.1:8000]   # --url: use a running server
+
+The report holds, per endpoint (`analyze@<n>`, `upload@<n>`, `ss_predict`,
+`demo`): request and error counts, status codes, throughput and
+p50/p95/p99/max latency. It also holds totals and the RSS timeline.
+"""
+from __future__ import annotations
+import asyncio
+import math
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import httpx
+
+ROOT = Path(__file__).resolve().parents[1]
+DEFAULT_MIX = {'analyze': 4, 'ss_predict': 2, 'upload': 1, 'demo': 1}
+OPS = tuple(DEFAULT_MIX)
+REQUEST_TIMEOUT_S = 300.0
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    """'analyze=4,demo=1' -> {'analyze': 4.0, 'demo': 1.0}; unknown ops are rejected."""
+    mix = {}
+    for part in filter(None, (p.strip() for p in spec.split(','))):
+        op, _, weight = part.partition('=')
+        if op not in OPS:
+            raise ValueError(f"unknown op {op!r} (expected one of {', '.join(OPS)})")
+        mix[op] = float(weight or 1)
+    if not mix or sum(mix.values()) <= 0:
+        raise ValueError('empty mix')
+    return mix
+
+
+def percentile(values: Sequence[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile (q in 0..100) of values, None if empty."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered), math.ceil(q / 100 * len(ordered))) - 1)]
+
+
+def process_tree_rss(pid: int) -> Dict[int, int]:
+    """{pid: RSS bytes} for pid and all its descendants (Linux /proc; empty elsewhere)."""
+    out, todo = {}, [pid]
+    while todo:
+        p = todo.pop()
+        try:
+            with open(f'/proc/{p}/status') as f:
+                rss = next((int(line.split()[1]) * 1024 for line in f if line.startswith('VmRSS:')), 0)
+        except OSError:
+            continue
+        out[p] = rss
+        for task in Path(f'/proc/{p}/task').glob('*/children'):
+            try:
+                todo.extend(int(c) for c in task.read_text().split())
+            except OSError:
+                pass
+    return out
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+@contextmanager
+def local_server(workers: int = 1, env: Optional[Dict[str, str]] = None, cold: bool = False,
+                 startup_timeout_s: float = 60.0, prefork: bool = False) -> Iterator[tuple]:
+    """Run uvicorn (or the pre-fork server, backend.prefork) with isolated temp storage; yields (base_url, pid)."""
+    tmp = Path(tempfile.mkdtemp(prefix='greatjeans-load-'))
+    port = _free_port()
+    server_env = {**os.environ, 'STORAGE_ROOT': str(tmp / 'uploads'), 'JOBS_DB': str(tmp / 'jobs.sqlite3'),
+                  'LOG_LEVEL': 'WARNING', **(env or {})}
+    if cold:  # every /analyze does the full work
+        server_env.update(RESULT_CACHE_MEM_MB='0', RESULT_CACHE_DISK_MB='0')
+    if prefork:
+        cmd = [sys.executable, '-m', 'backend.prefork', '--host', '127.0.0.1', '--port', str(port),
+               '--workers', str(workers), '--log-level', 'warning']
+    else:
+        cmd = [sys.executable, '-m', 'uvicorn', 'backend.api:app', '--host', '127.0.0.1', '--port', str(port),
+               '--workers', str(workers), '--log-level', 'warning', '--no-access-log']
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=server_env)
+    url = f'http://127.0.0.1:{port}'
+    try:
+        deadline = time.monotonic() + startup_timeout_s
+        while True:
+            if proc.poll() is not None:
+                raise RuntimeError(f'server exited with code {proc.returncode}')
+            try:
+                if httpx.get(f'{url}/health', timeout=1.0).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError('server did not become healthy')
+            time.sleep(0.2)
+        yield url, proc.pid
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+class _Recorder:
+    def __init__(self):
+        self.samples: Dict[str, List[tuple]] = {}  # key -> [(latency_s, status or exception name)]
+
+    def add(self, key: str, latency_s: float, status) -> None:
+        self.samples.setdefault(key, []).append((latency_s, status))
+
+    def summary(self, elapsed_s: float) -> Dict[str, Dict[str, Any]]:
+        out = {}
+        for key, samples in sorted(self.samples.items()):
+            latencies = [lat * 1000 for lat, _ in samples]
+            statuses: Dict[str, int] = {}
+            for _, status in samples:
+                statuses[str(status)] = statuses.get(str(status), 0) + 1
+            errors = sum(1 for _, s in samples if not (isinstance(s, int) and s < 400))
+            out[key] = {
+                'requests': len(samples), 'errors': errors, 'error_rate': round(errors / len(samples), 4),
+                'statuses': statuses, 'throughput_rps': round(len(samples) / elapsed_s, 3),
+                **{f'p{q}_ms': round(percentile(latencies, q), 1) for q in (50, 95, 99)},
+                'max_ms': round(max(latencies), 1),
+            }
+        return out
+
+
+async def _sample_rss(pid: Optional[int], t0: float, interval_s: float, timeline: list, stop: asyncio.Event) -> None:
+    while pid is not None:
+        tree = process_tree_rss(pid)
+        timeline.append({'t': round(time.monotonic() - t0, 2), 'rss_mb': round(sum(tree.values()) / 2**20, 1), 'processes': len(tree)})
+        try:
+            await asyncio.wait_for(stop.wait(), interval_s)
+            return
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run_load(url: str, server_pid: Optional[int] = None, rate: float = 5.0, duration_s: float = 30.0,
+                   sizes: Sequence[int] = (10_000,), mix: Optional[Dict[str, float]] = None, seed: int = 0,
+                   max_connections: int = 64, rss_interval_s: float = 1.0) -> Dict[str, Any]:
+    """Replay the mix at `rate` req/s for duration_s against url; returns the report dict."""
+    from .analysis.bench import synth_23andme, catalog_rsids
+    from .analysis.windows import fetch_window_for_rsid
+    from .engine import WINDOW_PATHS
+
+    mix = mix or dict(DEFAULT_MIX)
+    rng = random.Random(seed)
+    known = catalog_rsids()
+    files = {n: synth_23andme(n, seed=n, known=known) for n in sizes}
+    wt_seq, mut_seq, center = fetch_window_for_rsid('rs1042522', WINDOW_PATHS)
+    rec = _Recorder()
+    limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+
+    async with httpx.AsyncClient(base_url=url, timeout=REQUEST_TIMEOUT_S, limits=limits) as client:
+        uploads: Dict[int, List[str]] = {}
+        for n, raw in files.items():  # warm-up: one stored genome per size for /analyze
+            r = await client.post('/upload', files={'file': (f'synthetic_{n}.txt', raw, 'text/plain')})
+            r.raise_for_status()
+            uploads[n] = [r.json()['upload_id']]
+
+        async def one(op: str, scheduled: float) -> None:
+            n = rng.choice(list(sizes))
+            key = f'{op}@{n}' if op in ('analyze', 'upload') else op
+            try:
+                if op == 'analyze':
+                    body = {'upload_id': rng.choice(uploads[n]), 'run_traits': rng.random() < 0.5,
+                            'run_protein': rng.random() < 0.5, 'run_pgs': rng.random() < 0.5}
+                    r = await client.post('/analyze', json=body)
+                elif op == 'upload':
+                    r = await client.post('/upload', files={'file': (f'synthetic_{n}.txt', files[n], 'text/plain')})
+                    if r.status_code == 200:
+                        uploads[n].append(r.json()['upload_id'])
+                elif op == 'ss_predict':
+                    r = await client.post('/model/ss_predict', json={'wt_seq': wt_seq, 'mut_seq': mut_seq, 'center': center})
+                else:
+                    r = await client.get('/demo/na12878')
+                status = r.status_code
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            rec.add(key, time.monotonic() - scheduled, status)
+
+        ops, weights = list(mix), list(mix.values())
+        stop = asyncio.Event()
+        timeline: List[Dict[str, Any]] = []
+        t0 = time.monotonic()
+        sampler = asyncio.create_task(_sample_rss(server_pid, t0, rss_interval_s, timeline, stop))
+        tasks, at = [], t0
+        while True:
+            at += rng.expovariate(rate)
+            if at - t0 >= duration_s:
+                break
+            await asyncio.sleep(max(0.0, at - time.monotonic()))
+            tasks.append(asyncio.create_task(one(rng.choices(ops, weights)[0], at)))
+        await asyncio.gather(*tasks)
+        elapsed = time.monotonic() - t0
+        stop.set()
+        await sampler
+
+    endpoints = rec.summary(elapsed)
+    total = sum(e['requests'] for e in endpoints.values())
+    errors = sum(e['errors'] for e in endpoints.values())
+    return {
+        'config': {'url': url, 'rate': rate, 'duration_s': duration_s, 'sizes': list(sizes), 'mix': mix, 'seed': seed},
+        'totals': {'requests': total, 'errors': errors, 'error_rate': round(errors / total, 4) if total else 0.0,
+                   'elapsed_s': round(elapsed, 2), 'throughput_rps': round(total / elapsed, 3)},
+        'endpoints': endpoints,
+        'rss': {'max_mb': max((s['rss_mb'] for s in timeline), default=None),
+                'final_mb': timeline[-1]['rss_mb'] if timeline else None, 'timeline': timeline},
+    }
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    t = report['totals']
+    lines = [f"{'endpoint':<20} {'reqs':>6} {'err%':>6} {'rps':>7} {'p50_ms':>9} {'p95_ms':>9} {'p99_ms':>9} {'max_ms':>9}"]
+    for key, e in report['endpoints'].items():
+        lines.append(f"{key:<20} {e['requests']:>6} {e['error_rate'] * 100:>5.1f}% {e['throughput_rps']:>7.2f} "
+                     f"{e['p50_ms']:>9.1f} {e['p95_ms']:>9.1f} {e['p99_ms']:>9.1f} {e['max_ms']:>9.1f}")
+    lines.append(f"total: {t['requests']} requests in {t['elapsed_s']}s ({t['throughput_rps']} rps), "
+                 f"errors {t['errors']} ({t['error_rate'] * 100:.1f}%)")
+    if report['rss']['max_mb'] is not None:
+        lines.append(f"server RSS: max {report['rss']['max_mb']} MB, final {report['rss']['final_mb']} MB")
+    return '\n'.join(lines)
+
+
+def _main(argv=None) -> None:
+    import argparse
+    import json
+    parser = argparse.ArgumentParser(prog='python -m backend.loadtest')
+    parser.add_argument('--url', help='target a running server instead of starting one')
+    parser.add_argument('--workers', type=int, default=1, help='uvicorn worker processes')
+    parser.add_argument('--env', action='append', default=[], metavar='KEY=VALUE', help='extra server env, e.g. ANALYSIS_WORKERS=4')
+    parser.add_argument('--cold', action='store_true', help='disable the result cache on the started server')
+    parser.add_argument('--prefork', action='store_true', help='start backend.prefork instead of uvicorn --workers')
+    parser.add_argument('--rate', type=float, default=5.0, help='target requests per second')
+    parser.add_argument('--duration', type=float, default=30.0, help='seconds of load')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000], help='synthetic genome sizes')
+    parser.add_argument('--mix', type=parse_mix, default=dict(DEFAULT_MIX), help='e.g. analyze=4,ss_predict=2,upload=1,demo=1')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', help='write the JSON report here')
+    args = parser.parse_args(argv)
+
+    kwargs = dict(rate=args.rate, duration_s=args.duration, sizes=args.sizes, mix=args.mix, seed=args.seed)
+    if args.url:
+        report = asyncio.run(run_load(args.url, **kwargs))
+    else:
+        env = dict(item.split('=', 1) for item in args.env)
+        with local_server(args.workers, env, args.cold, prefork=args.prefork) as (url, pid):
+            report = asyncio.run(run_load(url, pid, **kwargs))
+        report['config'].update(workers=args.workers, env=env, cold=args.cold)
+    print(format_report(report))
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, indent=1) + '\n')
+
+
+if __name__ == '__main__':
+    _main()
+
+__all__ = ['DEFAULT_MIX', 'parse_mix', 'percentile', 'process_tree_rss', 'local_server', 'run_load', 'format_report']
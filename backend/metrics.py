@@ -0,0 +1,308 @@
+"""Process metrics in Prometheus text exposition format (served at /metrics).
+
+A deliberately tiny registry (counters, gauges, histograms with labels) so
+the service needs no client library. Metrics live in the API process; work
+done in analysis worker processes is measured there with AnalysisProbe and
+shipped back with the result as a plain dict, then folded in by
+record_analysis(). Probing is a handful of perf_counter calls per stage plus
+one /proc read, i.e. microseconds against an analysis that takes milliseconds
+to seconds.
+"""
+from __future__ import annotations
+import bisect
+import os
+import resource
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+RSS_BUCKETS = tuple(float(mb * 1024 * 1024) for mb in (64, 128, 256, 512, 1024, 2048, 4096, 8192))
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _fmt_labels(names: Tuple[str, ...], values: Tuple[str, ...], le: Optional[str] = None) -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if le is not None:
+        parts.append(f'le="{le}"')
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _fmt_value(v: float) -> str:
+    if v == float('inf'):
+        return '+Inf'
+    return repr(float(v)) if not float(v).is_integer() else str(int(v))
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, '')) for n in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}', *self._samples()]
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def __init__(self, *a, **kw):
+        super().__init__(*a, **kw)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f'{self.name}{_fmt_labels(self.labelnames, k)} {_fmt_value(v)}' for k, v in items]
+
+
+class Gauge(_Metric):
+    """Gauge whose samples come from a callback at scrape time: fn() -> {label values: value}."""
+    kind = 'gauge'
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = (), fn: Optional[Callable] = None):
+        super().__init__(name, help, labelnames)
+        self.fn = fn
+
+    def _samples(self) -> List[str]:
+        try:
+            values = self.fn() if self.fn else {}
+        except Exception:  # a broken probe must not break the scrape
+            return []
+        if not isinstance(values, dict):
+            values = {(): values}
+        return [f'{self.name}{_fmt_labels(self.labelnames, k if isinstance(k, tuple) else (k,))} {_fmt_value(v)}'
+                for k, v in sorted(values.items())]
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], list] = {}  # key -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._series.get(key)
+            if s is None:
+                s = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            if i < len(self.buckets):
+                s[i] += 1
+            s[-2] += value
+            s[-1] += 1
+
+    def count(self, **labels) -> int:
+        s = self._series.get(self._key(labels))
+        return s[-1] if s else 0
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        out = []
+        for key, s in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, s):
+                cumulative += n
+                out.append(f'{self.name}_bucket{_fmt_labels(self.labelnames, key, _fmt_value(bound))} {cumulative}')
+            out.append(f'{self.name}_bucket{_fmt_labels(self.labelnames, key, "+Inf")} {s[-1]}')
+            out.append(f'{self.name}_sum{_fmt_labels(self.labelnames, key)} {_fmt_value(s[-2])}')
+            out.append(f'{self.name}_count{_fmt_labels(self.labelnames, key)} {s[-1]}')
+        return out
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return '\n'.join(line for m in self._metrics for line in m.render()) + '\n'
+
+
+# -- measuring inside a worker ---------------------------------------------------
+
+def reset_peak_rss() -> bool:
+    """Reset this process's peak-RSS watermark (Linux >= 4.0); False if unsupported."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _proc_status_kb(field: str) -> Optional[int]:
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def peak_rss_bytes() -> int:
+    """Peak resident set size since the last reset_peak_rss() (else since process start)."""
+    kb = _proc_status_kb('VmHWM:')
+    return (kb if kb is not None else resource.getrusage(resource.RUSAGE_SELF).ru_maxrss) * 1024
+
+
+def rss_bytes() -> Optional[int]:
+    """Current resident set size, or None where /proc is unavailable."""
+    kb = _proc_status_kb('VmRSS:')
+    return kb * 1024 if kb is not None else None
+
+
+def _cache_counters() -> Dict[str, Tuple[int, int]]:
+    """(hits, misses) of the per-process caches an analysis touches."""
+    from .analysis.windows import window_cache_info
+    from .analysis.ss_registry import registry_stats
+    from .prepare import lookup_stats
+    from .genome_cache import cache as genome_cache
+    return {'windows': window_cache_info(), 'ss_model': registry_stats(), 'prepared': lookup_stats(),
+            'genome': genome_cache.lookups()}
+
+
+def _genome_cache_bytes() -> int:
+    from .genome_cache import cache as genome_cache
+    return genome_cache.stats()['bytes']
+
+
+class AnalysisProbe:
+    """Collects stage timings, cache hit/miss deltas and peak RSS for one analysis."""
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+        self.format = 'unknown'
+        self._rss_reset = reset_peak_rss()
+        self._caches = _cache_counters()
+
+    @contextmanager
+    def stage(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - t0)
+
+    def add(self, name: str, seconds: float) -> None:
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def finish(self) -> Dict:
+        after = _cache_counters()
+        return {
+            'format': self.format,
+            'stages': self.stages,
+            'peak_rss_bytes': peak_rss_bytes() if self._rss_reset else None,
+            'caches': {k: (after[k][0] - self._caches[k][0], after[k][1] - self._caches[k][1]) for k in after},
+            'genome_cache_bytes': (os.getpid(), _genome_cache_bytes()),
+        }
+
+
+# -- API-process registry ----------------------------------------------------------
+
+registry = Registry()
+STAGE_SECONDS = registry.register(Histogram(
+    'greatjeans_stage_seconds', 'Time spent per analysis stage.', ('stage', 'format')))
+ANALYSIS_PEAK_RSS = registry.register(Histogram(
+    'greatjeans_analysis_peak_rss_bytes', 'Peak resident memory of the worker during one analysis.', ('format',), RSS_BUCKETS))
+CACHE_LOOKUPS = registry.register(Counter(
+    'greatjeans_cache_lookups_total', 'Cache lookups by cache and result (hit/miss).', ('cache', 'result')))
+# bytes held by each process's genome cache: this one's live, workers' as of their last analysis
+_worker_genome_bytes: Dict[int, int] = {}
+
+
+def _prune_worker_genome_bytes() -> None:
+    """Forget pool workers that exited (replaced pools, max_tasks, crashes): one series per live worker."""
+    import multiprocessing
+    live = {p.pid for p in multiprocessing.active_children()}
+    for pid in [p for p in _worker_genome_bytes if p not in live]:
+        del _worker_genome_bytes[pid]
+
+
+def _genome_bytes_by_process() -> Dict[str, int]:
+    _prune_worker_genome_bytes()
+    return {'api': _genome_cache_bytes(), **{f'worker-{pid}': n for pid, n in _worker_genome_bytes.items()}}
+
+
+GENOME_CACHE_BYTES = registry.register(Gauge(
+    'greatjeans_genome_cache_bytes', 'Bytes of parsed genomes held in the genome cache, per process.', ('process',),
+    fn=_genome_bytes_by_process))
+HTTP_SECONDS = registry.register(Histogram(
+    'greatjeans_http_request_duration_seconds', 'HTTP request latency by route.', ('method', 'route', 'status')))
+
+
+def _hit_ratios() -> Dict[str, float]:
+    out = {}
+    for cache in sorted({k[0] for k in CACHE_LOOKUPS._values}):
+        hits, misses = CACHE_LOOKUPS.value(cache=cache, result='hit'), CACHE_LOOKUPS.value(cache=cache, result='miss')
+        out[cache] = hits / (hits + misses) if hits + misses else 0.0
+    return out
+
+
+registry.register(Gauge('greatjeans_cache_hit_ratio', 'Cache hit ratio since process start.', ('cache',), fn=_hit_ratios))
+
+
+def observe_stage(stage: str, seconds: float, fmt: str = 'unknown') -> None:
+    STAGE_SECONDS.observe(seconds, stage=stage, format=fmt)
+
+
+def count_cache(cache: str, hits: int = 0, misses: int = 0) -> None:
+    if hits:
+        CACHE_LOOKUPS.inc(hits, cache=cache, result='hit')
+    if misses:
+        CACHE_LOOKUPS.inc(misses, cache=cache, result='miss')
+
+
+def record_analysis(stats: Dict) -> None:
+    """Fold an AnalysisProbe.finish() dict from a worker into the registry."""
+    fmt = stats.get('format') or 'unknown'
+    for stage, seconds in stats.get('stages', {}).items():
+        observe_stage(stage, seconds, fmt)
+    if stats.get('peak_rss_bytes'):
+        ANALYSIS_PEAK_RSS.observe(stats['peak_rss_bytes'], format=fmt)
+    for cache, (hits, misses) in stats.get('caches', {}).items():
+        count_cache(cache, hits, misses)
+    if stats.get('genome_cache_bytes'):
+        pid, held = stats['genome_cache_bytes']
+        if pid != os.getpid():  # ANALYSIS_WORKERS=0: this process, already exported as api
+            _worker_genome_bytes[pid] = held
+            _prune_worker_genome_bytes()
+
+
+__all__ = [
+    'CONTENT_TYPE', 'Counter', 'Gauge', 'Histogram', 'Registry', 'AnalysisProbe', 'registry',
+    'STAGE_SECONDS', 'ANALYSIS_PEAK_RSS', 'CACHE_LOOKUPS', 'GENOME_CACHE_BYTES', 'HTTP_SECONDS',
+    'observe_stage', 'count_cache', 'record_analysis', 'reset_peak_rss', 'peak_rss_bytes', 'rss_bytes',
+]
@@ -6,6 +6,7 @@ from typing import List, Optional, Dict, Any
 class UploadResponse(BaseModel):
     upload_id: str
     format: str | None = None
+    prepared: str = 'none'  # none | pending | ready | failed (see backend/prepare.py)
 
 class AnalyzeRequest(BaseModel):
     upload_id: str
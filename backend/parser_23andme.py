@@ -2,14 +2,19 @@
 Expected tab-delimited columns: rsid\tchromosome\tposition\tgenotype
 Lines beginning with '#' are comments.
 Returns pandas DataFrame with columns [rsid, chrom, pos, genotype].
+Reads from bytes or a binary stream, so uploads never need to be fully in memory.
 """
 from __future__ import annotations
-import pandas as pd
+import io
 from io import StringIO
-from typing import Tuple
+from typing import TYPE_CHECKING, BinaryIO, Tuple
 from .utils import normalize_chrom, normalize_genotype
 
+if TYPE_CHECKING:  # imported on first parse: sniffing (is_23andme_text) needs neither
+    import pandas as pd
+
 EXPECTED_HEADER = ['rsid','chromosome','position','genotype']
+CHUNK_LINES = 200_000
 
 
 def is_23andme_text(head: str) -> bool:
@@ -23,45 +28,69 @@ def is_23andme_text(head: str) -> bool:
     return '# rsid' in head.lower()
 
 
-def parse_23andme(raw_bytes: bytes) -> pd.DataFrame:
-    text = raw_bytes.decode(errors='ignore')
-    lines = text.splitlines()
-    # Find header line (can be commented: '# rsid')
-    header_idx = None
-    cleaned_header = None
-    for i, line in enumerate(lines):
-        raw = line.strip()
-        if not raw:
-            continue
-        if raw.startswith('#'):
-            candidate = raw.lstrip('#').strip()
-            if candidate.lower().startswith('rsid'):
-                header_idx = i
-                cleaned_header = candidate
+def _normalized(col: pd.Series, fn) -> pd.Series:
+    """col.astype(str).map(fn), calling fn once per distinct value; missing values become fn(None)."""
+    import numpy as np
+    import pandas as pd
+    codes, uniques = pd.factorize(col.astype(str))
+    # code -1 (missing) picks the trailing fn(None)
+    values = np.asarray([fn(u) for u in uniques] + [fn(None)], dtype=object)
+    return pd.Series(values[codes], index=col.index, dtype=str)
+
+
+def _read_chunk(header: str, lines: list) -> pd.DataFrame:
+    import pandas as pd
+    return pd.read_csv(StringIO('\n'.join([header, *lines])), sep='\t')
+
+
+def parse_23andme(source: bytes | BinaryIO, chunk_lines: int = CHUNK_LINES) -> pd.DataFrame:
+    """Parse raw bytes or a binary stream (e.g. storage.open_upload), chunk_lines rows at a time.
+
+    Only one chunk of text lines is held at once, never the whole decoded file.
+    """
+    import pandas as pd
+    stream = io.BytesIO(source) if isinstance(source, (bytes, bytearray, memoryview)) else source
+    lines = io.TextIOWrapper(stream, encoding='utf-8', errors='ignore', newline=None)
+    try:
+        # Find header line (can be commented: '# rsid')
+        cleaned_header = None
+        for line in lines:
+            raw = line.strip()
+            if not raw:
+                continue
+            if raw.startswith('#'):
+                candidate = raw.lstrip('#').strip()
+                if candidate.lower().startswith('rsid'):
+                    cleaned_header = candidate
+                    break
+                continue
+            if raw.lower().startswith('rsid'):
+                cleaned_header = raw
                 break
-            continue
-        if raw.lower().startswith('rsid'):
-            header_idx = i
-            cleaned_header = raw
-            break
-    if header_idx is None:
-        raise ValueError('no_data_lines')
-    # Collect data lines ensuring header present first
-    data_lines = [cleaned_header]
-    for line in lines[header_idx+1:]:
-        if not line.strip():
-            continue
-        if line.startswith('#'):
-            continue
-        parts = line.split('\t')
-        if len(parts) >= 4:
-            data_lines.append('\t'.join(parts[:4]))
-    if not data_lines:
-        raise ValueError('no_data_lines')
-    df = pd.read_csv(StringIO('\n'.join(data_lines)), sep='\t')
+        if cleaned_header is None:
+            raise ValueError('no_data_lines')
+        # Collect data lines chunk by chunk, each parsed under the header
+        chunks, data_lines = [], []
+        for line in lines:
+            line = line.rstrip('\n')
+            if not line.strip():
+                continue
+            if line.startswith('#'):
+                continue
+            parts = line.split('\t')
+            if len(parts) >= 4:
+                data_lines.append('\t'.join(parts[:4]))
+                if len(data_lines) >= chunk_lines:
+                    chunks.append(_read_chunk(cleaned_header, data_lines))
+                    data_lines = []
+        if data_lines or not chunks:
+            chunks.append(_read_chunk(cleaned_header, data_lines))
+    finally:
+        lines.detach()
+    df = pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
     df.columns = [c.lower() for c in df.columns]
     df.rename(columns={'chromosome':'chrom','position':'pos'}, inplace=True)
     df = df[['rsid','chrom','pos','genotype']]
-    df['chrom'] = df['chrom'].astype(str).map(normalize_chrom)
-    df['genotype'] = df['genotype'].astype(str).map(normalize_genotype)
+    df['chrom'] = _normalized(df['chrom'], normalize_chrom)
+    df['genotype'] = _normalized(df['genotype'], normalize_genotype)
     return df
@@ -1,33 +1,40 @@
 """Minimal VCF parser. Uses cyvcf2 if available, else a lightweight fallback.
 Returns list of dict variants: {rsid, chrom, pos, genotype}
+Reads from bytes or a binary stream (plain or gzip), so uploads never need to be fully in memory.
 """
 from __future__ import annotations
 from pathlib import Path
-from typing import List, Dict
+from typing import BinaryIO, List, Dict
 import gzip, io
+from importlib.util import find_spec
 from .utils import normalize_chrom, normalize_genotype
 
-try:
-    from cyvcf2 import VCF  # type: ignore
-    HAVE_CYVCF2 = True
-except Exception:  # pragma: no cover - optional dep
-    HAVE_CYVCF2 = False
+# cyvcf2 (and NumPy with it) is imported by the first parse, not by sniffing (is_vcf)
+HAVE_CYVCF2 = find_spec('cyvcf2') is not None
 
 
 def is_vcf(head: bytes) -> bool:
     return head.startswith(b'##fileformat=VCF') or b'\n#CHROM' in head
 
 
-def parse_vcf(raw_bytes: bytes) -> List[Dict]:
+def _binary(source: bytes | BinaryIO) -> BinaryIO:
+    """A peekable binary stream over raw bytes or any readable stream."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BufferedReader(io.BytesIO(source))
+    return source if hasattr(source, 'peek') else io.BufferedReader(source)
+
+
+def parse_vcf(source: bytes | BinaryIO) -> List[Dict]:
+    """Parse a (optionally gzipped) VCF from raw bytes or a binary stream, line by line."""
+    stream = _binary(source)
+    gz = stream.peek(2)[:2] == b'\x1f\x8b'
     if HAVE_CYVCF2:
-        # Need to feed via temp in-memory file; simplest: write to BytesIO and pass path not supported -> write to temp file.
-        import tempfile
-        suffix = '.vcf'
-        # detect gzip
-        if raw_bytes[:2] == b'\x1f\x8b':
-            suffix = '.vcf.gz'
+        # cyvcf2 reads from a path: spool the stream to a temp file
+        import shutil, tempfile
+        from cyvcf2 import VCF  # type: ignore
+        suffix = '.vcf.gz' if gz else '.vcf'
         with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-            tmp.write(raw_bytes)
+            shutil.copyfileobj(stream, tmp, 1 << 20)
             tmp_path = tmp.name
         variants = []
         try:
@@ -42,11 +49,10 @@ def parse_vcf(raw_bytes: bytes) -> List[Dict]:
             Path(tmp_path).unlink(missing_ok=True)
         return variants
     # Fallback naive parser
-    data = raw_bytes
-    if raw_bytes[:2] == b'\x1f\x8b':
-        data = gzip.decompress(raw_bytes)
+    data = gzip.GzipFile(fileobj=stream) if gz else stream
     variants: List[Dict] = []
-    for line in data.splitlines():
+    for line in data:
+        line = line.rstrip(b'\r\n')
         if not line or line.startswith(b'#'):
             continue
         parts = line.decode(errors='ignore').split('\t')
@@ -1,15 +1,18 @@
 """Tiny polygenic score demo for BMI."""
 from __future__ import annotations
-import pandas as pd
 from pathlib import Path
-from typing import Dict, Any
+from typing import TYPE_CHECKING, Dict, Any
+from .annotate_local import genotype_lookup
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 
 def compute_bmi_pgs(df_variants: pd.DataFrame, catalogs=None):
     if not catalogs or catalogs.pgs.empty:
         return None
     pgs_df = catalogs.pgs
-    geno_map = df_variants.set_index('rsid')['genotype'].to_dict()
+    geno_map = genotype_lookup(df_variants, pgs_df['rsid'])
     score = 0.0
     weight_sum = 0.0
     for r in pgs_df.itertuples():
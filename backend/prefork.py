@@ -0,0 +1,265 @@
+"""Pre-fork server: load everything once in a master process, then fork the HTTP workers.
+
+`uvicorn --workers N` spawns N fresh interpreters, and each one imports pandas,
+loads every catalog, builds the catalog indexes and loads the SS model on its
+own. This entry point does all of that once:
+
+1. preload(): import the app and the libraries it imports lazily (pandas,
+   NumPy, the SS model code), load the catalogs and their rsid indexes, the
+   analysis version, the SS model and the protein window tables;
+2. gc.freeze(): move every object alive now into the permanent generation,
+   so the cyclic GC of a worker never touches (and so never copies) the pages
+   it shares with the master (Python >= 3.7);
+3. bind the listening socket and fork `--workers` children, each serving the
+   app with uvicorn on the inherited socket.
+
+Workers share the preloaded pages copy-on-write; only what they write is
+duplicated. The master supervises: a worker that dies is re-forked from the
+warm image (no import / load), and SIGTERM / SIGINT are forwarded to the
+workers for a graceful shutdown. Analysis pool processes fork from their
+worker and inherit the same pages.
+
+The duties a lone API process runs from its lifespan besides serving (job
+recovery, the storage janitor) must run once per node, not once per worker:
+the master recovers orphaned jobs before forking, then runs the janitor
+sweeps and the periodic lease recovery between its waits (single-threaded,
+so forking a replacement worker never copies a lock held by another thread).
+Workers only run their JobRunner.
+
+    python -m backend.prefork [--host 0.0.0.0] [--port 8000] [--workers 2]
+    python -m backend.prefork compare [--workers 2]   # uvicorn --workers vs pre-fork: startup CPU, RSS/PSS/USS per worker
+
+compare() starts both servers with isolated storage (loadtest.local_server),
+warms every worker with the same requests and reads per-process memory from
+/proc/<pid>/smaps_rollup: USS (private) is what each extra worker really
+costs, PSS the fair share of the shared pages.
+"""
+from __future__ import annotations
+import gc, logging, os, signal, socket, sys, time
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MIN_UPTIME_S = 5.0  # a worker dying sooner than this is restarted after a pause, not in a tight loop
+TICK_S = 0.5  # longest the master sleeps between reaping workers
+
+
+def preload():
+    """Import the app and build every shared, read-only structure; returns the ASGI app."""
+    gc.disable()  # no collections while loading: fewer half-empty pages, nothing moved before the freeze
+    t0 = time.perf_counter()
+    from .api import app
+    from . import engine
+    from .analysis import ss_registry, windows
+    from .workers import preload_modules
+    preload_modules()  # what a lone worker would import on its first request
+    engine.catalogs.warm()
+    engine.analysis_version()
+    try:
+        ss_registry.get_model()
+    except Exception as e:  # served as 503 by the endpoints, exactly as without pre-fork
+        logger.warning(f"event=prefork_model_unavailable err={e}")
+    windows._open_fasta(windows._fasta_path(engine.WINDOW_PATHS))
+    windows._protein_rows(engine.DATA_DIR)
+    windows._json_windows(engine.DATA_DIR)
+    gc.collect()
+    gc.freeze()
+    logger.info(f"event=prefork_preloaded frozen_objects={gc.get_freeze_count()} time_ms={(time.perf_counter()-t0)*1000:.0f}")
+    return app
+
+
+class _Housekeeping:
+    """The lifespan's once-per-node duties (see api.lifespan), run by the master between waits."""
+
+    def __init__(self):
+        from . import api, jobs
+        from .janitor import janitor
+        self.jobs, self.janitor, self.purge = jobs, janitor, api.janitor_purge()
+        self._next_sweep = self._next_recover = 0.0
+
+    def start(self) -> None:
+        self.jobs.recover_orphans(self.jobs.store)
+        self._next_recover = time.monotonic() + self.jobs.store.lease_s
+        if self.janitor.interval_s > 0:
+            self.janitor.purge = self.purge
+            self.janitor.migrate()
+
+    def run_due(self) -> float:
+        """Run whatever is due; returns how long the master may sleep."""
+        now = time.monotonic()
+        if now >= self._next_recover:
+            self._next_recover = now + self.jobs.store.lease_s
+            try:
+                self.jobs.recover_orphans(self.jobs.store)
+            except Exception as e:  # a locked / unavailable DB must not kill the master
+                logger.warning(f"event=jobs_recover_failed err={type(e).__name__}:{e}")
+        if self.janitor.interval_s > 0 and now >= self._next_sweep:
+            self._next_sweep = now + self.janitor.interval_s
+            try:
+                self.janitor.sweep()
+            except Exception as e:
+                logger.warning(f"event=janitor_sweep_failed err={type(e).__name__}:{e}")
+        due = self._next_recover if self.janitor.interval_s <= 0 else min(self._next_recover, self._next_sweep)
+        return max(0.0, min(TICK_S, due - time.monotonic()))
+
+
+def _bind(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ':' in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _serve_worker(app, sock: socket.socket, log_level: str) -> None:
+    import uvicorn
+    for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+        signal.signal(sig, signal.SIG_DFL)
+    gc.enable()
+    config = uvicorn.Config(app, log_level=log_level, access_log=False, lifespan='on')
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def serve(host: str = '0.0.0.0', port: int = 8000, workers: int = 2, log_level: str = 'info') -> int:
+    """Run the master until SIGTERM / SIGINT; returns the exit code."""
+    app = preload()
+    app.state.housekeeping = False  # workers: the master does it (inherited by every fork)
+    housekeeping = _Housekeeping()
+    housekeeping.start()  # before forking: no worker claims a job before the orphans are requeued
+    gc.enable()  # the preloaded objects are frozen; the master's own garbage from here on is collected
+    sock = _bind(host, port)
+    children: Dict[int, float] = {}  # pid -> fork time
+    stopping = False
+
+    def spawn() -> None:
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                _serve_worker(app, sock, log_level)
+            except BaseException:
+                logger.exception('event=prefork_worker_crashed')
+                code = 1
+            finally:
+                os._exit(code)
+        children[pid] = time.monotonic()
+
+    def stop(signum, _frame) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for _ in range(workers):
+        spawn()
+    logger.info(f"event=prefork_started pid={os.getpid()} workers={workers} listen={host}:{port}")
+    while children:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if pid == 0:
+            time.sleep(TICK_S if stopping else housekeeping.run_due())
+            continue
+        started = children.pop(pid, None)
+        if started is None or stopping:
+            continue
+        uptime = time.monotonic() - started
+        logger.warning(f"event=prefork_worker_exited pid={pid} status={status} uptime_s={uptime:.1f}; restarting")
+        if uptime < MIN_UPTIME_S:
+            time.sleep(1.0)
+        if not stopping:
+            spawn()
+    sock.close()
+    return 0
+
+
+# -- measurement ---------------------------------------------------------------------------------
+
+def process_memory(pid: int) -> Dict[str, int]:
+    """{'rss', 'pss', 'uss'} bytes of one process from /proc/<pid>/smaps_rollup (Linux)."""
+    fields = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 3 and parts[0].endswith(':'):
+                fields[parts[0][:-1]] = int(parts[1]) * 1024
+    return {'rss': fields.get('Rss', 0), 'pss': fields.get('Pss', 0),
+            'uss': fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)}
+
+
+def _cmdline(pid: int) -> bytes:
+    with open(f'/proc/{pid}/cmdline', 'rb') as f:
+        return f.read()
+
+
+def _cpu_seconds(pid: int) -> float:
+    with open(f'/proc/{pid}/stat') as f:
+        stat = f.read().rsplit(')', 1)[1].split()
+    return (int(stat[11]) + int(stat[12])) / os.sysconf('SC_CLK_TCK')  # utime + stime
+
+
+def _measure(prefork: bool, workers: int, warm_requests: int) -> Dict[str, Any]:
+    import httpx
+    from .loadtest import local_server, process_tree_rss
+    from .analysis import bench
+    t0 = time.perf_counter()
+    with local_server(workers=workers, prefork=prefork, env={'ANALYSIS_WORKERS': '0', 'STORAGE_TTL_S': '0'}) as (url, pid):
+        healthy_s = time.perf_counter() - t0
+        with httpx.Client(base_url=url, timeout=120) as client:
+            uid = client.post('/upload', files={'file': ('g.txt', bench.synth_23andme(20000, seed=1), 'text/plain')}).json()['upload_id']
+            for i in range(warm_requests):  # spread over the workers by the kernel's accept balancing
+                client.post('/analyze', json={'upload_id': uid, 'run_pgs': bool(i % 2)}, headers={'Accept': 'application/x-ndjson'})
+                client.post('/model/ss_predict', json={'wt_seq': 'MKTAYIAKQR', 'mut_seq': 'MKTAYIAKPR'})
+        tree = sorted(process_tree_rss(pid))
+        procs = {p: process_memory(p) for p in tree}
+        # HTTP workers only; uvicorn's multiprocessing resource tracker still counts in the total
+        worker_pids = [p for p in tree if p != pid and b'resource_tracker' not in _cmdline(p)]
+        startup_cpu = sum(_cpu_seconds(p) for p in tree)
+    per_worker = [procs[p] for p in worker_pids]
+    mean = lambda key: int(sum(m[key] for m in per_worker) / max(1, len(per_worker)))
+    return {'server': 'prefork' if prefork else 'uvicorn', 'workers': len(worker_pids), 'healthy_s': round(healthy_s, 2),
+            'cpu_s': round(startup_cpu, 2), 'worker_rss': mean('rss'), 'worker_pss': mean('pss'), 'worker_uss': mean('uss'),
+            'total_pss': sum(m['pss'] for m in procs.values())}
+
+
+def compare(workers: int = 2, warm_requests: int = 6) -> List[Dict[str, Any]]:
+    """Startup and per-worker memory of `uvicorn --workers` vs this pre-fork server, same workload."""
+    return [_measure(False, workers, warm_requests), _measure(True, workers, warm_requests)]
+
+
+def format_comparison(rows: List[Dict[str, Any]]) -> str:
+    mb = lambda b: f'{b / 1024 / 1024:.0f}MB'
+    lines = [f"{'server':<8} {'workers':>7} {'healthy':>8} {'cpu':>7} {'rss/wkr':>8} {'pss/wkr':>8} {'uss/wkr':>8} {'pss total':>9}"]
+    for r in rows:
+        lines.append(f"{r['server']:<8} {r['workers']:>7} {r['healthy_s']:>7.2f}s {r['cpu_s']:>6.2f}s {mb(r['worker_rss']):>8} "
+                     f"{mb(r['worker_pss']):>8} {mb(r['worker_uss']):>8} {mb(r['total_pss']):>9}")
+    return '\n'.join(lines)
+
+
+def _main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+    parser = argparse.ArgumentParser(prog='python -m backend.prefork')
+    parser.add_argument('command', nargs='?', choices=('serve', 'compare'), default='serve')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--log-level', default='info')
+    args = parser.parse_args(argv)
+    if args.command == 'compare':
+        print(format_comparison(compare(args.workers)))
+        return 0
+    logging.basicConfig(level=args.log_level.upper())
+    return serve(args.host, args.port, args.workers, args.log_level)
+
+
+if __name__ == '__main__':
+    sys.exit(_main())
+
+__all__ = ['preload', 'serve', 'process_memory', 'compare', 'format_comparison']
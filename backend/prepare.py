@@ -0,0 +1,188 @@
+"""Upload-time background preparation of parsed genomes.
+
+/upload schedules prepare_upload() in the analysis pool right after saving
+the file, using the idle time before the user clicks Analyze. It parses the
+upload once, compacts the genome (categorical chrom/genotype, int32
+positions; ~2.5x smaller and ~20x faster to load than to re-parse) and
+precomputes the sections that depend on the genome alone (qc,
+genome_window), then pickles them to <upload_dir>/prepared.pkl.
+
+A status sidecar (prepared.json) tells every process, and every uvicorn
+worker, where preparation stands:
+
+    none     never scheduled (disabled, unknown format, older upload)
+    pending  queued or running (treated as failed once older than the pool timeout)
+    ready    artifact written
+    failed   parse error or no pool capacity; analysis parses the raw upload
+
+/analyze, jobs and streaming go through engine.load_genome(), which uses a
+ready artifact and falls back to a fresh parse otherwise. The API awaits a
+pending preparation (up to PREPARE_WAIT_S) first, so a file is never parsed
+twice at once.
+"""
+from __future__ import annotations
+import asyncio, json, logging, os, pickle, threading, time
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
+
+from . import metrics, storage, tracing
+from .annotate_local import genome_window
+from .qc import QC_VERSION, qc_metrics
+from .workers import pool, PoolSaturated
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# bump when the artifact layout changes; stale artifacts are ignored and re-parsed
+PREPARED_VERSION = 1
+STATUS_NONE, STATUS_PENDING, STATUS_READY, STATUS_FAILED = 'none', 'pending', 'ready', 'failed'
+_POLL_S = 0.05
+
+_lock = threading.Lock()
+_lookups = [0, 0]  # this process's artifact (hits, misses), see lookup_stats()
+_tasks: set = set()
+
+
+def _write_atomic(path, data: bytes) -> None:
+    # raises FileNotFoundError if the upload was deleted meanwhile
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _write_status(upload_id: str, status: str, **extra) -> None:
+    doc = {'status': status, 'updated': time.time(), **extra}
+    _write_atomic(storage.prepared_status_path(upload_id), json.dumps(doc).encode())
+
+
+def status(upload_id: str) -> Dict[str, Any]:
+    """{'status': none|pending|ready|failed, ...} from the sidecar."""
+    try:
+        doc = json.loads(storage.prepared_status_path(upload_id).read_text())
+    except (FileNotFoundError, ValueError):
+        return {'status': STATUS_NONE}
+    if doc.get('status') == STATUS_PENDING and time.time() - doc.get('updated', 0) > pool.timeout_s:
+        return {**doc, 'status': STATUS_FAILED, 'error': 'stale'}
+    return doc
+
+
+def compact_genome(df: pd.DataFrame) -> pd.DataFrame:
+    """Categorical chrom/genotype (a few dozen distinct values each) and int32 positions."""
+    import numpy as np
+    out = df[['rsid', 'chrom', 'pos', 'genotype']].astype({'chrom': 'category', 'genotype': 'category'})
+    if len(out) and out['pos'].max() < np.iinfo(np.int32).max:
+        out['pos'] = out['pos'].astype(np.int32)
+    return out.reset_index(drop=True)
+
+
+def prepare_upload(upload_id: str, trace_ctx: Optional[dict] = None) -> Dict[str, Any]:
+    """Parse an upload and persist its prepared artifact; the unit of work run in the analysis pool.
+
+    Returns {'status', 'format', 'n_variants', 'seconds', 'spans'}; parse
+    errors are recorded as a failed status, not raised.
+    """
+    from .engine import parse_upload
+    t0 = time.perf_counter()
+    out: Dict[str, Any] = {'status': STATUS_FAILED, 'format': None, 'n_variants': 0}
+    with tracing.collect(trace_ctx) as spans:
+        with tracing.span('prepare', upload_id=upload_id, pid=os.getpid()) as span:
+            try:
+                df, fmt = parse_upload(upload_id)
+                df = compact_genome(df)
+                storage.scratch_dir(upload_id)
+                sections = {'qc': qc_metrics(df, fmt), 'genome_window': genome_window(df)}
+                doc = {'version': PREPARED_VERSION, 'qc_version': QC_VERSION, 'format': fmt, 'genome': df, 'sections': sections}
+                _write_atomic(storage.prepared_path(upload_id), pickle.dumps(doc, protocol=pickle.HIGHEST_PROTOCOL))
+                out.update(status=STATUS_READY, format=fmt, n_variants=len(df))
+                _write_status(upload_id, STATUS_READY, format=fmt, n_variants=len(df))
+            except FileNotFoundError:  # deleted before or while preparing
+                out['status'] = STATUS_NONE
+            except ValueError as e:
+                out['error'] = str(e)
+                try:
+                    _write_status(upload_id, STATUS_FAILED, error=str(e))
+                except FileNotFoundError:
+                    out['status'] = STATUS_NONE
+            span.set(status=out['status'], format=out['format'], n_variants=out['n_variants'])
+    return {**out, 'seconds': time.perf_counter() - t0, 'spans': spans}
+
+
+def load_prepared(upload_id: str) -> Optional[Tuple[pd.DataFrame, str, Dict[str, Any]]]:
+    """(genome, format, {qc, genome_window}) from a ready, current artifact, else None."""
+    doc = None
+    if status(upload_id).get('status') == STATUS_READY:
+        try:
+            # written by prepare_upload() into our own storage, never by clients
+            with open(storage.prepared_path(upload_id), 'rb') as f:
+                doc = pickle.load(f)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"event=prepared_unreadable upload_id={upload_id} err={type(e).__name__}:{e}")
+    ok = isinstance(doc, dict) and doc.get('version') == PREPARED_VERSION and doc.get('qc_version') == QC_VERSION
+    with _lock:
+        _lookups[0 if ok else 1] += 1
+    return (doc['genome'], doc['format'], doc['sections']) if ok else None
+
+
+def lookup_stats() -> Tuple[int, int]:
+    """(hits, misses) of load_prepared() in this process."""
+    with _lock:
+        return tuple(_lookups)
+
+
+async def _run(upload_id: str, trace_ctx: Optional[dict]) -> None:
+    from .admission import AdmissionRejected, admission, upload_cost
+    try:
+        with admission.admit(await asyncio.to_thread(upload_cost, upload_id, 'parse'), 'prepare'):
+            out = await pool.run(prepare_upload, upload_id, trace_ctx)
+    except (PoolSaturated, AdmissionRejected) as e:
+        # analysis requests own the pool / budget right now; /analyze will parse inline
+        reason = 'analysis_queue_full' if isinstance(e, PoolSaturated) else str(e)
+        await asyncio.to_thread(_write_status_quietly, upload_id, STATUS_FAILED, error=reason)
+        logger.info(f"event=prepare_skipped upload_id={upload_id} reason={reason}")
+        return
+    except Exception as e:
+        await asyncio.to_thread(_write_status_quietly, upload_id, STATUS_FAILED, error=type(e).__name__)
+        logger.warning(f"event=prepare_failed upload_id={upload_id} err={type(e).__name__}:{e}")
+        return
+    tracing.ingest(out.pop('spans', ()))
+    metrics.observe_stage('prepare', out['seconds'], out['format'] or 'unknown')
+    logger.info(f"event=prepare_{out['status']} upload_id={upload_id} n_variants={out['n_variants']} "
+                f"time_ms={out['seconds']*1000:.1f}")
+
+
+def _write_status_quietly(upload_id: str, status_: str, **extra) -> None:
+    try:
+        _write_status(upload_id, status_, **extra)
+    except FileNotFoundError:
+        pass
+
+
+def schedule(upload_id: str) -> str:
+    """Mark the upload pending and start preparing it in the background; returns the new status.
+
+    Must be called from a running event loop. The pool task itself persists
+    the artifact, so it completes even if this loop goes away.
+    """
+    _write_status(upload_id, STATUS_PENDING)
+    task = asyncio.get_running_loop().create_task(_run(upload_id, tracing.context()))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return STATUS_PENDING
+
+
+async def wait(upload_id: str, timeout_s: float) -> str:
+    """Wait up to timeout_s while the upload's preparation is pending; returns its status."""
+    deadline = time.monotonic() + timeout_s
+    while True:
+        current = (await asyncio.to_thread(status, upload_id))['status']
+        if current != STATUS_PENDING or time.monotonic() >= deadline:
+            return current
+        await asyncio.sleep(_POLL_S)
+
+
+__all__ = ['PREPARED_VERSION', 'STATUS_NONE', 'STATUS_PENDING', 'STATUS_READY', 'STATUS_FAILED', 'status', 'compact_genome',
+           'prepare_upload', 'load_prepared', 'lookup_stats', 'schedule', 'wait']
@@ -0,0 +1,129 @@
+"""On-demand sampling profiler for single requests.
+
+An admin (X-Admin-Token == ADMIN_TOKEN) adds `?profile=1` or `X-Profile: 1`
+to /analyze or /model/ss_predict. The work then runs under a sampler thread
+that snapshots the working thread's stack every PROFILE_INTERVAL_S. Reports
+are written to PROFILE_DIR/<request id>.*, outside the upload namespace (so
+deleting or expiring an upload never touches them); beyond
+PROFILE_MAX_REPORTS the oldest are pruned. Each report records its owner (the
+upload id, or `_model` for model-only requests):
+
+- <id>.collapsed  one "root;...;leaf count" line per stack; feed to
+                  flamegraph.pl or speedscope for a flame graph
+- <id>.json       request id, path, duration, sample count and the top
+                  functions by self and total samples
+
+The request log line carries profile=<id> and responses carry X-Profile-Id.
+Sampling works inside pool worker processes too, because it profiles
+whichever thread calls run_profiled().
+"""
+from __future__ import annotations
+import collections
+import json
+import os
+import re
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .config import PROFILE_INTERVAL_S, PROFILE_DIR, PROFILE_MAX_REPORTS
+
+_REQ_ID = re.compile(r'^[0-9a-f-]{32,36}$')
+TOP_N = 30
+
+
+class Sampler:
+    """Background thread collecting collapsed stacks of one target thread."""
+
+    def __init__(self, thread_id: int, interval_s: float = PROFILE_INTERVAL_S):
+        self.thread_id = thread_id
+        self.interval_s = interval_s
+        self.stacks: collections.Counter = collections.Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def __enter__(self) -> 'Sampler':
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self) -> str:
+        return ''.join(f"{stack} {n}\n" for stack, n in self.stacks.most_common())
+
+    def top(self, n: int = TOP_N) -> Dict[str, list]:
+        self_counts, total_counts = collections.Counter(), collections.Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(';')
+            self_counts[frames[-1]] += count
+            for f in set(frames):
+                total_counts[f] += count
+        return {'self': self_counts.most_common(n), 'total': total_counts.most_common(n)}
+
+
+def _prune(d: Path, keep: int) -> None:
+    reports = sorted(d.glob('*.json'), key=lambda p: p.stat().st_mtime)
+    for path in reports[:max(0, len(reports) - keep)]:
+        path.unlink(missing_ok=True)
+        path.with_suffix('.collapsed').unlink(missing_ok=True)
+
+
+def write_report(sampler: Sampler, owner: str, req_id: str, meta: Dict[str, Any]) -> Dict[str, Any]:
+    if not _REQ_ID.match(req_id):
+        raise ValueError(f'invalid request id: {req_id!r}')
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    (PROFILE_DIR / f"{req_id}.collapsed").write_text(sampler.collapsed())
+    report = {**meta, 'request_id': req_id, 'owner': owner, 'interval_s': sampler.interval_s,
+              'samples': sampler.samples, 'top': sampler.top()}
+    (PROFILE_DIR / f"{req_id}.json").write_text(json.dumps(report, indent=1))
+    _prune(PROFILE_DIR, PROFILE_MAX_REPORTS)
+    return report
+
+
+def run_profiled(owner: str, req_id: str, meta: Dict[str, Any], fn: Callable, *args) -> Tuple[Any, Dict[str, Any]]:
+    """Call fn(*args) under the sampler and store the report; returns (fn result, report summary).
+
+    Module-level so it can be shipped to a pool worker as the unit of work.
+    """
+    t0 = time.perf_counter()
+    error = None
+    sampler = Sampler(threading.get_ident())
+    try:
+        with sampler:
+            result = fn(*args)
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        # failed requests are often the interesting ones: always keep the report
+        report = write_report(sampler, owner, req_id, {**meta, 'duration_s': round(time.perf_counter() - t0, 4), 'error': error})
+    return result, {'request_id': req_id, 'samples': report['samples'], 'duration_s': report['duration_s']}
+
+
+def find_report(req_id: str) -> Optional[Path]:
+    """Path of <req_id>.json, or None (req_id is validated, never a path)."""
+    if not _REQ_ID.match(req_id):
+        return None
+    path = PROFILE_DIR / f"{req_id}.json"
+    return path if path.exists() else None
+
+
+__all__ = ['Sampler', 'run_profiled', 'write_report', 'find_report']
@@ -0,0 +1,124 @@
+"""Genotype QC metrics computed in one columnar pass over a parsed genome.
+
+chrom and genotype are factorized once (their codes are used as-is for
+categorical columns) and every genotype metric is derived from a single
+(chromosome x distinct genotype) count matrix: genotype strings are only
+inspected once per distinct value, never per row. rsid checks reuse one
+factorization of the rsid column.
+
+Without pyarrow, pandas string columns are Python objects and each
+factorization is one hash pass over the column (~60 ms per 640k SNPs for
+chrom/genotype, ~130 ms for the unique rsids); everything after that is
+numpy on integer codes.
+
+Keys of the `qc` section:
+
+- format, n_snps
+- call_rate, no_calls, missing_pct (= no_calls / n_snps)
+- call_rate_by_chrom      {chrom: call rate}, in karyotype order
+- heterozygosity          heterozygous / called, autosomes only
+- het_x, het_y, y_call_rate, inferred_sex ('male' | 'female' | 'ambiguous' | 'unknown')
+- duplicate_rsids         rows repeating an earlier rsid
+- non_rs_ids              rows whose ID is not an rs number (e.g. 23andMe 'i' IDs)
+- allele_sanity           share of genotypes made only of A/C/G/T/. (kept for
+                          clients; after normalization it is the non-"--" share)
+"""
+from __future__ import annotations
+from typing import TYPE_CHECKING, Any, Dict, List, Tuple
+
+if TYPE_CHECKING:  # imported on first use: keeps pandas off the API's import path
+    import numpy as np
+    import pandas as pd
+
+# bumped whenever the keys or definitions change; part of engine.analysis_version() so cached results refresh
+QC_VERSION = 2
+ALLELES = frozenset('ACGT')
+AUTOSOMES = frozenset(f'chr{i}' for i in range(1, 23))
+# chrX heterozygosity of a male is ~0 (genotyping errors, pseudo-autosomal SNPs); of a female well above
+X_HET_MALE_MAX = 0.03
+X_HET_FEMALE_MIN = 0.1
+Y_CALL_RATE_MALE_MIN = 0.5
+MIN_SEX_SNPS = 50
+
+
+def _codes(col: pd.Series) -> Tuple[np.ndarray, List[Any]]:
+    """Codes shifted so 0 means missing, and the matching labels (labels[0] is None)."""
+    import numpy as np
+    import pandas as pd
+    if isinstance(col.dtype, pd.CategoricalDtype):
+        codes, labels = col.cat.codes.to_numpy(), list(col.cat.categories)
+    else:
+        codes, labels = pd.factorize(col)
+    return codes.astype(np.int64) + 1, [None] + list(labels)
+
+
+def _chrom_key(chrom: str):
+    c = str(chrom).lower().replace('chr', '')
+    return (0, int(c), '') if c.isdigit() else (1, {'x': 0, 'y': 1, 'm': 2, 'mt': 2}.get(c, 3), c)
+
+
+def _rate(num: float, den: float):
+    return round(num / den, 4) if den else None
+
+
+def _sex(het_x, x_called: int, y_call_rate) -> str:
+    if x_called < MIN_SEX_SNPS:
+        return 'unknown'
+    if het_x <= X_HET_MALE_MAX and (y_call_rate is None or y_call_rate >= Y_CALL_RATE_MALE_MIN):
+        return 'male'
+    if het_x >= X_HET_FEMALE_MIN and (y_call_rate is None or y_call_rate < Y_CALL_RATE_MALE_MIN):
+        return 'female'
+    return 'ambiguous'
+
+
+def qc_metrics(df: pd.DataFrame, fmt: str) -> Dict[str, Any]:
+    import numpy as np
+    import pandas as pd
+    n = len(df)
+    c_codes, chroms = _codes(df['chrom'])
+    g_codes, genotypes = _codes(df['genotype'])
+    ng = len(genotypes)
+    counts = np.bincount(c_codes * ng + g_codes, minlength=len(chroms) * ng).reshape(len(chroms), ng)
+
+    # per distinct genotype; missing (None) is a no-call but passes the legacy sanity check
+    called = np.array([isinstance(g, str) and len(g) == 2 and g[0] in ALLELES and g[1] in ALLELES for g in genotypes])
+    het = np.array([bool(c) and g[0] != g[1] for g, c in zip(genotypes, called)])
+    sane = np.array([g is None or all(a in 'ACGT.' for a in str(g)) for g in genotypes])
+    total_by = counts.sum(axis=1)
+    called_by = counts @ called
+    het_by = counts @ het
+
+    names = [str(c).lower() if c is not None else None for c in chroms]
+    auto = np.array([c in AUTOSOMES for c in names])
+    on = {c: np.array([name == c for name in names]) for c in ('chrx', 'chry')}
+    x_called, y_called = int(called_by[on['chrx']].sum()), int(called_by[on['chry']].sum())
+    het_x = _rate(het_by[on['chrx']].sum(), x_called)
+    y_call_rate = _rate(y_called, total_by[on['chry']].sum())
+
+    # duplicates and ID kinds from the distinct rsids; a missing ID is never a duplicate but is non-rs
+    r_codes, rsids = pd.factorize(df['rsid'])
+    missing_ids = int((r_codes < 0).sum())
+    non_rs = np.asarray(rsids, dtype=object).astype('U2') != 'rs'
+    non_rs_rows = missing_ids + (int(np.bincount(r_codes[r_codes >= 0], minlength=len(rsids))[non_rs].sum()) if non_rs.any() else 0)
+
+    no_calls = int(n - called_by.sum())
+    return {
+        'format': fmt,
+        'n_snps': n,
+        'missing_pct': round(no_calls / max(1, n), 4),
+        'allele_sanity': round(float(counts.sum(axis=0) @ sane) / max(1, n), 4),
+        'call_rate': round(1 - no_calls / n, 4) if n else 0.0,
+        'no_calls': no_calls,
+        'call_rate_by_chrom': {str(chroms[i]): _rate(called_by[i], total_by[i])
+                               for i in sorted(range(1, len(chroms)), key=lambda i: _chrom_key(chroms[i])) if total_by[i]},
+        'heterozygosity': _rate(het_by[auto].sum(), called_by[auto].sum()),
+        'het_x': het_x,
+        'het_y': _rate(het_by[on['chry']].sum(), y_called),
+        'y_call_rate': y_call_rate,
+        'inferred_sex': _sex(het_x, x_called, y_call_rate),
+        'duplicate_rsids': n - len(rsids) - missing_ids,
+        'non_rs_ids': non_rs_rows,
+    }
+
+
+__all__ = ['QC_VERSION', 'qc_metrics', 'X_HET_MALE_MAX', 'X_HET_FEMALE_MIN', 'Y_CALL_RATE_MALE_MIN', 'MIN_SEX_SNPS']
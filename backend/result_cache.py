@@ -0,0 +1,187 @@
+"""Cache of serialized /analyze results, in memory and on disk.
+
+Entries are gzip-compressed Result JSON bytes keyed by
+
+    (upload content sha256, run_traits/run_protein/run_pgs/target_rsid,
+     catalog snapshot id, SS model version, response encoding)
+
+so re-analysing the same file with the same options is a dictionary lookup,
+and editing a catalog or retraining the model naturally misses. Hits are
+served as raw bytes (Content-Encoding: gzip when the client accepts it);
+no pydantic objects are built.
+
+- Memory: LRU bounded by RESULT_CACHE_MEM_MB of compressed bytes.
+- Disk: <RESULT_CACHE_DIR>/<digest[:2]>/<digest>/<options>.json.gz, bounded by
+  RESULT_CACHE_DISK_MB; oldest-used files are evicted first. 0 disables a tier.
+- Deleting an upload drops every entry for its digest from both tiers.
+"""
+from __future__ import annotations
+import collections
+import gzip
+import hashlib
+import logging
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from .config import RESULT_CACHE_DIR, RESULT_CACHE_MEM_MB, RESULT_CACHE_DISK_MB
+
+logger = logging.getLogger(__name__)
+
+_SUFFIX = '.json.gz'
+
+
+def options_key(run_traits: bool, run_protein: bool, run_pgs: bool, target_rsid: Optional[str], version: str,
+                encoding: str = 'json') -> str:
+    """Stable file-name-safe id for everything but the upload digest."""
+    raw = f"traits={int(run_traits)}|protein={int(run_protein)}|pgs={int(run_pgs)}|target={target_rsid or ''}|{version}"
+    if encoding != 'json':
+        raw += f"|enc={encoding}"
+    return hashlib.sha256(raw.encode()).hexdigest()[:24]
+
+
+class ResultCache:
+    """Two-tier (memory LRU + disk) cache of compressed result bytes. Thread-safe."""
+
+    def __init__(self, directory: str | Path | None, mem_max_bytes: int, disk_max_bytes: int, level: int = 6):
+        self.dir = Path(directory) if directory and disk_max_bytes > 0 else None
+        self.mem_max_bytes = mem_max_bytes
+        self.disk_max_bytes = disk_max_bytes
+        self.level = level
+        self._mem: 'collections.OrderedDict[Tuple[str, str], bytes]' = collections.OrderedDict()
+        self._mem_bytes = 0
+        self._disk_bytes: Optional[int] = None  # lazily scanned
+        self._lock = threading.Lock()
+        self._counters = collections.Counter()
+
+    # -- helpers --------------------------------------------------------------
+    def _path(self, digest: str, opts: str) -> Path:
+        return self.dir / digest[:2] / digest / (opts + _SUFFIX)
+
+    def _files(self):
+        return self.dir.glob(f'*/*/*{_SUFFIX}') if self.dir is not None and self.dir.exists() else iter(())
+
+    def _mem_put(self, key: Tuple[str, str], blob: bytes) -> None:
+        if len(blob) > self.mem_max_bytes:
+            return
+        old = self._mem.pop(key, None)
+        if old is not None:
+            self._mem_bytes -= len(old)
+        self._mem[key] = blob
+        self._mem_bytes += len(blob)
+        while self._mem_bytes > self.mem_max_bytes:
+            _, evicted = self._mem.popitem(last=False)
+            self._mem_bytes -= len(evicted)
+            self._counters['mem_evictions'] += 1
+
+    def _disk_usage(self) -> int:
+        if self._disk_bytes is None:
+            self._disk_bytes = sum(p.stat().st_size for p in self._files())
+        return self._disk_bytes
+
+    def _disk_evict(self) -> None:
+        if self._disk_usage() <= self.disk_max_bytes:
+            return
+        # st_mtime is bumped on every disk hit, so this is least-recently-used first
+        entries = sorted(((p.stat().st_mtime, p.stat().st_size, p) for p in self._files()), key=lambda e: e[0])
+        for _, size, p in entries:
+            if self._disk_bytes <= self.disk_max_bytes:
+                break
+            try:
+                p.unlink()
+            except FileNotFoundError:
+                pass
+            self._disk_bytes -= size
+            self._counters['disk_evictions'] += 1
+
+    # -- public API -------------------------------------------------------------
+    def get(self, digest: str, opts: str) -> Optional[bytes]:
+        """Compressed result bytes, or None on a miss."""
+        key = (digest, opts)
+        with self._lock:
+            blob = self._mem.get(key)
+            if blob is not None:
+                self._mem.move_to_end(key)
+                self._counters['mem_hits'] += 1
+                return blob
+            if self.dir is not None:
+                path = self._path(digest, opts)
+                try:
+                    blob = path.read_bytes()
+                    os.utime(path)
+                except FileNotFoundError:
+                    blob = None
+                if blob is not None:
+                    self._counters['disk_hits'] += 1
+                    self._mem_put(key, blob)
+                    return blob
+            self._counters['misses'] += 1
+            return None
+
+    def put(self, digest: str, opts: str, body: bytes) -> bytes:
+        """Compress and store a serialized result; returns the compressed bytes."""
+        blob = gzip.compress(body, compresslevel=self.level, mtime=0)
+        key = (digest, opts)
+        with self._lock:
+            self._counters['puts'] += 1
+            self._mem_put(key, blob)
+            if self.dir is not None and len(blob) <= self.disk_max_bytes:
+                path = self._path(digest, opts)
+                try:
+                    usage = self._disk_usage()
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    old = path.stat().st_size if path.exists() else 0
+                    tmp = path.with_suffix(f'.tmp{os.getpid()}')
+                    tmp.write_bytes(blob)
+                    os.replace(tmp, path)
+                    self._disk_bytes = usage + len(blob) - old
+                    self._disk_evict()
+                except OSError as e:  # a full or read-only disk only costs us the disk tier
+                    logger.warning(f"event=result_cache_write_failed err={e}")
+        return blob
+
+    def invalidate(self, digest: str) -> int:
+        """Drop all entries for one upload digest; returns how many were removed."""
+        removed = 0
+        with self._lock:
+            for key in [k for k in self._mem if k[0] == digest]:
+                self._mem_bytes -= len(self._mem.pop(key))
+                removed += 1
+            if self.dir is not None:
+                d = self.dir / digest[:2] / digest
+                if d.exists():
+                    removed += sum(1 for _ in d.glob(f'*{_SUFFIX}'))
+                    shutil.rmtree(d, ignore_errors=True)
+                    self._disk_bytes = None
+        return removed
+
+    def clear(self) -> None:
+        with self._lock:
+            self._mem.clear()
+            self._mem_bytes = 0
+            if self.dir is not None and self.dir.exists():
+                shutil.rmtree(self.dir, ignore_errors=True)
+            self._disk_bytes = None
+            self._counters.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            c = self._counters
+            hits = c['mem_hits'] + c['disk_hits']
+            lookups = hits + c['misses']
+            return {
+                'mem_entries': len(self._mem),
+                'mem_bytes': self._mem_bytes,
+                'mem_max_bytes': self.mem_max_bytes,
+                'disk_bytes': self._disk_usage() if self.dir is not None else 0,
+                'disk_max_bytes': self.disk_max_bytes if self.dir is not None else 0,
+                **{k: c[k] for k in ('mem_hits', 'disk_hits', 'misses', 'puts', 'mem_evictions', 'disk_evictions')},
+                'hit_ratio': round(hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+cache = ResultCache(RESULT_CACHE_DIR, RESULT_CACHE_MEM_MB * 1024 * 1024, RESULT_CACHE_DISK_MB * 1024 * 1024)
+
+__all__ = ['ResultCache', 'options_key', 'cache']
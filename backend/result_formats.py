@@ -0,0 +1,156 @@
+"""Alternative /analyze encodings for variant-heavy results, chosen by Accept.
+
+- application/json (default): the Result JSON contract, one object per variant.
+- application/vnd.greatjeans.columnar+json: same document, but `variants` is
+  {"n", "columns": {field: [...]}, "links": {name: template}}. Key names are
+  sent once and per-row link URLs become templates over the row's fields
+  (e.g. "https://www.ncbi.nlm.nih.gov/snp/{rsid}").
+- application/msgpack (or application/x-msgpack): the columnar document as
+  MessagePack; needs the optional `msgpack` package.
+
+negotiate() honours q-values and the order of the Accept header: the
+acceptable encoding with the highest q wins, ties go to the one listed
+first, then to json. An encoding that is not installed is skipped; 406 only
+when nothing acceptable remains.
+
+expand_columnar() turns a columnar document back into the row-wise contract.
+
+    python -m backend.result_formats bench [--n 640000]
+"""
+from __future__ import annotations
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from .serialize import dumps, json_default
+
+try:
+    import msgpack  # type: ignore
+except Exception:  # pragma: no cover - optional dep
+    msgpack = None
+
+MEDIA_TYPES = {
+    'json': 'application/json',
+    'columnar': 'application/vnd.greatjeans.columnar+json',
+    'msgpack': 'application/msgpack',
+}
+_ACCEPT = {
+    'application/json': 'json',
+    'application/vnd.greatjeans.columnar+json': 'columnar',
+    'application/msgpack': 'msgpack',
+    'application/x-msgpack': 'msgpack',
+}
+# wildcard ranges and how specific they are (an exact type is 2)
+_WILDCARDS = {'*/*': 0, 'application/*': 1}
+_PREFERENCE = ('json', 'columnar', 'msgpack')  # among equally acceptable encodings
+
+
+class EncodingUnavailable(RuntimeError):
+    """No acceptable encoding is available (e.g. only msgpack, which is not installed)."""
+
+
+def _media_ranges(accept: str) -> Iterator[Tuple[str, float]]:
+    """(media range, q) per Accept item, in header order; items with a malformed q are skipped."""
+    for part in accept.split(','):
+        media, *params = part.split(';')
+        media = media.strip().lower()
+        q: Optional[float] = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = None
+        if media and q is not None:
+            yield media, q
+
+
+def negotiate(accept: Optional[str]) -> str:
+    """Encoding name for an Accept header; 'json' when it names none of ours (or no wildcard)."""
+    ranked: Dict[str, Tuple[int, float, int]] = {}  # encoding -> (specificity, q, position) of its most specific range
+    for pos, (media, q) in enumerate(_media_ranges(accept or '')):
+        if media in _ACCEPT:
+            targets, spec = (_ACCEPT[media],), 2
+        elif media in _WILDCARDS:
+            targets, spec = _PREFERENCE, _WILDCARDS[media]
+        else:
+            continue
+        for enc in targets:
+            old = ranked.get(enc)
+            if old is None or spec > old[0] or (spec == old[0] and q > old[1]):
+                ranked[enc] = (spec, q, pos)
+    if not ranked:
+        return 'json'
+    acceptable = [enc for enc in _PREFERENCE if enc in ranked and ranked[enc][1] > 0]
+    usable = [enc for enc in acceptable if enc != 'msgpack' or msgpack is not None]
+    if not usable:
+        raise EncodingUnavailable('msgpack_not_installed' if acceptable else 'no_acceptable_encoding')
+    return min(usable, key=lambda enc: (-ranked[enc][1], ranked[enc][2], _PREFERENCE.index(enc)))
+
+
+def encode(doc: Dict[str, Any], encoding: str) -> bytes:
+    """Serialize a contract dict whose variants are already in the encoding's layout."""
+    if encoding == 'msgpack':
+        if msgpack is None:
+            raise EncodingUnavailable('msgpack_not_installed')
+        return msgpack.packb(doc, use_bin_type=True, default=json_default)
+    return dumps(doc)
+
+
+def decode(body: bytes, encoding: str) -> Dict[str, Any]:
+    if encoding == 'msgpack':
+        return msgpack.unpackb(body, raw=False)
+    import json
+    return json.loads(body)
+
+
+def expand_columnar(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Row-wise Result JSON from a columnar document."""
+    block = doc['variants']
+    cols, templates = block['columns'], block['links']
+    names = list(cols)
+    variants = []
+    for values in zip(*(cols[k] for k in names)):
+        row = dict(zip(names, values))
+        row['links'] = {k: t.format(**row) for k, t in templates.items()}
+        variants.append(row)
+    return {**doc, 'variants': variants}
+
+
+def _bench(n: int) -> None:
+    import gzip
+    import time
+    from .engine import catalogs, qc_metrics, AI_SUMMARY_PLACEHOLDER, DISCLAIMER
+    from .annotate_local import annotate_variants, columnar_variants, genome_window
+    from .analysis.bench import catalog_rsids, synth_23andme
+    from .parser_23andme import parse_23andme
+    from .serialize import contract_dict
+
+    df = parse_23andme(synth_23andme(n, known=catalog_rsids()))
+    head = contract_dict({'qc': qc_metrics(df, '23andme'), 'genome_window': genome_window(df), 'variants': [],
+                          'ai_summary': dict(AI_SUMMARY_PLACEHOLDER), 'disclaimer': DISCLAIMER})
+    builders = {'json': lambda: annotate_variants(df, catalogs), 'columnar': lambda: columnar_variants(df, catalogs),
+                'msgpack': lambda: columnar_variants(df, catalogs)}
+    print(f"variants={n}")
+    print(f"{'encoding':>9} {'build_s':>8} {'encode_s':>9} {'decode_s':>9} {'MB':>7} {'gzip_MB':>8}")
+    for enc, build in builders.items():
+        if enc == 'msgpack' and msgpack is None:
+            print(f"{enc:>9}  (msgpack not installed)")
+            continue
+        t0 = time.perf_counter()
+        doc = {**head, 'variants': build()}
+        t1 = time.perf_counter()
+        body = encode(doc, enc)
+        t2 = time.perf_counter()
+        decode(body, enc)
+        t3 = time.perf_counter()
+        print(f"{enc:>9} {t1 - t0:>8.2f} {t2 - t1:>9.2f} {t3 - t2:>9.2f} {len(body) / 1e6:>7.1f} {len(gzip.compress(body, 6)) / 1e6:>8.1f}")
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(prog='python -m backend.result_formats')
+    parser.add_argument('command', choices=['bench'])
+    parser.add_argument('--n', type=int, default=640_000)
+    _bench(parser.parse_args().n)
+
+__all__ = ['MEDIA_TYPES', 'EncodingUnavailable', 'negotiate', 'encode', 'decode', 'expand_columnar']
@@ -0,0 +1,223 @@
+"""In-memory S3-compatible server for tests and local development (fully offline).
+
+Implements the subset of the S3 REST API that blobstore.S3BlobStore uses,
+with path-style addressing (/<bucket>/<key>):
+
+    PUT object, GET object (Range -> 206), HEAD, DELETE,
+    multipart: POST ?uploads, PUT ?partNumber&uploadId, POST ?uploadId (complete), DELETE ?uploadId (abort),
+    GET bucket ?list-type=2 (prefix, max-keys, continuation-token)
+
+Every request must carry a valid SigV4 signature for the configured key
+pair (403 SignatureDoesNotMatch otherwise), and parts other than the last
+must be at least min_part_size bytes (400 EntityTooSmall on complete), as on
+AWS. Buckets are created on first use. Objects live in memory only.
+
+    python -m backend.s3_standin [--port 9000] [--access-key test] [--secret-key test]
+
+    STORAGE_BACKEND=s3 S3_ENDPOINT=http://127.0.0.1:9000 S3_BUCKET=greatjeans \\
+    S3_ACCESS_KEY=test S3_SECRET_KEY=test uvicorn backend.api:app
+"""
+from __future__ import annotations
+import hashlib, re, threading, time, uuid
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, unquote, urlsplit
+from xml.sax.saxutils import escape
+
+from .blobstore import canonical_query, sigv4
+
+MIN_PART_SIZE = 5 * 1024 * 1024
+_AUTH = re.compile(r'AWS4-HMAC-SHA256 Credential=([^/]+)/(\d{8})/([^/]+)/s3/aws4_request, '
+                   r'SignedHeaders=([^,]+), Signature=([0-9a-f]{64})')
+
+
+class S3StandIn:
+    """Threaded stand-in server; use as a context manager or call start()/stop()."""
+
+    def __init__(self, access_key: str = 'test', secret_key: str = 'test', host: str = '127.0.0.1', port: int = 0,
+                 min_part_size: int = MIN_PART_SIZE):
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.min_part_size = min_part_size
+        self.buckets: Dict[str, Dict[str, Tuple[bytes, float]]] = {}
+        self.uploads: Dict[str, Tuple[str, str, Dict[int, bytes]]] = {}  # upload id -> (bucket, key, parts)
+        self.requests: List[Tuple[str, str]] = []  # (method, path?query) of every request, for tests
+        self.lock = threading.Lock()
+        standin = self
+
+        class Handler(_Handler):
+            server_state = standin
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def endpoint(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self) -> 'S3StandIn':
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='s3-standin', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> 'S3StandIn':
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_state: S3StandIn
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args) -> None:  # quiet; requests are recorded on the server
+        pass
+
+    # --- plumbing ---
+    def _send(self, status: int, body: bytes = b'', headers: Optional[Dict[str, str]] = None) -> None:
+        # replies are built under the store lock and written after it is released
+        self._reply = (status, body, headers)
+
+    def _flush(self) -> None:
+        status, body, headers = self._reply
+        self.send_response(status)
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        if 'Content-Length' not in (headers or {}):
+            self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def _error(self, status: int, code: str, message: str = '') -> None:
+        body = f'<?xml version="1.0" encoding="UTF-8"?><Error><Code>{code}</Code><Message>{escape(message)}</Message></Error>'
+        self._send(status, body.encode(), {'Content-Type': 'application/xml'})
+
+    def _xml(self, body: str) -> None:
+        self._send(200, f'<?xml version="1.0" encoding="UTF-8"?>{body}'.encode(), {'Content-Type': 'application/xml'})
+
+    def _authorized(self, raw_path: str, raw_query: str, body: bytes) -> bool:
+        s = self.server_state
+        m = _AUTH.fullmatch(self.headers.get('Authorization', ''))
+        if not m or m.group(1) != s.access_key:
+            return False
+        _, date, region, names, signature = m.groups()
+        payload_hash = self.headers.get('x-amz-content-sha256', '')
+        if payload_hash != hashlib.sha256(body).hexdigest():
+            return False
+        signed = {h: self.headers.get(h, '') for h in names.split(';')}
+        query = canonical_query(dict(parse_qsl(raw_query, keep_blank_values=True)))
+        expected = sigv4(self.command, raw_path, query, signed, payload_hash, s.access_key, s.secret_key, region,
+                         self.headers.get('x-amz-date', ''))
+        return expected.endswith(f'Signature={signature}') and self.headers.get('x-amz-date', '').startswith(date)
+
+    def _handle(self) -> None:
+        self._dispatch()
+        self._flush()
+
+    def _dispatch(self) -> None:
+        s = self.server_state
+        url = urlsplit(self.path)
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        with s.lock:
+            s.requests.append((self.command, self.path))
+        if not self._authorized(url.path, url.query, body):
+            return self._error(403, 'SignatureDoesNotMatch', 'The request signature we calculated does not match')
+        bucket, _, key = unquote(url.path).lstrip('/').partition('/')
+        params = dict(parse_qsl(url.query, keep_blank_values=True))
+        with s.lock:
+            objects = s.buckets.setdefault(bucket, {})
+            if not key:
+                return self._list(objects, params) if self.command == 'GET' else self._error(405, 'MethodNotAllowed')
+            if 'uploadId' in params or 'uploads' in params:
+                return self._multipart(bucket, key, params, body)
+            if self.command == 'PUT':
+                objects[key] = (body, time.time())
+                return self._send(200, headers={'ETag': f'"{hashlib.md5(body).hexdigest()}"'})
+            if key not in objects:
+                return self._error(404, 'NoSuchKey', key)
+            data, mtime = objects[key]
+            if self.command == 'DELETE':
+                del objects[key]
+                return self._send(204)
+            headers = {'Last-Modified': formatdate(mtime, usegmt=True), 'ETag': f'"{hashlib.md5(data).hexdigest()}"',
+                       'Accept-Ranges': 'bytes'}
+            if self.command == 'HEAD':
+                return self._send(200, headers={**headers, 'Content-Length': str(len(data))})
+            rng = re.fullmatch(r'bytes=(\d+)-(\d*)', self.headers.get('Range', ''))
+            if not rng:
+                return self._send(200, data, headers)
+            start = int(rng.group(1))
+            end = min(int(rng.group(2)) if rng.group(2) else len(data) - 1, len(data) - 1)
+            if start >= len(data):
+                return self._error(416, 'InvalidRange', self.headers['Range'])
+            return self._send(206, data[start:end + 1], {**headers, 'Content-Range': f'bytes {start}-{end}/{len(data)}'})
+
+    def _list(self, objects, params) -> None:
+        prefix, limit = params.get('prefix', ''), int(params.get('max-keys', 1000))
+        keys = sorted(k for k in objects if k.startswith(prefix) and k > params.get('continuation-token', ''))
+        page, truncated = keys[:limit], len(keys) > limit
+        contents = ''.join(f'<Contents><Key>{escape(k)}</Key><Size>{len(objects[k][0])}</Size></Contents>' for k in page)
+        token = f'<NextContinuationToken>{escape(page[-1])}</NextContinuationToken>' if truncated else ''
+        self._xml(f'<ListBucketResult><Prefix>{escape(prefix)}</Prefix><KeyCount>{len(page)}</KeyCount>'
+                  f'<IsTruncated>{"true" if truncated else "false"}</IsTruncated>{token}{contents}</ListBucketResult>')
+
+    def _multipart(self, bucket: str, key: str, params: Dict[str, str], body: bytes) -> None:
+        s = self.server_state
+        if self.command == 'POST' and 'uploads' in params:
+            upload_id = uuid.uuid4().hex
+            s.uploads[upload_id] = (bucket, key, {})
+            return self._xml(f'<InitiateMultipartUploadResult><Bucket>{escape(bucket)}</Bucket><Key>{escape(key)}</Key>'
+                             f'<UploadId>{upload_id}</UploadId></InitiateMultipartUploadResult>')
+        upload = s.uploads.get(params['uploadId'])
+        if upload is None or upload[:2] != (bucket, key):
+            return self._error(404, 'NoSuchUpload', params['uploadId'])
+        parts = upload[2]
+        if self.command == 'PUT':
+            parts[int(params['partNumber'])] = body
+            return self._send(200, headers={'ETag': f'"{hashlib.md5(body).hexdigest()}"'})
+        if self.command == 'DELETE':
+            del s.uploads[params['uploadId']]
+            return self._send(204)
+        numbers = [int(n) for n in re.findall(r'<PartNumber>(\d+)</PartNumber>', body.decode())]
+        if not numbers or numbers != sorted(numbers) or any(n not in parts for n in numbers):
+            return self._error(400, 'InvalidPart')
+        if any(len(parts[n]) < s.min_part_size for n in numbers[:-1]):
+            return self._error(400, 'EntityTooSmall', f'parts must be at least {s.min_part_size} bytes')
+        del s.uploads[params['uploadId']]
+        s.buckets[bucket][key] = (b''.join(parts[n] for n in numbers), time.time())
+        self._xml(f'<CompleteMultipartUploadResult><Bucket>{escape(bucket)}</Bucket><Key>{escape(key)}</Key>'
+                  f'</CompleteMultipartUploadResult>')
+
+    do_GET = do_PUT = do_POST = do_DELETE = do_HEAD = _handle
+
+
+def _main() -> None:
+    import argparse
+    parser = argparse.ArgumentParser(prog='python -m backend.s3_standin')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9000)
+    parser.add_argument('--access-key', default='test')
+    parser.add_argument('--secret-key', default='test')
+    parser.add_argument('--min-part-mb', type=float, default=MIN_PART_SIZE / 1024 / 1024)
+    args = parser.parse_args()
+    server = S3StandIn(args.access_key, args.secret_key, args.host, args.port, int(args.min_part_mb * 1024 * 1024))
+    print(f'S3 stand-in listening on {server.endpoint} (access key {args.access_key!r})')
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    _main()
+
+__all__ = ['S3StandIn', 'MIN_PART_SIZE']
@@ -0,0 +1,111 @@
+"""Fast Result JSON serialization for variant-heavy responses.
+
+The pydantic path builds a ResultJSON (engine.make_result_json), and FastAPI
+then validates and serializes it again through response_model: several
+passes over every Variant. Here the contract is
+enforced once on plain dicts instead. The small sections are validated with
+pydantic; `variants` (built by annotate_variants) is only checked
+structurally, and the dict is encoded straight to bytes with orjson (stdlib
+json if orjson is not installed).
+
+    python -m backend.serialize bench [--sizes 10000 100000 640000]
+"""
+from __future__ import annotations
+import json
+from typing import Any, Dict
+
+from .models import ResultJSON, Variant
+
+try:
+    import orjson  # type: ignore
+except Exception:  # pragma: no cover - optional dep
+    orjson = None
+
+# Defaults for required sections a result dict lacks
+CONTRACT_DEFAULTS = {
+    'qc': {'format': 'unknown', 'n_snps': 0, 'missing_pct': 0.0},
+    'genome_window': {'chrom': 'chr17', 'start': 7676125, 'end': 7676175, 'rsid': 'rs1042522'},
+    'ai_summary': {'paragraph': '<placeholder>', 'caveats': ['coverage', 'population limits', 'not medical advice']},
+}
+
+
+def json_default(obj):
+    if hasattr(obj, 'item'):  # numpy scalar
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj: Any) -> bytes:
+    """Compact JSON bytes; numpy scalars are converted."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=json_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False, default=json_default).encode()
+
+
+def contract_dict(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Result sections as a contract-conforming dict in ResultJSON field order.
+
+    Every section except `variants` goes through pydantic; variants must be a
+    list of dicts, and only its first and last rows are validated.
+    """
+    d = {k: v for k, v in result.items() if v is not None or k not in CONTRACT_DEFAULTS}
+    for key, default in CONTRACT_DEFAULTS.items():
+        d.setdefault(key, default)
+    variants = d.get('variants')
+    if not isinstance(variants, list):
+        variants = []
+    if variants:
+        if not isinstance(variants[0], dict):
+            raise TypeError('variants must be a list of dicts')
+        Variant.model_validate(variants[0])
+        Variant.model_validate(variants[-1])
+    head = ResultJSON.model_validate({**d, 'variants': []}).model_dump()
+    head['variants'] = variants
+    return head
+
+
+def result_bytes(result: Dict[str, Any]) -> bytes:
+    """Serialized Result JSON for a dict of result sections."""
+    return dumps(contract_dict(result))
+
+
+def _bench(sizes) -> None:
+    import time
+    from .engine import catalogs, make_result_json, qc_metrics, DISCLAIMER, AI_SUMMARY_PLACEHOLDER
+    from .annotate_local import annotate_variants, genome_window
+    from .analysis.bench import catalog_rsids, synth_23andme
+    from .parser_23andme import parse_23andme
+
+    def legacy(df):
+        res = make_result_json(df, '23andme', False, False, False)
+        # what FastAPI's response_model does with the returned model
+        validated = ResultJSON.model_validate(res.model_dump())
+        return json.dumps(validated.model_dump(mode='json')).encode()
+
+    def fast(df):
+        return result_bytes({
+            'qc': qc_metrics(df, '23andme'), 'genome_window': genome_window(df),
+            'variants': annotate_variants(df, catalogs), 'ai_summary': dict(AI_SUMMARY_PLACEHOLDER), 'disclaimer': DISCLAIMER,
+        })
+
+    known = catalog_rsids()
+    print(f"encoder={'orjson' if orjson else 'json'}")
+    print(f"{'variants':>9} {'legacy_s':>9} {'fast_s':>9} {'speedup':>8} {'MB':>7}")
+    for n in sizes:
+        df = parse_23andme(synth_23andme(n, known=known))
+        t0 = time.perf_counter()
+        legacy(df)
+        t1 = time.perf_counter()
+        new = fast(df)
+        t2 = time.perf_counter()
+        print(f"{n:>9} {t1 - t0:>9.2f} {t2 - t1:>9.2f} {(t1 - t0) / (t2 - t1):>7.1f}x {len(new) / 1e6:>7.1f}")
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(prog='python -m backend.serialize')
+    parser.add_argument('command', choices=['bench'])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 640_000])
+    _bench(parser.parse_args().sizes)
+
+__all__ = ['dumps', 'json_default', 'contract_dict', 'result_bytes', 'CONTRACT_DEFAULTS']
@@ -1,55 +1,236 @@
 """Ephemeral storage helpers for uploaded files.
 
-Files are written beneath ./storage/tmp/<upload_id>/
-No persistence guarantees; DELETE removes directories.
+Files are written beneath ./storage/tmp/<upload_id[:2]>/<upload_id>/: the
+two-character shard keeps every directory small (256 shards of random hex
+ids), so mkdir/exists stay fast with millions of uploads. Older flat
+<root>/<upload_id>/ directories are moved into shards by
+migrate_flat_layout() (run by the janitor at startup).
+
+No persistence guarantees: DELETE removes directories, and the janitor
+(backend/janitor.py) expires them by TTL and disk quota. Every access bumps
+the upload directory's mtime (touch_upload), which is its last-used time.
+
+The upload itself (`input`, `input.sha256`) is an object in `blobs`, a
+blobstore.BlobStore under the key <upload_id[:2]>/<upload_id>/<name>: local
+files in the same directory by default, or an S3-compatible bucket with
+STORAGE_BACKEND=s3. Uploads are written and read as streams
+(save_upload / open_upload), so neither side holds a whole file in memory.
+The local upload directory always stays this node's scratch area for
+derived files (prepared.pkl, profiles).
 """
 from __future__ import annotations
-import os, shutil, uuid
+import hashlib, io, os, re, shutil, uuid
 from pathlib import Path
-from typing import Optional
+from typing import BinaryIO, Iterator, Optional, Tuple
+from . import blobstore
 from .config import STORAGE_ROOT, MAX_UPLOAD_MB
 
 BASE_DIR = STORAGE_ROOT
 BASE_DIR.mkdir(parents=True, exist_ok=True)
+blobs: blobstore.BlobStore = blobstore.from_config(BASE_DIR)
 ALLOWED_EXT = {'.txt', '.vcf', '.gz'}  # .vcf.gz supported
+# upload ids are uuid4 hex (new_upload_id); anything else is unknown, and never a path
+_UPLOAD_ID = re.compile(r'^[0-9a-f]{32}$')
 
 
 def new_upload_id() -> str:
     return uuid.uuid4().hex
 
 
+def is_upload_id(upload_id: str) -> bool:
+    return bool(_UPLOAD_ID.match(upload_id))
+
+
 def upload_dir(upload_id: str) -> Path:
-    return BASE_DIR / upload_id
+    if not _UPLOAD_ID.match(upload_id):
+        raise FileNotFoundError('upload_not_found')
+    return BASE_DIR / upload_id[:2] / upload_id
+
+
+def touch_upload(upload_id: str) -> None:
+    """Mark an upload as just used (its directory mtime drives janitor expiry)."""
+    try:
+        os.utime(upload_dir(upload_id))
+    except FileNotFoundError:
+        pass
+
+
+def iter_upload_dirs() -> Iterator[Tuple[str, Path]]:
+    """(upload_id, directory) for every stored upload, shard by shard."""
+    for shard in os.scandir(BASE_DIR):
+        if not shard.is_dir(follow_symlinks=False) or len(shard.name) != 2:
+            continue
+        for entry in os.scandir(shard.path):
+            if entry.is_dir(follow_symlinks=False) and _UPLOAD_ID.match(entry.name):
+                yield entry.name, Path(entry.path)
+
+
+def migrate_flat_layout() -> int:
+    """Move <root>/<upload_id>/ directories of the unsharded layout into shards and mark them used now; returns how many moved."""
+    moved = 0
+    for entry in os.scandir(BASE_DIR):
+        if len(entry.name) > 2 and entry.is_dir(follow_symlinks=False) and _UPLOAD_ID.match(entry.name):
+            target = upload_dir(entry.name)
+            target.parent.mkdir(exist_ok=True)
+            try:
+                os.rename(entry.path, target)
+            except OSError:  # already migrated (target exists) or vanished meanwhile
+                continue
+            # the old layout never bumped mtimes on use: restart the TTL clock rather than
+            # let the first sweep after the move expire every live legacy upload
+            os.utime(target)
+            moved += 1
+    return moved
+
+
+def scratch_dir(upload_id: str) -> Path:
+    """This node's directory for derived files of an upload (created on demand for remote backends)."""
+    d = upload_dir(upload_id)
+    if not blobs.local:
+        d.mkdir(parents=True, exist_ok=True)
+    return d
 
 
 def input_path(upload_id: str) -> Path:
+    """Path of the upload file with the local backend."""
     return upload_dir(upload_id) / 'input'
 
 
-def save_upload(file_bytes: bytes, filename: str) -> str:
+def prepared_path(upload_id: str) -> Path:
+    return upload_dir(upload_id) / 'prepared.pkl'
+
+
+def prepared_status_path(upload_id: str) -> Path:
+    return upload_dir(upload_id) / 'prepared.json'
+
+
+def _key(upload_id: str, name: str = '') -> str:
+    upload_dir(upload_id)  # validates the id
+    return f'{upload_id[:2]}/{upload_id}/{name}'
+
+
+class _MeteredReader(io.RawIOBase):
+    """Read-through stream that hashes and counts bytes, raising MemoryError past a limit."""
+
+    def __init__(self, source: BinaryIO, limit: int):
+        self.source = source
+        self.limit = limit
+        self.size = 0
+        self.sha256 = hashlib.sha256()
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        data = self.source.read(len(b))
+        if not data:
+            return 0
+        self.size += len(data)
+        if self.size > self.limit:
+            raise MemoryError('file_too_large')
+        self.sha256.update(data)
+        b[:len(data)] = data
+        return len(data)
+
+
+def save_upload(source: bytes | BinaryIO, filename: str) -> str:
+    """Store an upload from bytes or a binary stream (e.g. UploadFile.file), streamed in chunks."""
     ext = ''.join(Path(filename).suffixes[-2:]) if filename.endswith('.vcf.gz') else Path(filename).suffix
     if ext not in ALLOWED_EXT and not filename.endswith('.vcf.gz'):
         raise ValueError('unsupported_file_type')
-    if len(file_bytes) > MAX_UPLOAD_MB * 1024 * 1024:
-        raise MemoryError('file_too_large')
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
     uid = new_upload_id()
-    d = upload_dir(uid)
-    d.mkdir(parents=True, exist_ok=True)
-    with open(input_path(uid), 'wb') as f:
-        f.write(file_bytes)
+    upload_dir(uid).mkdir(parents=True, exist_ok=True)
+    reader = _MeteredReader(source, MAX_UPLOAD_MB * 1024 * 1024)
+    try:
+        blobs.put(_key(uid, 'input'), reader)
+        blobs.put(_key(uid, 'input.sha256'), io.BytesIO(reader.sha256.hexdigest().encode()))
+    except BaseException:
+        delete_upload(uid)
+        raise
     return uid
 
 
+def upload_exists(upload_id: str) -> bool:
+    try:
+        return blobs.exists(_key(upload_id, 'input'))
+    except FileNotFoundError:  # invalid id
+        return False
+
+
+def upload_size(upload_id: str) -> int:
+    return blobs.stat(_key(upload_id, 'input')).size
+
+
+def open_upload(upload_id: str, start: int = 0, end: Optional[int] = None) -> BinaryIO:
+    """Binary stream over the stored upload (bytes [start, end)); close it when done."""
+    try:
+        return blobs.open(_key(upload_id, 'input'), start, end)
+    except FileNotFoundError:
+        raise FileNotFoundError('upload_not_found') from None
+
+
 def load_upload_bytes(upload_id: str) -> bytes:
-    p = input_path(upload_id)
-    if not p.exists():
-        raise FileNotFoundError('upload_not_found')
-    return p.read_bytes()
+    with open_upload(upload_id) as f:
+        return f.read()
 
 
-def delete_upload(upload_id: str) -> bool:
-    d = upload_dir(upload_id)
+def load_upload_head(upload_id: str, n: int = 4000) -> bytes:
+    """First n bytes of the stored upload (enough for format sniffing); a ranged read."""
+    with open_upload(upload_id, 0, n) as f:
+        return f.read()
+
+
+def upload_digest(upload_id: str) -> str:
+    """SHA-256 of the stored upload bytes (computed on save, then read from a sidecar object).
+
+    Every analysis path asks for it, so this is also where uploads are touched.
+    """
+    key = _key(upload_id, 'input.sha256')
+    try:
+        digest = blobs.read(key).decode().strip()
+        touch_upload(upload_id)
+        return digest
+    except FileNotFoundError:
+        pass
+    sha = hashlib.sha256()
+    with open_upload(upload_id) as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha.update(chunk)
+    digest = sha.hexdigest()
+    blobs.put(key, io.BytesIO(digest.encode()))
+    return digest
+
+
+def upload_usage(path: Path) -> int:
+    """Bytes of all files below an upload directory."""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.stat(os.path.join(root, name)).st_size
+            except FileNotFoundError:
+                pass
+    return total
+
+
+def delete_scratch(upload_id: str) -> bool:
+    """Remove this node's derived files for an upload, leaving the stored object alone."""
+    try:
+        d = upload_dir(upload_id)
+    except FileNotFoundError:
+        return False
     if d.exists():
         shutil.rmtree(d, ignore_errors=True)
         return True
     return False
+
+
+def delete_upload(upload_id: str) -> bool:
+    try:
+        key = _key(upload_id)
+    except FileNotFoundError:
+        return False
+    deleted = blobs.delete_prefix(key) > 0
+    return delete_scratch(upload_id) or deleted
@@ -0,0 +1,163 @@
+"""Lightweight tracing: nested spans with attributes.
+
+    with tracing.span('annotate', n_variants=len(df)) as s:
+        ...
+        s.set(clinvar_rows=len(catalogs.clinvar))
+
+Spans nest through a contextvar. The request middleware opens the root span
+of every request with trace_id = request id, so a trace lines up with the
+request's log lines. Work shipped to an analysis worker process runs under
+collect(parent_context): spans finished there are gathered into a list that
+travels back with the result and is ingest()ed by the API process, so one
+trace covers both processes.
+
+Finished spans land in an in-process ring buffer of TRACE_BUFFER spans
+(GET /debug/traces, admin token required) and, if TRACE_FILE is set, are appended to it as JSONL.
+"""
+from __future__ import annotations
+import collections
+import json
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterable, List, Optional
+
+from .config import TRACE_BUFFER, TRACE_FILE
+
+
+class Span:
+    __slots__ = ('trace_id', 'span_id', 'parent_id', 'name', 'start', 'attrs', 'error')
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], attrs: Dict[str, Any], start: Optional[float] = None):
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.name = name
+        self.start = time.time() if start is None else start
+        self.attrs = attrs
+        self.error: Optional[str] = None
+
+    def set(self, **attrs) -> None:
+        self.attrs.update(attrs)
+
+    def to_dict(self, duration_s: float) -> Dict[str, Any]:
+        return {'trace_id': self.trace_id, 'span_id': self.span_id, 'parent_id': self.parent_id, 'name': self.name,
+                'start': round(self.start, 6), 'duration_ms': round(duration_s * 1000, 3), 'attrs': self.attrs, 'error': self.error}
+
+
+_current: ContextVar[Optional[Span]] = ContextVar('tracing_span', default=None)
+_collector: ContextVar[Optional[list]] = ContextVar('tracing_collector', default=None)
+_buffer: collections.deque = collections.deque(maxlen=TRACE_BUFFER)
+_lock = threading.Lock()
+
+
+def _emit(record: Dict[str, Any]) -> None:
+    collected = _collector.get()
+    if collected is not None:
+        collected.append(record)
+    else:
+        ingest([record])
+
+
+def ingest(records: Iterable[Dict[str, Any]]) -> None:
+    """Add finished span records (e.g. returned from a worker) to the buffer and TRACE_FILE."""
+    records = list(records)
+    if not records:
+        return
+    with _lock:
+        _buffer.extend(records)
+        if TRACE_FILE:
+            try:
+                with open(TRACE_FILE, 'a') as f:
+                    f.writelines(json.dumps(r, default=str) + '\n' for r in records)
+            except OSError:
+                pass
+
+
+@contextmanager
+def span(name: str, trace_id: Optional[str] = None, **attrs):
+    """Open a child of the current span (or a new trace root) for the duration of the block."""
+    parent = _current.get()
+    s = Span(name, trace_id or (parent.trace_id if parent else uuid.uuid4().hex), parent.span_id if parent else None, attrs)
+    token = _current.set(s)
+    t0 = time.perf_counter()
+    try:
+        yield s
+    except BaseException as e:
+        s.error = f"{type(e).__name__}: {e}" if str(e) else type(e).__name__
+        raise
+    finally:
+        _current.reset(token)
+        _emit(s.to_dict(time.perf_counter() - t0))
+
+
+def record(name: str, duration_s: float, **attrs) -> None:
+    """Record an already-finished child span of the current span that ended just now."""
+    parent = _current.get()
+    s = Span(name, parent.trace_id if parent else uuid.uuid4().hex, parent.span_id if parent else None, attrs,
+             start=time.time() - duration_s)
+    _emit(s.to_dict(duration_s))
+
+
+def set_attrs(**attrs) -> None:
+    s = _current.get()
+    if s is not None:
+        s.set(**attrs)
+
+
+def context() -> Optional[Dict[str, str]]:
+    """Picklable handle on the current span, for continuing the trace in another process."""
+    s = _current.get()
+    return {'trace_id': s.trace_id, 'span_id': s.span_id} if s else None
+
+
+@contextmanager
+def collect(parent: Optional[Dict[str, str]] = None):
+    """Gather spans finished inside the block into the yielded list instead of the buffer.
+
+    With a parent context from context(), new spans continue that trace.
+    """
+    spans: List[Dict[str, Any]] = []
+    tokens = [_collector.set(spans)]
+    if parent:
+        remote = Span('<remote>', parent['trace_id'], None, {})
+        remote.span_id = parent['span_id']
+        tokens.append(_current.set(remote))
+    try:
+        yield spans
+    finally:
+        if parent:
+            _current.reset(tokens.pop())
+        _collector.reset(tokens.pop())
+
+
+def recent_traces(limit: int = 20, min_ms: float = 0.0, trace_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Most recent traces (newest first), each {'trace_id', 'root', 'duration_ms', 'spans'}."""
+    with _lock:
+        records = list(_buffer)
+    traces: Dict[str, List[Dict[str, Any]]] = collections.OrderedDict()
+    for r in records:
+        if trace_id is None or r['trace_id'] == trace_id:
+            traces.setdefault(r['trace_id'], []).append(r)
+    out = []
+    for tid, spans in reversed(traces.items()):
+        spans.sort(key=lambda r: r['start'])
+        ids = {r['span_id'] for r in spans}
+        roots = [r for r in spans if r['parent_id'] not in ids]
+        root = max(roots, key=lambda r: r['duration_ms'])
+        if root['duration_ms'] < min_ms:
+            continue
+        out.append({'trace_id': tid, 'root': root['name'], 'duration_ms': root['duration_ms'], 'spans': spans})
+        if len(out) >= limit:
+            break
+    return out
+
+
+def clear() -> None:
+    with _lock:
+        _buffer.clear()
+
+
+__all__ = ['Span', 'span', 'record', 'set_attrs', 'context', 'collect', 'ingest', 'recent_traces', 'clear']
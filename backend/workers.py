@@ -0,0 +1,206 @@
+"""Bounded process pool for CPU-bound analysis work.
+
+Handlers await `pool.run(fn, *args)` instead of calling fn inline, so parsing,
+pandas annotation and model inference never block the asyncio event loop.
+
+- At most ANALYSIS_WORKERS tasks execute at once (one per worker process);
+  up to ANALYSIS_MAX_QUEUE more wait in FIFO order, beyond that PoolSaturated.
+- Each call has a timeout (ANALYSIS_TIMEOUT_S) and an optional `is_cancelled`
+  coroutine (e.g. Request.is_disconnected) polled while waiting.
+- A task cancelled while queued never starts. A task already running in a
+  worker cannot be interrupted: its result is discarded and its slot is only
+  released when it finishes, so the pool is never oversubscribed.
+- ANALYSIS_WORKERS=0 runs tasks in a thread instead (dev/tests); the event
+  loop stays free but work shares the GIL.
+
+Slot hand-off is loop-agnostic (threading lock + call_soon_threadsafe), so a
+single pool serves requests from any event loop.
+"""
+from __future__ import annotations
+import asyncio
+import collections
+import logging
+import threading
+import time
+from importlib import import_module
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from .config import ANALYSIS_WORKERS, ANALYSIS_MAX_QUEUE, ANALYSIS_TIMEOUT_S
+
+logger = logging.getLogger(__name__)
+
+_CANCEL_POLL_S = 0.1
+# Imported lazily by the app (see engine), but by every analysis: load them in the
+# parent before forking so workers share the pages instead of importing their own copy.
+FORK_PRELOAD = ('pandas', 'numpy', '.analysis.ss_model')
+
+
+def preload_modules() -> None:
+    """Import FORK_PRELOAD (missing optional packages are skipped)."""
+    for name in FORK_PRELOAD:
+        try:
+            import_module(name, __package__)
+        except ImportError:  # pragma: no cover - optional dep
+            pass
+
+
+class PoolSaturated(RuntimeError):
+    """All workers busy and the wait queue is full."""
+
+
+class TaskTimeout(TimeoutError):
+    """The task did not finish within its timeout."""
+
+
+class TaskCancelled(RuntimeError):
+    """The caller went away (e.g. client disconnect) before the task finished."""
+
+
+class AnalysisPool:
+    def __init__(self, workers: int, max_queue: int, timeout_s: float):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout_s = timeout_s
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self._free = max(1, workers)
+        self._waiters: collections.deque = collections.deque()
+        self._counters = collections.Counter()
+
+    # -- executor lifecycle -------------------------------------------------
+    def _get_executor(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                if self.workers > 0:
+                    preload_modules()
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='analysis')
+            return self._executor
+
+    def _reset_executor(self) -> None:
+        with self._lock:
+            ex, self._executor = self._executor, None
+        if ex is not None:
+            ex.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self) -> None:
+        self._reset_executor()
+
+    # -- slots ----------------------------------------------------------------
+    def _acquire(self) -> Optional[asyncio.Future]:
+        """Take a slot now (None) or return a future resolved when one is handed over."""
+        with self._lock:
+            if self._free > 0:
+                self._free -= 1
+                return None
+            if len(self._waiters) >= self.max_queue:
+                self._counters['rejected'] += 1
+                raise PoolSaturated('analysis_queue_full')
+            loop = asyncio.get_running_loop()
+            fut = loop.create_future()
+            self._waiters.append((loop, fut))
+            return fut
+
+    def _release(self) -> None:
+        with self._lock:
+            if not self._waiters:
+                self._free += 1
+                return
+            loop, fut = self._waiters.popleft()
+        try:
+            loop.call_soon_threadsafe(self._handover, fut)
+        except RuntimeError:  # waiter's loop already closed
+            self._release()
+
+    def _handover(self, fut: asyncio.Future) -> None:
+        if fut.done():  # waiter gave up meanwhile: pass the slot on
+            self._release()
+        else:
+            fut.set_result(None)
+
+    def _abandon(self, fut: asyncio.Future) -> None:
+        with self._lock:
+            for i, (_, f) in enumerate(self._waiters):
+                if f is fut:
+                    del self._waiters[i]
+                    return
+        # already handed over; _handover will see fut done and release
+
+    # -- public API -----------------------------------------------------------
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            busy = max(1, self.workers) - self._free
+            return {
+                'workers': self.workers,
+                'busy': busy,
+                'queue_depth': len(self._waiters),
+                'max_queue': self.max_queue,
+                **{k: self._counters[k] for k in ('submitted', 'completed', 'failed', 'timeouts', 'cancelled', 'rejected')},
+            }
+
+    async def _wait(self, aw: Awaitable, deadline: float, is_cancelled: Optional[Callable[[], Awaitable[bool]]]):
+        task = asyncio.ensure_future(aw)
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TaskTimeout('analysis_timeout')
+            done, _ = await asyncio.wait({task}, timeout=min(remaining, _CANCEL_POLL_S) if is_cancelled else remaining)
+            if done:
+                return task.result()
+            if is_cancelled and await is_cancelled():
+                raise TaskCancelled('client_disconnected')
+
+    async def run(self, fn: Callable, *args, timeout: Optional[float] = None,
+                  is_cancelled: Optional[Callable[[], Awaitable[bool]]] = None) -> Any:
+        deadline = time.monotonic() + (timeout or self.timeout_s)
+        waiter = self._acquire()
+        if waiter is not None:
+            try:
+                await self._wait(asyncio.shield(waiter), deadline, is_cancelled)
+            except BaseException as e:
+                if waiter.cancel():
+                    self._abandon(waiter)
+                else:  # a slot was handed over just as we gave up
+                    self._release()
+                self._count_abort(e)
+                raise
+        try:
+            cf = self._get_executor().submit(fn, *args)
+        except BaseException:
+            self._release()
+            raise
+        self._count('submitted')
+        cf.add_done_callback(lambda _: self._release())
+        try:
+            result = await self._wait(asyncio.shield(asyncio.wrap_future(cf)), deadline, is_cancelled)
+        except BrokenProcessPool:
+            self._count('failed')
+            logger.error("event=analysis_pool_broken resetting executor")
+            self._reset_executor()
+            raise
+        except BaseException as e:
+            cf.cancel()
+            self._count_abort(e)
+            raise
+        self._count('completed')
+        return result
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._counters[key] += 1
+
+    def _count_abort(self, e: BaseException) -> None:
+        if isinstance(e, TaskTimeout):
+            self._count('timeouts')
+        elif isinstance(e, (TaskCancelled, asyncio.CancelledError)):
+            self._count('cancelled')
+        else:
+            self._count('failed')
+
+
+pool = AnalysisPool(ANALYSIS_WORKERS, ANALYSIS_MAX_QUEUE, ANALYSIS_TIMEOUT_S)
+
+__all__ = ['AnalysisPool', 'PoolSaturated', 'TaskTimeout', 'TaskCancelled', 'FORK_PRELOAD', 'preload_modules', 'pool']
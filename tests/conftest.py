@@ -0,0 +1,20 @@
+"""Keep the test run off the checkout's ./storage: every run gets its own storage root, jobs DB and
+result cache, and no janitor (tests that need one build their own, see test_janitor.py).
+
+Set before backend.config is imported, which reads them once.
+"""
+import os
+import shutil
+import tempfile
+
+_ROOT = tempfile.mkdtemp(prefix='greatjeans-tests-')
+os.environ.update({
+    'STORAGE_ROOT': os.path.join(_ROOT, 'uploads'),
+    'JOBS_DB': os.path.join(_ROOT, 'jobs.sqlite3'),
+    'RESULT_CACHE_DIR': os.path.join(_ROOT, 'result_cache'),
+    'JANITOR_INTERVAL_S': '0',
+})
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_ROOT, ignore_errors=True)
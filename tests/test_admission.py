@@ -0,0 +1,63 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import storage
+from backend.admission import Admission, AdmissionRejected, Cost, MB, admission, estimate
+from backend.analysis import bench
+from backend.api import app
+
+client = TestClient(app)
+
+
+def test_costs_scale_with_size_format_and_preparation():
+    small, big = estimate(MB, '23andme'), estimate(10 * MB, '23andme')
+    assert big.cpu_s > 9 * small.cpu_s and big.mem_bytes > 9 * (small.mem_bytes - 16 * MB)
+    assert estimate(10 * MB, 'vcf') < big and estimate(10 * MB, '23andme', 'prepared') < big
+    assert estimate(MB, 'vcf', gz=True) > estimate(MB, 'vcf')
+    assert estimate(MB, None) == small  # unknown formats are costed as the dearest
+
+
+def test_budgets_admit_reject_and_release():
+    ctl = Admission(cpu_budget_s=10, mem_budget_bytes=1000 * MB, workers=2)
+    first = ctl.admit(Cost(50.0, 2000 * MB))  # alone: admitted whatever its size
+    first.release()
+    a = ctl.admit(Cost(6.0, 100 * MB))
+    with pytest.raises(AdmissionRejected) as e:
+        ctl.admit(Cost(8.0, 100 * MB))
+    assert e.value.resource == 'cpu' and e.value.retry_after_s == 2  # (14 - 10) s over two workers
+    with pytest.raises(AdmissionRejected) as e:
+        ctl.admit(Cost(1.0, 950 * MB))
+    assert e.value.resource == 'memory'
+    with ctl.admit(Cost(3.0, 100 * MB)):
+        assert ctl.stats()['in_flight'] == 2 and ctl.usage() == {'cpu': 9.0, 'memory': 200 * MB}
+    a.release()
+    a.release()  # idempotent
+    assert ctl.usage() == {'cpu': 0.0, 'memory': 0} and ctl.stats()['admitted'] == 3
+    assert Admission(0, 0).admit(Cost(1e9, 1 << 60)) and Admission(0, 0).retry_after() == 1
+
+
+def test_analyze_is_turned_away_with_retry_after(monkeypatch):
+    uid = storage.save_upload(bench.synth_23andme(2000, seed=21), 'g.txt')
+    monkeypatch.setattr(admission, 'cpu_budget_s', 1.0)
+    monkeypatch.setattr(admission, 'mem_budget_bytes', 0)
+    busy = admission.admit(Cost(0.99, 0))  # someone else's analysis in flight
+    try:
+        for headers in ({}, {'Accept': 'application/x-ndjson'}):
+            r = client.post('/analyze', json={'upload_id': uid}, headers=headers)
+            assert r.status_code == 429 and int(r.headers['retry-after']) >= 1
+            assert r.json()['error']['detail']['error'] == 'over_cpu_budget'
+        monkeypatch.setattr(admission, 'mem_budget_bytes', 1)
+        r = client.post('/analyze', json={'upload_id': uid})
+        assert r.status_code == 503 and r.json()['error']['detail']['error'] == 'over_memory_budget' and 'retry-after' in r.headers
+        text = client.get('/metrics').text
+        assert 'greatjeans_admission_in_use{resource="cpu"} 0.99' in text
+        assert 'greatjeans_admission_budget{resource="cpu"} 1' in text
+        assert 'greatjeans_admission_rejected_total{resource="cpu",endpoint="analyze_ndjson"}' in text
+    finally:
+        busy.release()
+    for headers in ({}, {'Accept': 'application/x-ndjson'}):
+        r = client.post('/analyze', json={'upload_id': uid}, headers=headers)
+        assert r.status_code == 200 and '"error"' not in r.text
+    assert client.get('/debug/admission').json()['in_flight'] == 0  # tickets returned after success
+    assert client.post('/analyze', json={'upload_id': 'nope' * 4}).status_code == 404
+    client.delete(f'/uploads/{uid}')
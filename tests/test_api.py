@@ -1,3 +1,4 @@
+import json
 from fastapi.testclient import TestClient
 from backend.api import app
 from pathlib import Path
@@ -42,3 +43,67 @@ def test_health():
     r = client.get('/health')
     assert r.status_code == 200
     assert r.json() == {"ok": True}
+
+
+def test_ss_scan_validation():
+    r = client.post('/model/ss_scan', json={'rsid': 'rsDOESNOTEXIST'})
+    assert r.status_code == 404
+    r = client.post('/model/ss_scan', json={'wt_seq': 'A' * 500})
+    assert r.status_code in (400, 503)
+
+
+def test_analyze_ndjson_stream():
+    from backend import engine
+    sample_path = Path('backend/data/demo/sample_23andme.txt')
+    upload_id = client.post('/upload', files={'file': ('sample_23andme.txt', sample_path.read_bytes(), 'text/plain')}).json()['upload_id']
+    body = {'upload_id': upload_id, 'run_traits': True, 'run_protein': True, 'run_pgs': True}
+    full = client.post('/analyze', json=body).json()
+    r = client.post('/analyze', json=body, headers={'Accept': 'application/x-ndjson'})
+    assert r.status_code == 200 and r.headers['content-type'].startswith('application/x-ndjson')
+    lines = [json.loads(l) for l in r.text.splitlines()]
+    assert lines[0]['section'] == 'meta' and lines[-1] == {'section': 'end', 'n_variants': len(full['variants'])}
+    sections = {l['section']: l['data'] for l in lines if l['section'] not in ('meta', 'variants', 'end')}
+    variants = [v for l in lines if l['section'] == 'variants' for v in l['data']]
+    assert sections == {k: v for k, v in full.items() if k != 'variants'}
+    assert variants == full['variants']
+    # sections precede variants
+    kinds = [l['section'] for l in lines]
+    assert kinds.index('mini_model') < kinds.index('variants')
+    chunks = [json.loads(l) for l in engine.iter_ndjson(sample_path.read_bytes(), True, True, True, chunk_size=2)]
+    chunks = [c for c in chunks if c['section'] == 'variants']
+    assert [c['offset'] for c in chunks] == list(range(0, len(variants), 2))
+    assert [v for c in chunks for v in c['data']] == variants
+
+    bad = client.post('/analyze', json={**body, 'upload_id': 'nope'}, headers={'Accept': 'application/x-ndjson'})
+    assert bad.status_code == 404
+    client.delete(f'/uploads/{upload_id}')
+
+
+def test_analyze_ndjson_failures_end_the_stream_in_band(monkeypatch):
+    import time
+    from backend import api
+    from backend.workers import AnalysisPool
+    upload_id = client.post('/upload', files={'file': ('g.txt', Path('backend/data/demo/sample_23andme.txt').read_bytes(), 'text/plain')}).json()['upload_id']
+    ndjson = {'Accept': 'application/x-ndjson'}
+
+    def slow(upload_id, *args):
+        with open(args[-2], 'ab') as f:  # the spool path
+            f.write(b'{"section":"qc","data":{}}\n')
+        time.sleep(1.0)
+
+    monkeypatch.setattr(api, 'pool', AnalysisPool(0, 4, 0.3))
+    monkeypatch.setattr(api, 'spool_ndjson', slow)
+    lines = [json.loads(l) for l in client.post('/analyze', json={'upload_id': upload_id}, headers=ndjson).text.splitlines()]
+    # what the worker produced before the timeout still goes out
+    assert [l['section'] for l in lines] == ['meta', 'qc', 'error', 'end']
+    assert lines[-1] == {'section': 'end', 'error': 'analysis_timeout'}
+
+    def broken(*args):
+        raise RuntimeError('boom')
+
+    monkeypatch.setattr(api, 'pool', AnalysisPool(0, 4, 30.0))  # the timed-out task still holds the first one
+    monkeypatch.setattr(api, 'spool_ndjson', broken)
+    lines = [json.loads(l) for l in client.post('/analyze', json={'upload_id': upload_id}, headers=ndjson).text.splitlines()]
+    assert lines[1:] == [{'section': 'error', 'data': {'error': 'analysis_failed'}}, {'section': 'end', 'error': 'analysis_failed'}]
+    assert client.get('/debug/admission').json()['in_flight'] == 0
+    client.delete(f'/uploads/{upload_id}')
@@ -0,0 +1,65 @@
+import gzip
+import json
+
+from backend.analysis import bench
+from backend.engine import sniff_format
+from backend.parser_23andme import parse_23andme
+from backend.parser_vcf import parse_vcf
+
+
+def test_generators_are_deterministic_and_parseable():
+    known = bench.catalog_rsids()
+    raw = bench.synth_23andme(2000, seed=1, known=known)
+    assert raw == bench.synth_23andme(2000, seed=1, known=known)
+    assert raw != bench.synth_23andme(2000, seed=2, known=known)
+    assert sniff_format(raw) == '23andme'
+    df = parse_23andme(raw)
+    assert len(df) == 2000 and set(known) <= set(df['rsid'])
+
+    vcf = bench.synth_vcf(500, samples=3)
+    assert sniff_format(vcf) == 'vcf'
+    header = next(line for line in vcf.splitlines() if line.startswith(b'#CHROM'))
+    assert header.split(b'\t')[9:] == [b'S1', b'S2', b'S3']
+    gz = bench.synth_vcf(500, samples=3, gz=True)
+    assert gzip.decompress(gz) == vcf and gz == bench.synth_vcf(500, samples=3, gz=True)
+    assert parse_vcf(gz) == parse_vcf(vcf)
+
+
+def test_run_suite_reports_every_benchmark():
+    assert [b.name for b in bench._benchmarks()] == list(bench.BENCHMARKS)
+    report = bench.run_suite(sizes=[300], repeat=1)
+    json.dumps(report)
+    assert report['meta']['sizes'] == [300]
+    results = report['results']
+    assert set(results) == {bench.result_key(b.name, None if not b.sized else 300) for b in bench._benchmarks()}
+    for key, r in results.items():
+        assert 'error' not in r, (key, r.get('error'))
+        assert 0 <= r['min_s'] <= r['median_s'] and len(r['runs_s']) == 1
+
+
+def test_memory_mode_reports_every_stage():
+    report = bench.run_memory(sizes=[2000], top=3)
+    json.dumps(report)
+    assert report['meta']['mode'] == 'memory' and report['meta']['format'] == '23andme'
+    # 23andMe parsing builds the DataFrame itself: no separate conversion stage
+    assert list(report['results']) == [f"{stage}@2000" for stage in bench.MEMORY_STAGES if stage != 'dataframe']
+    for key, r in report['results'].items():
+        assert 'error' not in r, (key, r.get('error'))
+        assert r['peak_alloc_mb'] >= r['retained_mb'] - 0.01 and r['peak_alloc_mb'] >= 0
+    annotate = report['results']['annotate@2000']
+    assert annotate['retained_mb'] > 0 and annotate['top'][0]['size_mb'] > 0
+    assert not any('tracemalloc' in site['site'] for r in report['results'].values() for site in r['top'])
+
+    vcf = bench.run_memory(sizes=[400], fmt='vcf', top=0)['results']
+    assert list(vcf) == [f"{stage}@400" for stage in bench.MEMORY_STAGES]
+
+
+def test_cold_start_defers_heavy_imports_within_budget():
+    report = bench.run_startup(repeat=1, top=5)
+    json.dumps(report)
+    startup = report['results']['startup']
+    assert startup['loaded'] == [], f"importing {bench.STARTUP_MODULE} loaded {startup['loaded']}"
+    assert startup['import_s'] <= bench.STARTUP_BUDGET_S, bench.format_startup_row(startup)
+    assert startup['first_request_s'] is not None and startup['deferred_import_s'] > 0
+    packages = [k for k in report['results'] if k.startswith('import:')]
+    assert 'import:fastapi' in packages and len(packages) == 5
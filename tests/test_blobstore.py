@@ -0,0 +1,79 @@
+import hashlib
+import io
+
+import pytest
+
+from backend import engine, storage
+from backend.analysis import bench
+from backend.blobstore import LocalBlobStore, S3BlobStore, S3Error
+from backend.s3_standin import S3StandIn
+
+PART = 64 * 1024
+
+
+@pytest.fixture(scope='module')
+def standin():
+    with S3StandIn('AKTEST', 'secret', min_part_size=PART) as server:
+        yield server
+
+
+@pytest.fixture(params=['local', 's3'])
+def store(request, tmp_path, standin):
+    if request.param == 'local':
+        return LocalBlobStore(tmp_path)
+    return S3BlobStore(standin.endpoint, 'bucket', 'AKTEST', 'secret', prefix='t', part_size=PART)
+
+
+def test_put_open_stat_delete(store, standin):
+    data = bytes(range(256)) * 1000  # 256 KB: four multipart parts on S3
+    before = len(standin.requests)
+    assert store.put('ab/x/input', io.BytesIO(data)) == len(data)
+    if not store.local:
+        methods = [m for m, _ in standin.requests[before:]]
+        assert methods.count('PUT') == 4 and methods.count('POST') == 2  # create + 4 parts + complete
+    assert store.put('ab/x/input.sha256', io.BytesIO(b'abc')) == 3
+    assert store.stat('ab/x/input').size == len(data) and store.stat('ab/x/input').mtime > 0
+    assert store.read('ab/x/input') == data
+    assert store.read('ab/x/input', 1000, 1010) == data[1000:1010]
+    assert store.read('ab/x/input', len(data) - 5) == data[-5:]
+    assert store.read('ab/x/input', len(data) + 5) == b''
+    with store.open('ab/x/input') as f:  # streamed in pieces
+        assert f.read(10) == data[:10] and f.read() == data[10:]
+    for missing in (lambda: store.open('ab/y/input'), lambda: store.stat('ab/y/input')):
+        with pytest.raises(FileNotFoundError):
+            missing()
+    assert store.exists('ab/x/input') and not store.exists('ab/y/input')
+    assert store.delete_prefix('ab/x/') == 2 and not store.exists('ab/x/input.sha256')
+    assert store.delete('ab/x/input') is False
+
+
+def test_s3_rejects_bad_signatures_and_small_parts(standin):
+    bad = S3BlobStore(standin.endpoint, 'bucket', 'AKTEST', 'wrong')
+    with pytest.raises(S3Error, match='403'):
+        bad.put('k', io.BytesIO(b'x'))
+    tiny = S3BlobStore(standin.endpoint, 'bucket', 'AKTEST', 'secret', part_size=1024)
+    with pytest.raises(S3Error, match='EntityTooSmall'):
+        tiny.put('k', io.BytesIO(b'x' * 5000))
+    assert not standin.uploads  # the failed multipart upload was aborted
+
+
+def test_uploads_stream_through_s3(standin, tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, 'BASE_DIR', tmp_path)
+    monkeypatch.setattr(storage, 'blobs', S3BlobStore(standin.endpoint, 'uploads', 'AKTEST', 'secret', part_size=PART))
+    raw = bench.synth_23andme(12000, seed=11)
+    uid = storage.save_upload(io.BytesIO(raw), 'g.txt')
+    assert not storage.input_path(uid).exists() and storage.upload_exists(uid)
+    assert len(standin.buckets['uploads'][f'{uid[:2]}/{uid}/input'][0]) == len(raw) > 4 * PART  # multipart
+    assert storage.load_upload_head(uid, 100) == raw[:100]
+    df, fmt = engine.parse_upload(uid)
+    assert fmt == '23andme' and df.equals(engine.detect_and_parse(raw)[0])
+    assert storage.upload_digest(uid) == hashlib.sha256(raw).hexdigest()
+
+    monkeypatch.setattr(storage, 'MAX_UPLOAD_MB', 0)
+    with pytest.raises(MemoryError):
+        storage.save_upload(io.BytesIO(raw), 'big.txt')
+    assert list(standin.buckets['uploads']) == [f'{uid[:2]}/{uid}/input', f'{uid[:2]}/{uid}/input.sha256']
+
+    assert storage.delete_upload(uid) and not storage.upload_exists(uid) and not standin.buckets['uploads']
+    with pytest.raises(FileNotFoundError):
+        engine.parse_upload(uid)
@@ -61,3 +61,13 @@ def test_missing_files(tmp_path):
     assert len(catalogs.get_protein_map_df()) == 0
     assert len(catalogs.get_pgs_df()) == 0
     assert len(catalogs.get_aa_windows()) == 0
+
+def test_catalog_tables_load_on_first_access(tmp_path, caplog):
+    """Catalogs reads nothing until a table is used (cold start)."""
+    caplog.set_level(logging.INFO)
+    (tmp_path / "traits_catalog.csv").write_text("rsid,trait\nrs1,test\n")
+    cats = catalogs.Catalogs.load(tmp_path)
+    assert "Loading CSV from" not in caplog.text and 'traits' not in vars(cats)
+    assert len(cats.traits) == 1 and cats.traits is cats.traits
+    assert caplog.text.count("Loading CSV from") == 1
+    assert cats.clinvar.empty and cats.rsid_index('clinvar') == {}
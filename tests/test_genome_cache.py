@@ -0,0 +1,66 @@
+import pandas as pd
+from fastapi.testclient import TestClient
+
+from backend import api, metrics, storage
+from backend.analysis import bench
+from backend.api import app
+from backend.workers import AnalysisPool
+from backend.genome_cache import GenomeCache, genome_nbytes, cache as genome_cache
+
+client = TestClient(app)
+
+
+def _genome(n):
+    df = pd.DataFrame({'rsid': [f'rs{i}' for i in range(n)], 'chrom': 'chr1', 'pos': range(n), 'genotype': 'AG'})
+    return df, '23andme', {}
+
+
+def test_lru_is_bounded_by_bytes_and_drops_deleted_uploads():
+    alive = {'a', 'b', 'c', 'big'}
+    size = genome_nbytes(_genome(100))
+    checked = []
+    cache = GenomeCache(int(size * 2.5), alive=lambda uid: checked.append(uid) or uid in alive)
+    assert cache.put('a', 'd1', _genome(100)) and cache.put('b', 'd2', _genome(100))
+    assert cache.get('a', 'd1') is not None  # a is now most recently used
+    assert cache.get('a', 'other-digest') is None
+    cache.put('c', 'd3', _genome(100))
+    assert cache.get('b', 'd2') is None and cache.get('c', 'd3') is not None
+    assert not cache.put('big', 'd4', _genome(1000))
+    stats = cache.stats()
+    assert stats['entries'] == 2 and stats['bytes'] == 2 * size <= stats['max_bytes'] and stats['evictions'] == 1
+    assert (stats['hits'], stats['misses']) == cache.lookups() == (2, 2)
+
+    # only hits check their own upload; the other entries wait for the periodic sweep
+    assert checked == ['a', 'c']
+    alive.discard('c')
+    assert cache.get('c', 'd3') is None and cache.stats()['deleted'] == 1
+    assert cache.put('c', 'd3', _genome(100)) and cache.get('a', 'd1') is not None
+    assert cache.stats()['entries'] == 2
+    cache.sweep_s, cache._next_sweep = 0.0, 0.0
+    assert cache.get('a', 'd1') is not None and cache.stats()['entries'] == 1 and cache.stats()['deleted'] == 2
+    assert cache.evict('a') == 1 and cache.stats()['bytes'] == 0
+    assert not GenomeCache(0).put('a', 'd1', _genome(10))
+
+
+def test_option_changes_reuse_the_parsed_genome_until_delete(monkeypatch):
+    single = AnalysisPool(1, 4, 60.0)  # one worker process, so the second request finds the first's genome
+    monkeypatch.setattr(api, 'pool', single)
+    uid = client.post('/upload', files={'file': ('g.txt', bench.synth_23andme(3000, seed=7), 'text/plain')}).json()['upload_id']
+    ndjson = {'Accept': 'application/x-ndjson'}
+    lookups = lambda result: metrics.CACHE_LOOKUPS.value(cache='genome', result=result)
+    before = lookups('hit'), lookups('miss')
+    try:
+        for run_pgs in (False, True):
+            r = client.post('/analyze', json={'upload_id': uid, 'run_pgs': run_pgs}, headers=ndjson)
+            assert r.status_code == 200 and '"error"' not in r.text
+    finally:
+        single.shutdown()
+    # streaming runs in the pool worker, which reports its cache lookups back
+    assert (lookups('hit') - before[0], lookups('miss') - before[1]) == (1, 1)
+
+    text = client.get('/metrics').text
+    assert 'greatjeans_genome_cache_bytes{process="api"}' in text and 'cache="genome"' in text
+    assert 'entries' in client.get('/debug/cache').json()['genome']
+    client.delete(f'/uploads/{uid}')
+    assert not any(k[0] == uid for k in genome_cache._entries)
+    assert not storage.upload_dir(uid).exists()
@@ -0,0 +1,65 @@
+import os
+import time
+
+import pytest
+
+from backend import storage, tracing
+from backend.blobstore import LocalBlobStore
+from backend.janitor import Janitor, EVICTIONS, MIN_AGE_S
+
+
+@pytest.fixture
+def root(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, 'BASE_DIR', tmp_path)
+    monkeypatch.setattr(storage, 'blobs', LocalBlobStore(tmp_path))
+    return tmp_path
+
+
+def _upload(size, age_s, now):
+    uid = storage.save_upload(b'x' * size, 'g.txt')
+    os.utime(storage.upload_dir(uid), (now - age_s, now - age_s))
+    return uid
+
+
+def test_sharded_layout_and_migration(root):
+    uid = storage.save_upload(b'rsid\tchromosome\tposition\tgenotype\n', 'g.txt')
+    assert storage.input_path(uid) == root / uid[:2] / uid / 'input' and storage.load_upload_bytes(uid)
+    legacy = storage.new_upload_id()
+    (root / legacy).mkdir()
+    (root / legacy / 'input').write_bytes(b'old')
+    os.utime(root / legacy, (time.time() - 7200, time.time() - 7200))  # never touched under the flat layout
+    assert storage.migrate_flat_layout() == 1
+    assert Janitor(ttl_s=3600, quota_bytes=0, interval_s=0).sweep()['expired'] == 0  # a deploy keeps live legacy uploads
+    assert storage.load_upload_bytes(legacy) == b'old'
+    assert sorted(u for u, _ in storage.iter_upload_dirs()) == sorted([uid, legacy])
+    for bad in ('..', '../x', 'a/b', ''):
+        with pytest.raises(FileNotFoundError):
+            storage.upload_dir(bad)
+        assert storage.delete_upload(bad) is False
+
+
+def test_ttl_then_lru_quota(root):
+    now = time.time()
+    expired = _upload(1000, 7200, now)
+    oldest, older, fresh = _upload(4000, 1800, now), _upload(4000, 900, now), _upload(4000, 0, now)
+    storage.touch_upload(older)  # used just now: LRU order becomes oldest, fresh, older
+    os.utime(storage.upload_dir(fresh), (now - 600, now - 600))
+    purged = []
+    janitor = Janitor(ttl_s=3600, quota_bytes=6000, interval_s=0, purge=lambda u: purged.append(u) or storage.delete_upload(u))
+    before = EVICTIONS.value(reason='quota')
+    with tracing.collect() as spans:
+        stats = janitor.sweep(now=now)
+    assert purged == [expired, oldest, fresh]
+    assert stats['uploads'] == 1 and stats['expired'] == 1 and stats['evicted'] == 2 and not stats['over_quota']
+    assert stats['freed_bytes'] > 9000 and 4000 <= stats['bytes'] <= 6000
+    assert EVICTIONS.value(reason='quota') == before + 2
+    assert [s['name'] for s in spans] == ['janitor.sweep'] and spans[0]['attrs']['evicted'] == 2
+    assert janitor.stats()['last_sweep']['uploads'] == 1 and storage.input_path(older).exists()
+
+
+def test_recently_used_uploads_survive_the_quota(root):
+    now = time.time()
+    uids = [_upload(4000, MIN_AGE_S / 2, now) for _ in range(3)]
+    stats = Janitor(ttl_s=0, quota_bytes=1000, interval_s=0).sweep(now=now)
+    assert stats['evicted'] == 0 and stats['over_quota'] and stats['uploads'] == 3
+    assert all(storage.input_path(u).exists() for u in uids)
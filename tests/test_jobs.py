@@ -0,0 +1,81 @@
+import json
+import time
+from pathlib import Path
+from fastapi.testclient import TestClient
+from backend.api import app
+from backend.jobs import GONE, JobStore, STATUS_QUEUED, STATUS_FAILED, run_job
+
+
+def _upload(client):
+    with open(Path('backend/data/demo/sample_23andme.txt'), 'rb') as f:
+        return client.post('/upload', files={'file': ('sample_23andme.txt', f, 'text/plain')}).json()['upload_id']
+
+
+def test_job_lifecycle_and_events():
+    with TestClient(app) as client:
+        upload_id = _upload(client)
+        r = client.post('/jobs', json={'upload_id': upload_id, 'run_pgs': True})
+        assert r.status_code == 202
+        job_id = r.json()['job_id']
+        with client.stream('GET', f'/jobs/{job_id}/events') as stream:
+            events = [line.split(': ', 1)[1] for line in stream.iter_lines() if line.startswith('event: ')]
+        assert events[-1] == 'done'
+        job = client.get(f'/jobs/{job_id}').json()
+        assert job['status'] == 'done'
+        assert set(job['progress']) == {'parse', 'annotate', 'traits', 'protein', 'pgs', 'mini_model'}
+        assert all(v == 'done' for v in job['progress'].values())
+        assert job['partial']['qc']['format'] == '23andme' and 'variants' not in job['partial']
+        result = client.get(job['result_url']).json()
+        direct = client.post('/analyze', json={'upload_id': upload_id, 'run_pgs': True}).json()
+        assert result['qc'] == direct['qc'] and result['traits'] == direct['traits']
+        assert len(result['variants']) == len(direct['variants'])
+        client.delete(f'/uploads/{upload_id}')
+        assert client.get(f'/jobs/{job_id}').status_code == 404
+
+
+def test_job_unknown_upload():
+    with TestClient(app) as client:
+        assert client.post('/jobs', json={'upload_id': 'nope'}).status_code == 404
+        assert client.get('/jobs/doesnotexist').status_code == 404
+
+
+def test_job_store_recovery(tmp_path):
+    store = JobStore(tmp_path / 'jobs.sqlite3', lease_s=60)
+    job_id = store.create('u1', {'upload_id': 'u1'})
+    assert store.claim_next() == job_id
+    store.update_stage(job_id, 'parse', 'done', {'qc': {'n_snps': 1}}, next_stage='annotate')
+    # the owner's lease is still live: a sibling process starting up must not steal the job
+    assert store.recover(max_attempts=2) == {'requeued': 0, 'failed': 0}
+    # process dies mid-job: once the lease lapses the job is re-queued with a clean slate
+    later = time.time() + 61
+    assert store.recover(max_attempts=2, now=later) == {'requeued': 1, 'failed': 0}
+    assert store.get(job_id)['status'] == STATUS_QUEUED
+    assert store.claim_next() == job_id
+    assert store.get(job_id)['progress'] == {}
+    # second crash exhausts the attempts
+    assert store.recover(max_attempts=2, now=later + 61) == {'requeued': 0, 'failed': 1}
+    job = store.get(job_id)
+    assert job['status'] == STATUS_FAILED and job['error'] == 'worker_restarted'
+    assert store.claim_next() is None
+
+
+def test_job_lease_heartbeat_and_release(tmp_path):
+    store = JobStore(tmp_path / 'jobs.sqlite3', lease_s=60)
+    job_id = store.create('u1', {'upload_id': 'u1'})
+    assert store.claim_next(owner='host:1') == job_id
+    t0 = time.time()
+    assert store.heartbeat(job_id, 'host:1')
+    assert not store.heartbeat(job_id, 'host:2')  # only the owner renews
+    assert store.recover(max_attempts=2, now=t0 + 30) == {'requeued': 0, 'failed': 0}
+    # a cancelled owner hands the job back without waiting out its lease
+    store.release(job_id, 'host:1')
+    assert store.recover(max_attempts=2) == {'requeued': 1, 'failed': 0}
+    assert not store.heartbeat(job_id, 'host:1')
+
+
+def test_job_deleted_with_its_upload_after_claim(tmp_path):
+    store = JobStore(tmp_path / 'jobs.sqlite3')
+    job_id = store.create('u1', {'upload_id': 'u1'})
+    assert store.claim_next() == job_id
+    store.delete_for_upload('u1')
+    assert run_job(job_id, str(tmp_path / 'jobs.sqlite3')) == GONE
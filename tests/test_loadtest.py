@@ -0,0 +1,31 @@
+import asyncio
+import os
+
+import pytest
+
+from backend import loadtest
+
+
+def test_parse_mix_and_percentile():
+    assert loadtest.parse_mix('analyze=3, demo') == {'analyze': 3.0, 'demo': 1.0}
+    with pytest.raises(ValueError):
+        loadtest.parse_mix('analyse=1')
+    values = list(range(1, 101))
+    assert (loadtest.percentile(values, 50), loadtest.percentile(values, 95), loadtest.percentile(values, 99)) == (50, 95, 99)
+    assert loadtest.percentile([7.0], 99) == 7.0 and loadtest.percentile([], 50) is None
+
+
+def test_process_tree_rss_includes_self():
+    tree = loadtest.process_tree_rss(os.getpid())
+    assert tree.get(os.getpid(), 0) > 0
+
+
+def test_short_run_against_local_server():
+    with loadtest.local_server(workers=1, cold=True) as (url, pid):
+        report = asyncio.run(loadtest.run_load(url, pid, rate=6, duration_s=2, sizes=[500], rss_interval_s=0.5))
+    assert report['totals']['requests'] > 0 and report['totals']['errors'] == 0
+    assert set(report['endpoints']) <= {'analyze@500', 'upload@500', 'ss_predict', 'demo'}
+    for e in report['endpoints'].values():
+        assert e['p50_ms'] <= e['p95_ms'] <= e['p99_ms'] <= e['max_ms']
+    assert report['rss']['max_mb'] > 0 and report['rss']['timeline']
+    assert 'total:' in loadtest.format_report(report)
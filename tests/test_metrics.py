@@ -0,0 +1,80 @@
+import time
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+from backend import metrics, storage
+from backend.api import app
+from backend.metrics import AnalysisProbe, Counter, Histogram, Registry
+from backend.result_cache import cache as result_cache
+
+client = TestClient(app)
+
+
+def test_text_format():
+    reg = Registry()
+    h = reg.register(Histogram('t_seconds', 'Test.', ('stage',), buckets=(0.1, 1.0)))
+    c = reg.register(Counter('t_total', 'Test.', ('k',)))
+    h.observe(0.05, stage='a')
+    h.observe(5, stage='a')
+    c.inc(2, k='x"y')
+    text = reg.render()
+    assert '# TYPE t_seconds histogram' in text
+    assert 't_seconds_bucket{stage="a",le="0.1"} 1' in text
+    assert 't_seconds_bucket{stage="a",le="1"} 1' in text
+    assert 't_seconds_bucket{stage="a",le="+Inf"} 2' in text
+    assert 't_seconds_count{stage="a"} 2' in text
+    assert 't_total{k="x\\"y"} 2' in text
+
+
+def test_probe_overhead_is_negligible():
+    t0 = time.perf_counter()
+    for _ in range(200):
+        probe = AnalysisProbe()
+        for stage in ('parse', 'annotate', 'traits', 'protein', 'pgs', 'ss_inference', 'serialize'):
+            with probe.stage(stage):
+                pass
+        probe.finish()
+    # well under 1% of even a small (50 ms) analysis
+    assert (time.perf_counter() - t0) / 200 < 0.0005
+
+
+def test_metrics_endpoint_after_analyze():
+    sample = Path('backend/data/demo/sample_23andme.txt').read_bytes()
+    uid = client.post('/upload', files={'file': ('sample_23andme.txt', sample, 'text/plain')}).json()['upload_id']
+    result_cache.invalidate(storage.upload_digest(uid))
+    before = metrics.STAGE_SECONDS.count(stage='annotate', format='23andme')
+    assert client.post('/analyze', json={'upload_id': uid, 'run_pgs': True}).status_code == 200
+    assert client.post('/analyze', json={'upload_id': uid, 'run_pgs': True}).status_code == 200
+    assert metrics.STAGE_SECONDS.count(stage='annotate', format='23andme') == before + 1
+
+    r = client.get('/metrics')
+    assert r.status_code == 200 and r.headers['content-type'].startswith('text/plain')
+    text = r.text
+    for stage in ('upload', 'parse', 'annotate', 'traits', 'protein', 'pgs', 'ss_inference', 'serialize'):
+        assert f'greatjeans_stage_seconds_count{{stage="{stage}",format="23andme"}}' in text
+    assert 'greatjeans_cache_hit_ratio{cache="result"}' in text
+    assert 'greatjeans_cache_lookups_total{cache="windows",result=' in text
+    assert 'greatjeans_pool_queue_depth ' in text
+    assert 'greatjeans_analysis_peak_rss_bytes_count{format="23andme"}' in text
+    assert 'greatjeans_http_request_duration_seconds_count{method="POST",route="/analyze",status="200"}' in text
+    client.delete(f'/uploads/{uid}')
+
+
+def test_genome_cache_bytes_only_for_live_pool_workers():
+    import multiprocessing
+    worker = multiprocessing.Process(target=time.sleep, args=(30,))
+    worker.start()
+    try:
+        gone = multiprocessing.Process(target=int)
+        gone.start()
+        gone.join()
+        for pid in (worker.pid, gone.pid):
+            metrics.record_analysis({'genome_cache_bytes': (pid, 1234)})
+        text = metrics.registry.render()
+        assert f'greatjeans_genome_cache_bytes{{process="worker-{worker.pid}"}} 1234' in text
+        assert f'worker-{gone.pid}' not in text
+    finally:
+        worker.terminate()
+        worker.join()
+    assert f'worker-{worker.pid}' not in metrics.registry.render()
@@ -13,3 +13,26 @@ def test_parse_23andme():
 def test_detect_vcf():
     head = b"##fileformat=VCFv4.2\n#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO"
     assert is_vcf(head)
+
+
+def test_parsers_read_streams_in_chunks():
+    import gzip, io
+    from backend.analysis import bench
+    from backend.parser_vcf import parse_vcf
+    raw = bench.synth_23andme(2500, seed=3) + b"rs9\t1\t9\tNA\n"
+    whole = parse_23andme(raw)
+    chunked = parse_23andme(io.BytesIO(raw), chunk_lines=1000)
+    pd.testing.assert_frame_equal(whole, chunked)
+    assert len(whole) == 2501 and whole['genotype'].iloc[-1] == '--'  # NA no longer crashes
+    vcf = bench.synth_vcf(300, samples=1)
+    assert parse_vcf(io.BytesIO(vcf)) == parse_vcf(vcf) == parse_vcf(io.BytesIO(gzip.compress(vcf)))
+
+
+def test_sample_uploads_parse():
+    from pathlib import Path
+    samples = sorted(Path(__file__).parent.glob('fixtures/uploads/*/input'))
+    assert samples
+    for path in samples:
+        raw = path.read_bytes()
+        assert is_23andme_text(raw[:4000].decode()), path
+        assert len(parse_23andme(raw)) > 0, path
@@ -0,0 +1,20 @@
+"""Performance regression gate; run with `pytest -m perf` (see backend.analysis.perf_gate)."""
+import pytest
+
+from backend.analysis import perf_gate
+
+pytestmark = pytest.mark.perf
+BASELINE = perf_gate.load_baseline()
+
+
+@pytest.fixture(scope='module')
+def rows():
+    rows = perf_gate.compare(perf_gate.run_gate(BASELINE), BASELINE)
+    print('\n' + perf_gate.format_table(rows))
+    return rows
+
+
+@pytest.mark.parametrize('key', sorted(BASELINE['benchmarks']))
+def test_no_regression(rows, key):
+    mine = [r for r in rows if r.key == key]
+    assert mine and not any(r.failed for r in mine), '\n' + perf_gate.format_table(mine)
@@ -0,0 +1,39 @@
+from backend.analysis import perf_gate
+
+
+def _report(**results):
+    return {'meta': {}, 'results': {k: {'name': k.split('@')[0], 'n': 1000, **v} for k, v in results.items()}}
+
+
+def test_baseline_covers_the_gated_hot_paths():
+    names = {key.split('@')[0] for key in perf_gate.load_baseline()['benchmarks']}
+    assert names == set(perf_gate.GATED)
+
+
+def test_compare_flags_regressions_beyond_tolerance():
+    baseline = perf_gate.make_baseline(_report(**{
+        'qc_metrics@1000': {'min_s': 0.010, 'peak_rss_delta_mb': 100.0},
+        'parse_vcf@1000': {'min_s': 0.100, 'peak_rss_delta_mb': 10.0},
+        'compute_bmi_pgs@1000': {'min_s': 0.050, 'peak_rss_delta_mb': 1.0},
+        'analyze_endpoint@1000': {'min_s': 1.0},  # not gated
+    }))
+    assert set(baseline['benchmarks']) == {'qc_metrics@1000', 'parse_vcf@1000', 'compute_bmi_pgs@1000'}
+    rows = perf_gate.compare(_report(**{
+        'qc_metrics@1000': {'min_s': 0.060, 'peak_rss_delta_mb': 120.0},  # per-row .apply is back: 6x slower
+        'parse_vcf@1000': {'min_s': 0.140, 'peak_rss_delta_mb': 200.0},  # within time tolerance, memory blew up
+        'compute_bmi_pgs@1000': {'error': 'KeyError: rsid'},
+    }), baseline)
+    status = {(r.key, r.metric): r.status for r in rows}
+    assert status == {
+        ('qc_metrics@1000', 'min_s'): 'REGRESSED', ('qc_metrics@1000', 'peak_rss_delta_mb'): 'ok',
+        ('parse_vcf@1000', 'min_s'): 'ok', ('parse_vcf@1000', 'peak_rss_delta_mb'): 'REGRESSED',
+        ('compute_bmi_pgs@1000', 'min_s'): 'error', ('compute_bmi_pgs@1000', 'peak_rss_delta_mb'): 'error',
+    }
+    table = perf_gate.format_table(rows)
+    assert 'qc_metrics@1000' in table and '+500%' in table
+
+
+def test_small_timings_are_protected_by_the_floor():
+    baseline = perf_gate.make_baseline(_report(**{'compute_bmi_pgs@1000': {'min_s': 0.001, 'peak_rss_delta_mb': 0.0}}))
+    rows = perf_gate.compare(_report(**{'compute_bmi_pgs@1000': {'min_s': 0.004, 'peak_rss_delta_mb': 8.0}}), baseline)
+    assert not any(r.failed for r in rows)
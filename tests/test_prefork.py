@@ -0,0 +1,46 @@
+import gc
+import os
+
+import httpx
+from fastapi.testclient import TestClient
+
+from backend import engine, jobs, loadtest, prefork
+from backend.api import app
+from backend.janitor import janitor
+
+
+def test_process_memory_and_catalog_indexes():
+    mem = prefork.process_memory(os.getpid())
+    assert mem['rss'] >= mem['pss'] >= mem['uss'] > 0
+    index = engine.catalogs.rsid_index('protein_map')
+    assert engine.catalogs.rsid_index('protein_map') is index  # built once, shared by every call
+    assert set(index) == set(engine.catalogs.protein_map['rsid'])
+
+
+def test_preload_freezes_and_workers_serve(monkeypatch):
+    monkeypatch.setattr(gc, 'freeze', lambda: None)  # keep the test process collectable
+    assert prefork.preload() is not None
+    gc.enable()
+    with loadtest.local_server(workers=2, prefork=True, env={'ANALYSIS_WORKERS': '0'}) as (url, pid):
+        assert httpx.get(f'{url}/health', timeout=5).status_code == 200
+        assert len(loadtest.process_tree_rss(pid)) == 3  # master + two forked workers
+
+
+def test_master_housekeeps_and_workers_only_run_jobs(monkeypatch):
+    job_id = jobs.store.create('u-prefork', {'upload_id': 'u-prefork'})
+    assert jobs.store.claim_next(owner='gone:1') == job_id
+    jobs.store.release(job_id, 'gone:1')  # its worker died
+    housekeeping = prefork._Housekeeping()
+    housekeeping.start()  # the master, before forking
+    assert jobs.store.get(job_id)['status'] == jobs.STATUS_QUEUED
+    assert 0 <= housekeeping.run_due() <= prefork.TICK_S
+    jobs.store.delete_for_upload('u-prefork')
+    # a forked worker's lifespan: no janitor, no recovery loop, just the runner
+    monkeypatch.setattr(app.state, 'housekeeping', False, raising=False)
+    monkeypatch.setattr(janitor, 'interval_s', 60.0)
+    started = []
+    monkeypatch.setattr(jobs.store, 'recover', lambda *a, **k: started.append('recover') or {'requeued': 0, 'failed': 0})
+    with TestClient(app):
+        assert jobs.runner.periodic_recovery is False and len(jobs.runner._tasks) == jobs.runner.concurrency
+        assert janitor._task is None
+    assert started == []
@@ -0,0 +1,71 @@
+import pickle
+import time
+
+from fastapi.testclient import TestClient
+
+from backend import prepare, storage
+from backend.analysis import bench
+from backend.api import app
+from backend.engine import analyze_upload_bytes
+from backend.genome_cache import cache as genome_cache
+
+client = TestClient(app)
+
+
+def _drop_prepared(upload_id):
+    storage.prepared_path(upload_id).unlink()
+    storage.prepared_status_path(upload_id).unlink()
+
+
+def test_prepared_artifact_matches_fresh_parse():
+    uid = storage.save_upload(bench.synth_23andme(3000, seed=4, known=bench.catalog_rsids()), 'g.txt')
+    try:
+        out = prepare.prepare_upload(uid)
+        assert out['status'] == 'ready' and out['format'] == '23andme' and out['n_variants'] == 3000
+        assert prepare.status(uid)['status'] == 'ready'
+        df, fmt, parsed = prepare.load_prepared(uid)
+        assert str(df['genotype'].dtype) == 'category' and set(parsed) == {'qc', 'genome_window'}
+        genome_cache.clear()
+        hits = prepare.lookup_stats()[0]
+        prepared = {enc: analyze_upload_bytes(uid, True, True, True, encoding=enc) for enc in ('json', 'columnar')}
+        assert prepare.lookup_stats()[0] == hits + 1  # the second run is served by the genome cache
+        _drop_prepared(uid)
+        genome_cache.clear()
+        assert prepare.load_prepared(uid) is None
+        assert prepared == {enc: analyze_upload_bytes(uid, True, True, True, encoding=enc) for enc in ('json', 'columnar')}
+    finally:
+        storage.delete_upload(uid)
+
+
+def test_failed_stale_and_deleted_uploads():
+    bad = storage.save_upload(b'not a genome\n', 'bad.txt')
+    assert prepare.prepare_upload(bad)['status'] == 'failed'
+    assert prepare.status(bad)['status'] == 'failed' and prepare.load_prepared(bad) is None
+    storage.delete_upload(bad)
+    assert prepare.prepare_upload(bad)['status'] == 'none'
+
+    uid = storage.save_upload(bench.synth_23andme(200, seed=5), 'g.txt')
+    prepare.prepare_upload(uid)
+    doc = pickle.loads(storage.prepared_path(uid).read_bytes())
+    storage.prepared_path(uid).write_bytes(pickle.dumps({**doc, 'version': prepare.PREPARED_VERSION - 1}))
+    assert prepare.load_prepared(uid) is None
+    storage.delete_upload(uid)
+
+
+def test_upload_reports_prepared_status():
+    r = client.post('/upload', files={'file': ('g.txt', bench.synth_23andme(2000, seed=6), 'text/plain')})
+    assert r.status_code == 200 and r.json()['prepared'] == 'pending'
+    uid = r.json()['upload_id']
+    deadline = time.monotonic() + 30
+    while (state := client.get(f'/uploads/{uid}').json())['prepared'] == 'pending' and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert state == {'upload_id': uid, 'format': '23andme', 'prepared': 'ready'}
+    ar = client.post('/analyze', json={'upload_id': uid})
+    assert ar.status_code == 200 and ar.json()['qc']['n_snps'] == 2000
+
+    r = client.post('/upload', files={'file': ('x.txt', b'hello\n', 'text/plain')})
+    assert r.json()['format'] is None and r.json()['prepared'] == 'none'
+    assert client.get(f"/uploads/{r.json()['upload_id']}").json()['prepared'] == 'none'
+    for u in (uid, r.json()['upload_id']):
+        client.delete(f'/uploads/{u}')
+    assert client.get(f'/uploads/{uid}').status_code == 404
@@ -0,0 +1,82 @@
+import os
+import threading
+import time
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import config, profiling
+from backend.api import app
+from backend.profiling import Sampler
+
+client = TestClient(app)
+ADMIN = {'X-Admin-Token': 's3cret'}
+
+
+@pytest.fixture
+def admin_token(monkeypatch):
+    monkeypatch.setattr(config, 'ADMIN_TOKEN', 's3cret')
+
+
+def _busy_loop(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        sum(range(1000))
+
+
+def test_sampler_collects_collapsed_stacks():
+    with Sampler(threading.get_ident(), interval_s=0.001) as sampler:
+        _busy_loop(0.1)
+    assert sampler.samples > 10
+    assert '_busy_loop' in sampler.collapsed()
+    assert any('_busy_loop' in name for name, _ in sampler.top()['total'])
+
+
+def test_profile_requires_admin(admin_token):
+    body = {'wt_seq': 'ACDEFGHIK', 'mut_seq': 'ACDEWGHIK'}
+    assert client.post('/model/ss_predict?profile=1', json=body).status_code == 403
+    assert client.post('/model/ss_predict?profile=1', json=body, headers={'X-Admin-Token': 'nope'}).status_code == 403
+    assert client.get('/debug/profiles/' + '0' * 32).status_code == 403
+
+
+def test_profile_disabled_without_token(monkeypatch):
+    monkeypatch.setattr(config, 'ADMIN_TOKEN', None)
+    r = client.post('/model/ss_predict', json={'wt_seq': 'ACD', 'mut_seq': 'ACE'}, headers={**ADMIN, 'X-Profile': '1'})
+    assert r.status_code == 403
+
+
+def test_profiled_analyze_and_retrieval(admin_token):
+    sample = Path('backend/data/demo/sample_23andme.txt').read_bytes()
+    uid = client.post('/upload', files={'file': ('sample_23andme.txt', sample, 'text/plain')}).json()['upload_id']
+    r = client.post('/analyze?profile=1', json={'upload_id': uid}, headers=ADMIN)
+    assert r.status_code == 200 and r.json()['qc']['format'] == '23andme'
+    pid = r.headers['x-profile-id']
+    report = client.get(f'/debug/profiles/{pid}', headers=ADMIN).json()
+    assert report['request_id'] == pid and report['path'] == '/analyze' and report['error'] is None
+    assert report['owner'] == uid and 'self' in report['top']
+    collapsed = client.get(f'/debug/profiles/{pid}?format=collapsed', headers=ADMIN)
+    assert collapsed.status_code == 200 and collapsed.headers['content-type'].startswith('text/plain')
+
+    r = client.post('/model/ss_predict', json={'wt_seq': 'ACDEFGHIK', 'mut_seq': 'ACDEWGHIK'}, headers={**ADMIN, 'X-Profile': '1'})
+    assert r.status_code == 200 and 'x-profile-id' in r.headers
+    assert client.get(f"/debug/profiles/{r.headers['x-profile-id']}", headers=ADMIN).json()['path'] == '/model/ss_predict'
+    assert client.get('/debug/profiles/../../etc', headers=ADMIN).status_code == 404
+    # profiles live outside the upload namespace: deleting uploads (or the old `_model` owner) keeps them
+    assert client.delete('/uploads/_model').status_code == 404
+    client.delete(f'/uploads/{uid}')
+    assert client.get(f'/debug/profiles/{pid}', headers=ADMIN).status_code == 200
+    assert (profiling.PROFILE_DIR / f'{pid}.json').exists()
+
+
+def test_profile_reports_are_pruned(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, 'PROFILE_DIR', tmp_path)
+    monkeypatch.setattr(profiling, 'PROFILE_MAX_REPORTS', 2)
+    ids = [f'{i:032x}' for i in range(3)]
+    for i, req_id in enumerate(ids):
+        with Sampler(threading.get_ident(), interval_s=0.001) as sampler:
+            pass
+        profiling.write_report(sampler, '_model', req_id, {})
+        os.utime(tmp_path / f'{req_id}.json', (i, i))
+    assert sorted(p.name for p in tmp_path.iterdir()) == sorted(f'{r}.{ext}' for r in ids[1:] for ext in ('json', 'collapsed'))
+    assert profiling.find_report(ids[0]) is None and profiling.find_report(ids[2]) is not None
@@ -0,0 +1,47 @@
+import pandas as pd
+
+from backend.analysis import bench
+from backend.parser_23andme import parse_23andme
+from backend.qc import qc_metrics
+
+
+def _genome(rows):
+    return pd.DataFrame(rows, columns=['rsid', 'chrom', 'pos', 'genotype'])
+
+
+def test_call_rate_heterozygosity_and_ids():
+    df = _genome([
+        ('rs1', 'chr1', 1, 'AG'), ('rs2', 'chr1', 2, 'AA'), ('rs3', 'chr1', 3, '--'), ('rs4', 'chr2', 4, 'CT'),
+        ('rs4', 'chr2', 5, 'CC'), ('i7001', 'chr2', 6, 'GG'), (None, 'chrmt', 7, None),
+    ])
+    qc = qc_metrics(df, '23andme')
+    assert qc['n_snps'] == 7 and qc['no_calls'] == 2
+    assert qc['call_rate'] == round(5 / 7, 4) and qc['missing_pct'] == round(2 / 7, 4)
+    assert qc['allele_sanity'] == round(6 / 7, 4)  # legacy definition: a missing genotype passes, '--' does not
+    assert qc['call_rate_by_chrom'] == {'chr1': round(2 / 3, 4), 'chr2': 1.0, 'chrmt': 0.0}
+    assert qc['heterozygosity'] == 0.4  # 2 of 5 autosomal calls
+    assert qc['duplicate_rsids'] == 1 and qc['non_rs_ids'] == 2
+    assert qc['het_x'] is None and qc['inferred_sex'] == 'unknown'
+
+
+def test_sex_inference_and_categorical_columns():
+    autosomes = [(f'rs{i}', 'chr1', i, 'AG') for i in range(100)]
+    male = _genome(autosomes + [(f'rs{1000 + i}', 'chrx', i, 'AA') for i in range(100)]
+                   + [(f'rs{2000 + i}', 'chry', i, 'TT') for i in range(20)])
+    female = _genome(autosomes + [(f'rs{1000 + i}', 'chrx', i, 'AG' if i % 3 else 'GG') for i in range(100)]
+                     + [(f'rs{2000 + i}', 'chry', i, '--') for i in range(20)])
+    qm, qf = qc_metrics(male, 'vcf'), qc_metrics(female, 'vcf')
+    assert (qm['het_x'], qm['y_call_rate'], qm['inferred_sex']) == (0.0, 1.0, 'male')
+    assert qf['het_x'] == round(66 / 100, 4) and qf['y_call_rate'] == 0.0 and qf['inferred_sex'] == 'female'
+    assert list(qm['call_rate_by_chrom']) == ['chr1', 'chrx', 'chry']
+
+    cat = female.astype({'chrom': 'category', 'genotype': 'category'})
+    assert qc_metrics(cat, 'vcf') == qf
+
+
+def test_parsed_genome():
+    df = parse_23andme(bench.synth_23andme(5000, seed=3))
+    qc = qc_metrics(df, '23andme')
+    assert qc['no_calls'] == int((df['genotype'] == '--').sum()) and 0 < qc['call_rate'] < 1
+    assert set(qc['call_rate_by_chrom']) == set(df['chrom'])
+    assert 0 < qc['heterozygosity'] < 1
@@ -0,0 +1,69 @@
+import gzip
+from pathlib import Path
+from fastapi.testclient import TestClient
+
+from backend import storage
+from backend.api import app
+from backend.result_cache import ResultCache, options_key, cache as result_cache
+
+client = TestClient(app)
+
+
+def test_memory_lru_eviction_and_hit_ratio(tmp_path):
+    rc = ResultCache(None, mem_max_bytes=250, disk_max_bytes=0, level=0)  # ~100 B per gzip'd entry
+    opts = options_key(True, True, False, None, 'v')
+    rc.put('a' * 64, opts, b'x' * 80)
+    rc.put('b' * 64, opts, b'y' * 80)
+    assert rc.get('a' * 64, opts) is not None  # a is now most recent
+    rc.put('c' * 64, opts, b'z' * 80)         # evicts b
+    assert rc.get('b' * 64, opts) is None
+    assert gzip.decompress(rc.get('c' * 64, opts)) == b'z' * 80
+    s = rc.stats()
+    assert s['mem_evictions'] == 1 and s['mem_bytes'] <= 250
+    assert s['mem_hits'] == 2 and s['misses'] == 1 and s['hit_ratio'] == round(2 / 3, 4)
+
+
+def test_disk_tier_survives_restart_and_evicts(tmp_path):
+    opts = options_key(True, False, False, 'rs1', 'v')
+    rc = ResultCache(tmp_path, mem_max_bytes=1 << 20, disk_max_bytes=1 << 20)
+    rc.put('d' * 64, opts, b'{"qc": {}}')
+    fresh = ResultCache(tmp_path, mem_max_bytes=1 << 20, disk_max_bytes=1 << 20)
+    assert gzip.decompress(fresh.get('d' * 64, opts)) == b'{"qc": {}}'
+    assert fresh.stats()['disk_hits'] == 1
+    assert fresh.invalidate('d' * 64) == 2  # memory (promoted on hit) + disk
+    assert fresh.get('d' * 64, opts) is None
+
+    small = ResultCache(tmp_path / 'small', mem_max_bytes=0, disk_max_bytes=2000, level=0)
+    for i in range(5):
+        small.put(f'{i:064d}', opts, bytes(range(256)) * 3)
+    s = small.stats()
+    assert s['disk_bytes'] <= 2000 and s['disk_evictions'] >= 3
+    assert small.get(f'{4:064d}', opts) is not None
+
+
+def test_options_key_depends_on_every_input():
+    keys = {options_key(True, True, False, None, 'v1'), options_key(False, True, False, None, 'v1'),
+            options_key(True, True, True, None, 'v1'), options_key(True, True, False, 'rs1', 'v1'),
+            options_key(True, True, False, None, 'v2')}
+    assert len(keys) == 5
+
+
+def test_analyze_served_from_cache():
+    sample = Path('backend/data/demo/sample_23andme.txt').read_bytes()
+    uid = client.post('/upload', files={'file': ('sample_23andme.txt', sample, 'text/plain')}).json()['upload_id']
+    result_cache.invalidate(storage.upload_digest(uid))
+    body = {'upload_id': uid, 'run_traits': True, 'run_protein': True, 'run_pgs': True}
+    first = client.post('/analyze', json=body)
+    second = client.post('/analyze', json=body)
+    assert first.status_code == second.status_code == 200
+    assert first.headers['x-cache'] == 'miss' and second.headers['x-cache'] == 'hit'
+    assert first.json() == second.json()
+    # another upload of identical bytes shares the entry
+    uid2 = client.post('/upload', files={'file': ('copy.txt', sample, 'text/plain')}).json()['upload_id']
+    assert client.post('/analyze', json={**body, 'upload_id': uid2}).headers['x-cache'] == 'hit'
+    assert client.post('/analyze', json={**body, 'run_pgs': False}).headers['x-cache'] == 'miss'
+    assert client.get('/debug/cache').json()['hit_ratio'] > 0
+    # deleting the upload drops its cached results
+    client.delete(f'/uploads/{uid}')
+    assert client.post('/analyze', json={**body, 'upload_id': uid2}).headers['x-cache'] == 'miss'
+    client.delete(f'/uploads/{uid2}')
@@ -0,0 +1,68 @@
+from pathlib import Path
+
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import engine, result_formats
+from backend.annotate_local import annotate_variants, columnar_variants
+from backend.api import app
+from backend.result_formats import negotiate, encode, decode, expand_columnar, EncodingUnavailable, MEDIA_TYPES
+
+client = TestClient(app)
+
+
+def test_columnar_variants_expand_to_rows():
+    df = pd.DataFrame([
+        {'rsid': 'rs1042522', 'chrom': 'chr17', 'pos': 7676150, 'genotype': 'GG'},
+        {'rsid': 'rs4988235', 'chrom': '2', 'pos': 136608646, 'genotype': 'CT'},
+        {'rsid': 'rs9', 'chrom': 'CHRX', 'pos': 5, 'genotype': '--'},
+    ])
+    doc = {'variants': columnar_variants(df, engine.catalogs)}
+    assert doc['variants']['n'] == 3
+    assert expand_columnar(doc)['variants'] == annotate_variants(df, engine.catalogs)
+
+
+def test_negotiate(monkeypatch):
+    columnar = MEDIA_TYPES['columnar']
+    assert negotiate(None) == negotiate('text/html') == negotiate('*/*') == 'json'
+    assert negotiate('application/json, */*') == 'json'
+    assert negotiate(f'{columnar};q=0.9, application/json') == 'json'  # q wins over order
+    assert negotiate(f'application/json;q=0.5, {columnar}') == 'columnar'
+    assert negotiate(f'{columnar}, application/json') == 'columnar'  # equal q: the client's order
+    assert negotiate(f'application/json, {columnar}') == 'json'
+    assert negotiate(f'{columnar}, */*;q=0.1') == 'columnar'
+    assert negotiate(f'{columnar};q=0, */*') == 'json'  # the specific range overrides the wildcard
+    with pytest.raises(EncodingUnavailable):
+        negotiate(f'{columnar};q=0')
+    with pytest.raises(EncodingUnavailable):
+        negotiate('application/json;q=0, */*;q=0')
+    monkeypatch.setattr(result_formats, 'msgpack', object())  # installed
+    assert negotiate('application/json, application/msgpack') == 'json'
+    assert negotiate('application/msgpack, application/json') == 'msgpack'
+    assert negotiate('application/msgpack;q=0, application/json;q=0.2') == 'json'
+    monkeypatch.setattr(result_formats, 'msgpack', None)
+    assert negotiate('application/msgpack, application/json') == 'json'  # not installed: fall back
+    assert negotiate('application/msgpack, */*;q=0.1') == 'json'
+    with pytest.raises(EncodingUnavailable, match='msgpack_not_installed'):
+        negotiate('application/msgpack')
+    assert client.post('/analyze', json={'upload_id': '0' * 32}, headers={'Accept': 'application/msgpack'}).status_code == 406
+
+
+@pytest.mark.parametrize('encoding', ['columnar', 'msgpack'])
+def test_analyze_alternative_encodings(encoding):
+    if encoding == 'msgpack':
+        pytest.importorskip('msgpack')
+    sample = Path('backend/data/demo/sample_23andme.txt').read_bytes()
+    uid = client.post('/upload', files={'file': ('sample_23andme.txt', sample, 'text/plain')}).json()['upload_id']
+    body = {'upload_id': uid, 'run_traits': True, 'run_protein': True, 'run_pgs': True}
+    rows = client.post('/analyze', json=body).json()
+    r = client.post('/analyze', json=body, headers={'Accept': MEDIA_TYPES[encoding]})
+    assert r.status_code == 200 and r.headers['content-type'].startswith(MEDIA_TYPES[encoding])
+    assert expand_columnar(decode(r.content, encoding)) == rows
+    client.delete(f'/uploads/{uid}')
+
+
+def test_encode_roundtrip_keeps_head_sections():
+    head = {'qc': {'n_snps': 1}, 'variants': {'n': 0, 'columns': {}, 'links': {}}}
+    assert decode(encode(head, 'columnar'), 'columnar') == head
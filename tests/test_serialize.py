@@ -0,0 +1,34 @@
+import json
+from pathlib import Path
+
+import numpy as np
+import pytest
+from pydantic import ValidationError
+
+from backend import engine
+from backend.models import ResultJSON
+from backend.serialize import contract_dict, dumps, result_bytes
+
+
+def _sample_df():
+    df, fmt = engine.detect_and_parse(Path('backend/data/demo/sample_23andme.txt').read_bytes())
+    return df, fmt
+
+
+def test_fast_path_matches_pydantic_path():
+    df, fmt = _sample_df()
+    fast = engine.add_mini_model(engine.result_sections(df, fmt, True, True, True))
+    legacy = ResultJSON(**fast)
+    assert json.loads(result_bytes(fast)) == legacy.model_dump(mode='json')
+    assert list(json.loads(result_bytes(fast))) == list(legacy.model_dump())
+
+
+def test_contract_defaults_and_numpy_scalars():
+    d = contract_dict({'variants': [], 'qc': {'n_snps': np.int64(3), 'missing_pct': np.float64(0.5)}})
+    assert d['genome_window']['rsid'] == 'rs1042522' and d['ai_summary']['caveats']
+    assert json.loads(dumps(d))['qc'] == {'n_snps': 3, 'missing_pct': 0.5}
+
+
+def test_malformed_variants_rejected():
+    with pytest.raises(ValidationError):
+        contract_dict({'variants': [{'rsid': 'rs1'}]})
@@ -9,3 +9,96 @@ def test_ss_model_fallback():
     assert set(result["delta"]).issuperset({"helix", "sheet", "coil"})
     assert "notes" in result and "ss_model_unavailable" in result["notes"]
     assert result["wt"]["confidence"] < 0.5
+
+
+import shutil
+import subprocess
+import sys
+import numpy as np
+import pytest
+from pathlib import Path
+from backend.analysis import ss_registry
+from backend.analysis.ss_model import predict_secondary_structure_esm_lite
+from backend.analysis.ss_features import featurize_sequence
+from backend.analysis.ss_numpy import export_mlp, mlp_predict_proba
+
+DATA_DIR = Path(__file__).parent.parent / 'backend' / 'data'
+
+
+@pytest.fixture
+def trained_dir(tmp_path):
+    pytest.importorskip("sklearn")
+    shutil.copy(DATA_DIR / 'ss_train.csv', tmp_path / 'ss_train.csv')
+    assert ss_registry.main(['train', '--data-dir', str(tmp_path)]) == 0
+    ss_registry.clear_registry()
+    yield tmp_path
+    ss_registry.clear_registry()
+
+
+def test_registry_loads_once(trained_dir):
+    assert ss_registry.artifact_path(trained_dir).exists()
+    m1 = ss_registry.get_model(trained_dir)
+    m2 = ss_registry.get_model(trained_dir)
+    assert m1 is m2
+    res = predict_secondary_structure_esm_lite("MEEPQSDPSVEPPLSQETFSDLWKLLPENNV", "MEEPQSDPSVEPPLSRETFSDLWKLLPENNV", trained_dir)
+    assert abs(res["wt"]["helix"] + res["wt"]["sheet"] + res["wt"]["coil"] - 1) < 0.01
+    assert len(res["per_residue"]) == 31
+    assert "notes" not in res
+
+
+def test_registry_schema_mismatch_fails_fast(tmp_path):
+    np.savez(ss_registry.artifact_path(tmp_path), schema_version=0, feature_dim=20, classes=np.array(['C', 'E', 'H']))
+    ss_registry.clear_registry()
+    try:
+        with pytest.raises(ss_registry.ModelSchemaError):
+            predict_secondary_structure("ACDE", "ACDF", tmp_path)
+        # failure is cached, not retried against disk
+        ss_registry.artifact_path(tmp_path).unlink()
+        with pytest.raises(ss_registry.ModelSchemaError):
+            ss_registry.get_model(tmp_path)
+    finally:
+        ss_registry.clear_registry()
+
+
+def test_numpy_forward_matches_sklearn():
+    pytest.importorskip("sklearn")
+    artifact = ss_registry.train_artifact(DATA_DIR)
+    X = np.concatenate([featurize_sequence(s) for s in ("MEEPQSDPSVEPPLSQETFSDLWKLLPENNV", "GPSGXXAVILW", "A")])
+    expected = artifact['model'].predict_proba(artifact['scaler'].transform(X))
+    got = mlp_predict_proba(export_mlp(artifact['scaler'], artifact['model']), X)
+    assert np.abs(got - expected).max() < 1e-6
+
+
+def test_api_import_does_not_pull_sklearn():
+    code = "import sys, backend.api; sys.exit(1 if any(m.split('.')[0] in ('sklearn', 'torch', 'joblib') for m in sys.modules) else 0)"
+    assert subprocess.run([sys.executable, "-c", code], cwd=DATA_DIR.parent.parent).returncode == 0
+
+
+def test_saturation_scan_matches_single_predictions(trained_dir):
+    from backend.analysis.ss_model import scan_saturation_mutagenesis
+    wt = "MEEPQSDPSVEPPLSQETFSDLWKLLPENNV"
+    res = scan_saturation_mutagenesis(wt, trained_dir)
+    assert res["n_variants"] == 31 * 19
+    assert len(res["delta"]["helix"]) == 31 and len(res["delta"]["helix"][0]) == 20
+    aa = res["alphabet"]
+    assert res["delta"]["coil"][5][aa.index(wt[5])] == 0.0
+    # Spot-check one cell against the per-residue path
+    model = ss_registry.get_model(trained_dir)
+    mut = wt[:15] + "R" + wt[16:]
+    expected = model.predict_sequence(mut)[15] - model.predict_sequence(wt)[15]
+    assert abs(res["delta"]["helix"][15][aa.index("R")] - round(float(expected[0]), 3)) <= 1e-3
+
+
+def test_saturation_scan_latency_budget(trained_dir):
+    from backend.analysis.ss_model import scan_saturation_mutagenesis
+    wt = "MEEPQSDPSVEPPLSQETFSDLWKLLPENNV"
+    scan_saturation_mutagenesis(wt, trained_dir)
+    best = min(_timed(scan_saturation_mutagenesis, wt, trained_dir) for _ in range(3))
+    assert best < 0.2
+
+
+def _timed(fn, *args):
+    import time
+    t0 = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - t0
@@ -0,0 +1,95 @@
+import json
+import os
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import config, storage, tracing
+from backend.analysis.pipeline import run_analysis
+from backend.api import app
+from backend.result_cache import cache as result_cache
+
+client = TestClient(app)
+
+
+def test_spans_nest_and_record_errors():
+    tracing.clear()
+    with tracing.span('root', trace_id='t1', a=1) as root:
+        with tracing.span('child') as child:
+            tracing.set_attrs(n=3)
+        tracing.record('done_earlier', 0.002, rows=7)
+        with pytest.raises(ValueError):
+            with tracing.span('boom'):
+                raise ValueError('bad')
+    [trace] = tracing.recent_traces(trace_id='t1')
+    spans = {s['name']: s for s in trace['spans']}
+    assert trace['root'] == 'root' and trace['duration_ms'] == spans['root']['duration_ms']
+    assert spans['child']['parent_id'] == root.span_id and spans['child']['attrs'] == {'n': 3}
+    assert spans['done_earlier']['parent_id'] == root.span_id and spans['done_earlier']['duration_ms'] == 2.0
+    assert spans['boom']['error'] == 'ValueError: bad'
+    assert child.trace_id == 't1'
+
+
+def test_collect_continues_remote_trace():
+    tracing.clear()
+    with tracing.span('api', trace_id='t2'):
+        ctx = tracing.context()
+    with tracing.collect(ctx) as spans:  # as in a pool worker
+        with tracing.span('worker'):
+            pass
+    assert [s['name'] for s in tracing.recent_traces(trace_id='t2')[0]['spans']] == ['api']
+    tracing.ingest(spans)
+    trace = tracing.recent_traces(trace_id='t2')[0]
+    assert trace['root'] == 'api'
+    worker = next(s for s in trace['spans'] if s['name'] == 'worker')
+    assert worker['parent_id'] == ctx['span_id']
+
+
+def test_pipeline_steps_are_spans():
+    tracing.clear()
+    data_dir = os.path.join(os.path.dirname(__file__), '../backend/data')
+    variants = [{"rsid": "rs1042522", "chrom": "17", "pos": 7579472, "genotype": "GG"}]
+    result = run_analysis(variants, {"run_protein": True, "run_pgs": True, "target_rsid": "rs1042522"}, {"data_dir": data_dir})
+    assert not any(n.startswith('timing:') for n in result['notes'])
+    [trace] = tracing.recent_traces()
+    assert trace['root'] == 'run_analysis'
+    assert {'join_annotations', 'protein', 'ss_inference', 'pgs'} <= {s['name'] for s in trace['spans']}
+
+
+def test_analyze_trace_spans_api_and_worker(monkeypatch):
+    monkeypatch.setattr(config, 'ADMIN_TOKEN', 's3cret')
+    admin = {'X-Admin-Token': 's3cret'}
+    sample = Path('backend/data/demo/sample_23andme.txt').read_bytes()
+    uid = client.post('/upload', files={'file': ('sample_23andme.txt', sample, 'text/plain')}).json()['upload_id']
+    result_cache.invalidate(storage.upload_digest(uid))
+    tracing.clear()
+    assert client.post('/analyze', json={'upload_id': uid, 'run_pgs': True}).status_code == 200
+
+    assert client.get('/debug/traces', params={'limit': 5}).status_code == 403
+    assert client.get('/debug/traces', params={'limit': 5}, headers={'X-Admin-Token': 'guess'}).status_code == 403
+    r = client.get('/debug/traces', params={'limit': 5}, headers=admin)
+    assert r.status_code == 200
+    trace = next(t for t in r.json()['traces'] if t['root'] == 'http' and any(s['name'] == 'analysis' for s in t['spans']))
+    spans = {s['name']: s for s in trace['spans']}
+    assert spans['http']['attrs']['route'] == '/analyze' and spans['http']['attrs']['status'] == 200
+    assert spans['result_cache.get']['attrs']['hit'] is False
+    assert spans['analysis']['parent_id'] == spans['analysis_pool']['span_id']
+    assert spans['parse']['attrs']['format'] == '23andme' and spans['parse']['attrs']['n_variants'] > 0
+    assert spans['annotate']['attrs']['clinvar_rows'] > 0
+    for name in ('qc', 'traits', 'protein', 'pgs', 'ss_inference', 'serialize'):
+        assert spans[name]['trace_id'] == trace['trace_id']
+
+    by_id = client.get('/debug/traces', params={'trace_id': trace['trace_id']}, headers=admin).json()
+    assert by_id['traces'][0]['trace_id'] == trace['trace_id']
+    assert client.get('/debug/traces', params={'min_ms': 1e9}, headers=admin).json()['traces'] == []
+    client.delete(f'/uploads/{uid}')
+
+
+def test_trace_file_export(tmp_path, monkeypatch):
+    path = tmp_path / 'spans.jsonl'
+    monkeypatch.setattr(tracing, 'TRACE_FILE', str(path))
+    with tracing.span('exported', trace_id='t3'):
+        pass
+    [line] = path.read_text().splitlines()
+    assert json.loads(line)['name'] == 'exported'
@@ -0,0 +1,81 @@
+import json
+import random
+from backend.analysis import fasta
+from backend.analysis.fasta import IndexedFasta, fai_path
+from backend.analysis.windows import fetch_window_for_rsid, parse_missense, clear_window_caches, _cached_window
+
+AA = "ACDEFGHIKLMNPQRSTVWY"
+
+
+def _write_fixture(tmp_path):
+    rng = random.Random(0)
+    seqs = {"P04637": "".join(rng.choice(AA) for _ in range(393)), "Q00001": "".join(rng.choice(AA) for _ in range(20))}
+    p53 = seqs["P04637"]
+    seqs["P04637"] = p53[:71] + "P" + p53[72:389] + "L" + p53[390:]
+    with open(tmp_path / "uniprot.fasta", "w") as f:
+        for acc, seq in seqs.items():
+            f.write(f">sp|{acc}|TEST_HUMAN test protein\n")
+            for i in range(0, len(seq), 60):
+                f.write(seq[i:i+60] + "\n")
+    (tmp_path / "protein_map.csv").write_text(
+        "rsid,gene,uniprot,residue_index,protein_change,alphafold_cif_url\n"
+        "rs1042522,TP53,P04637,72,p.Pro72Arg,x\n"
+        "rsEND,TP53,P04637,390,p.Leu390Ala,x\n"
+        "rsBAD,TP53,P04637,72,p.Gly72Arg,x\n"
+    )
+    (tmp_path / "aa_windows.json").write_text(json.dumps({
+        "rsJSON": {"wt_seq": "AAAAGAAAA\n", "mut_seq": "AAAATAAAA\n", "center": 4},
+        "rsLEN": {"wt_seq": "AAA", "mut_seq": "AAAA", "center": 1},
+    }))
+    return seqs
+
+
+def test_indexed_fasta_fetch(tmp_path):
+    seqs = _write_fixture(tmp_path)
+    fa = IndexedFasta(tmp_path / "uniprot.fasta")
+    assert fai_path(tmp_path / "uniprot.fasta").exists()
+    assert fa.length("P04637") == 393
+    for start, end in [(0, 10), (55, 125), (380, 400), (0, 393)]:
+        assert fa.fetch("P04637", start, end) == seqs["P04637"][start:end]
+    assert fa.fetch("Q00001", 0, 31) == seqs["Q00001"]
+    assert sorted(p.name for p in tmp_path.glob("uniprot.fasta*")) == ["uniprot.fasta", "uniprot.fasta.fai"]  # no temp left
+
+
+def test_indexed_fasta_without_writable_data_dir(tmp_path, monkeypatch):
+    seqs = _write_fixture(tmp_path)
+
+    def read_only(path):
+        raise PermissionError(13, "Read-only file system")
+
+    monkeypatch.setattr(fasta, "build_fai", read_only)
+    fa = IndexedFasta(tmp_path / "uniprot.fasta")
+    assert not fai_path(tmp_path / "uniprot.fasta").exists()
+    assert fa.fetch("P04637", 55, 125) == seqs["P04637"][55:125]
+
+
+def test_window_from_fasta(tmp_path):
+    clear_window_caches()
+    seqs = _write_fixture(tmp_path)
+    paths = {"data_dir": str(tmp_path)}
+    wt, mut, center = fetch_window_for_rsid("rs1042522", paths)
+    assert len(wt) == len(mut) == 31 and center == 15
+    assert wt == seqs["P04637"][56:87] and wt[center] == "P" and mut[center] == "R"
+    # near the C-terminus the window shifts instead of shrinking
+    wt, mut, center = fetch_window_for_rsid("rsEND", paths)
+    assert len(wt) == 31 and center == 389 - (393 - 31) and mut[center] == "A"
+    assert fetch_window_for_rsid("rsBAD", paths) is None  # ref residue disagrees
+    # legacy json windows: whitespace stripped, mismatched lengths rejected
+    assert fetch_window_for_rsid("rsJSON", paths) == ("AAAAGAAAA", "AAAATAAAA", 4)
+    assert fetch_window_for_rsid("rsLEN", paths) is None
+    hits = _cached_window.cache_info().hits
+    fetch_window_for_rsid("rs1042522", paths)
+    assert _cached_window.cache_info().hits == hits + 1
+    clear_window_caches()
+
+
+def test_parse_missense():
+    assert parse_missense("p.Pro72Arg") == ("P", 72, "R")
+    assert parse_missense("p.(Glu504Lys)") == ("E", 504, "K")
+    assert parse_missense("p.P72R") == ("P", 72, "R")
+    assert parse_missense("p.Arg213Ter") is None
+    assert parse_missense("") is None
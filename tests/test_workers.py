@@ -0,0 +1,82 @@
+import asyncio
+import time
+import httpx
+import pytest
+from backend.workers import AnalysisPool, PoolSaturated, TaskTimeout, TaskCancelled
+
+
+def _sleep_and_return(x, delay):
+    time.sleep(delay)
+    return x
+
+
+def test_pool_runs_and_reports_stats():
+    pool = AnalysisPool(workers=2, max_queue=4, timeout_s=10)
+    try:
+        async def main():
+            return await asyncio.gather(*[pool.run(_sleep_and_return, i, 0.05) for i in range(5)])
+        assert asyncio.run(main()) == [0, 1, 2, 3, 4]
+        stats = pool.stats()
+        assert stats['completed'] == 5 and stats['busy'] == 0 and stats['queue_depth'] == 0
+    finally:
+        pool.shutdown()
+
+
+def test_pool_saturation_timeout_and_cancel():
+    pool = AnalysisPool(workers=1, max_queue=1, timeout_s=10)
+    try:
+        async def main():
+            running = asyncio.ensure_future(pool.run(_sleep_and_return, 'a', 0.5))
+            await asyncio.sleep(0.05)
+            queued = asyncio.ensure_future(pool.run(_sleep_and_return, 'b', 0.0, timeout=0.1))
+            await asyncio.sleep(0.01)
+            with pytest.raises(PoolSaturated):
+                await pool.run(_sleep_and_return, 'c', 0.0)
+            with pytest.raises(TaskTimeout):
+                await queued  # never got a worker before its deadline
+            async def gone():
+                return True
+            with pytest.raises(TaskCancelled):
+                await pool.run(_sleep_and_return, 'd', 0.0, is_cancelled=gone)
+            assert await running == 'a'
+            # the slot freed by 'a' is usable again
+            assert await pool.run(_sleep_and_return, 'e', 0.0) == 'e'
+        asyncio.run(main())
+        stats = pool.stats()
+        assert stats['rejected'] == 1 and stats['timeouts'] == 1 and stats['cancelled'] == 1
+        assert stats['busy'] == 0 and stats['queue_depth'] == 0
+    finally:
+        pool.shutdown()
+
+
+def test_light_endpoints_stay_fast_during_analysis():
+    from backend import storage
+    from backend.api import app
+    from backend.result_cache import cache as result_cache
+    rows = "\n".join(f"rs{i}\t{1 + i % 22}\t{1000 + i}\t{'ACGT'[i % 4]}{'ACGT'[(i // 4) % 4]}" for i in range(50_000))
+    genome = ("# rsid\tchromosome\tposition\tgenotype\n" + rows + "\n").encode()
+
+    async def main():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=120) as client:
+            up = await client.post('/upload', files={'file': ('big.txt', genome, 'text/plain')})
+            uid = up.json()['upload_id']
+            result_cache.invalidate(storage.upload_digest(uid))  # measure real work, not a cache hit
+            heavy = [asyncio.ensure_future(client.post('/analyze', json={'upload_id': uid, 'run_pgs': True})) for _ in range(2)]
+            latencies = []
+            while not all(h.done() for h in heavy):
+                t0 = time.perf_counter()
+                r = await client.get('/health')
+                latencies.append(time.perf_counter() - t0)
+                assert r.status_code == 200
+                await asyncio.sleep(0.01)
+            results = await asyncio.gather(*heavy)
+            await client.delete(f'/uploads/{uid}')
+            return latencies, results
+
+    latencies, results = asyncio.run(main())
+    assert all(r.status_code == 200 for r in results), results[0].text
+    assert len(latencies) >= 10
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    assert p99 < 0.1